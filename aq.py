@@ -0,0 +1,61 @@
+import argparse
+import runpy
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent
+
+# Subcommand -> (script it runs, description). Nothing is imported until a subcommand is
+# chosen, and the scripts import pandas, Matplotlib and the drivers only where they use them.
+COMMANDS = {
+    'extract': ('scripts/extract.py', "Fetch measurements of a location and parameter from the OpenAQ API"),
+    'clean': ('scripts/clean.py', "Fill missing hours and replace outliers of measurement CSV files"),
+    'load': ('scripts/load.py', "Load a cleaned CSV file into PostgreSQL"),
+    'etl': ('orchestrate.py', "Run extract, clean and load for every pair of config.yaml"),
+    'summary': ('summary.py', "Summary statistics of every series in one pass"),
+    'avgday': ('average_day.py', "Plot the average value per local hour of the day"),
+    'plot': ('line_graph_y.py', "Plot several series on one time axis"),
+    'weekday': ('crtanje.py', "Plot the hourly average of every day of the week"),
+    'boxplot': ('crtanje2.py', "Plot the hourly distribution as boxplots"),
+    'hourstats': ('crtanje3.py', "Render hourly statistics as a table image"),
+    'daystats': ('crtanje4.py', "Render hourly statistics of every day of the week as table images"),
+    'report': ('report.py', "Render every plot and table of many series in parallel"),
+    'batch': ('batch_analysis.py', "Timezone-aware hourly, seasonal and day type statistics of many cities"),
+    'serve': ('service.py', "Serve the analyses as JSON/PNG over HTTP with a result cache"),
+}
+
+
+def run(command, argv):
+    """Runs the script of a subcommand as `python <script> argv...` would, in this interpreter.
+
+    Args:
+        command (str): Key of COMMANDS.
+        argv (list): Arguments passed on to the script.
+    """
+    script = ROOT / COMMANDS[command][0]
+    # The script's own directory first, then the stage modules, as when run directly
+    sys.path[:0] = [str(script.parent), str(ROOT / "scripts")]
+    sys.argv = [f"aq {command}", *argv]
+    runpy.run_path(str(script), run_name="__main__")
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv and argv[0] in COMMANDS:
+        run(argv[0], argv[1:])
+        return
+
+    width = max(map(len, COMMANDS))
+    parser = argparse.ArgumentParser(
+        prog="aq", description="Air quality pipeline and analysis commands.",
+        epilog="commands:\n" + "\n".join(f"  {name:<{width}}  {description}"
+                                         for name, (_, description) in COMMANDS.items())
+               + "\n\nRun 'aq <command> --help' for the options of a command.",
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=COMMANDS, metavar="command", help="Command to run")
+    parser.add_argument("args", nargs=argparse.REMAINDER, help="Arguments of the command")
+    parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,24 @@
-import psycopg2
 import argparse
-import pandas as pd
-import matplotlib.pyplot as plt
+
+import datasource
+
+def plot_average_day(average, title, output_file):
+    """Plots the average value per local hour of the day.
+
+    Args:
+        average (pd.Series): Mean value indexed by hour.
+        title (str): Plot title.
+        output_file (str): Output image path.
+    """
+    import matplotlib.pyplot as plt
+
+    plt.figure()
+    plt.plot(average.index, average.values)
+    plt.xlabel("Hour of Day")
+    plt.ylabel("Average Value")
+    plt.title(title)
+    plt.savefig(output_file)
+    plt.close()
 
 def main():
     # Handle command-line arguments
@@ -9,45 +26,20 @@ def main():
     parser.add_argument("table_name", help="Name of the database table")
     parser.add_argument("start_date", help="Start date (YYYY-MM-DD)")
     parser.add_argument("end_date", help="End date (YYYY-MM-DD)")
-    parser.add_argument("utc_offset", type=int, help="UTC offset in hours")
+    parser.add_argument("utc_offset", help="UTC offset in hours, or an IANA timezone name")
     parser.add_argument("output_file", help="Output file name (e.g., my_plot.png)") 
+    parser.add_argument("--source", default=datasource.DEFAULT_SOURCE,
+                        help="Data source URL (postgresql://..., duckdb:///path/to/cleaned/files or binary:///path/to/f32/files)")
     args = parser.parse_args()
 
-    # Connect to the PostgreSQL database
-    try:
-        conn = psycopg2.connect(
-            host="localhost",
-            database="air_quality",
-            user="postgres"
-        )
-
-        # Construct the SQL query
-        sql = f"""
-            SELECT 
-                EXTRACT(HOUR FROM datetime + INTERVAL '{args.utc_offset} HOUR') AS hour,
-                AVG(value) as average_value
-            FROM {args.table_name}
-            WHERE datetime >= '{args.start_date}' AND datetime < '{args.end_date}'
-            GROUP BY hour
-            ORDER BY hour;
-        """
-
-        # Execute query and fetch data
-        df = pd.read_sql(sql, conn)
-
-        # Create the plot
-        plt.plot(df['hour'], df['average_value'])
-        plt.xlabel("Hour of Day")
-        plt.ylabel("Average Value")
-        plt.title(f"Average Day ({args.start_date} to {args.end_date})")
-        plt.savefig(args.output_file)  # Use the provided output file name
-        print(f"Plot saved as {args.output_file}")
-
-    except psycopg2.Error as e:
-        print(f"Database error: {e}")
-    finally:
-        if conn:
-            conn.close()
+    # Average value for each local hour of the day (from the load-time rollups when available;
+    # only their medians are approximate)
+    average = datasource.hour_profile(args.table_name, args.start_date, args.end_date, args.utc_offset,
+                                      source=args.source, approximate=True)['mean']
+
+    # Create the plot
+    plot_average_day(average, f"Average Day ({args.start_date} to {args.end_date})", args.output_file)
+    print(f"Plot saved as {args.output_file}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,156 @@
+import argparse
+import time
+import zoneinfo
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import datasource
+
+# Meteorological seasons by month, labelled by their months so they read the same on both hemispheres
+SEASONS = ('DJF', 'MAM', 'JJA', 'SON')
+DAY_TYPES = ('weekday', 'weekend')
+COLUMNS = ['table', 'tz', 'grouping', 'key', 'mean', 'median', 'count']
+
+def parse_city(text):
+    """'SANTA_ANITA_pm10=America/Lima' -> ('SANTA_ANITA_pm10', 'America/Lima')."""
+    table, _, tz = text.partition('=')
+    if not table or not tz:
+        raise argparse.ArgumentTypeError(f"Expected TABLE=TIMEZONE, got {text!r}")
+    try:
+        zoneinfo.ZoneInfo(tz)
+    except (zoneinfo.ZoneInfoNotFoundError, ValueError):
+        raise argparse.ArgumentTypeError(f"Unknown IANA timezone {tz!r} for {table}")
+    return table, tz
+
+def load_utc(tables, start_date, end_date, source, workers):
+    """Loads every table in UTC, concurrently over the PostgreSQL pool (DuckDB reads one at a time).
+
+    Returns:
+        list: One DataFrame per table, in order.
+    """
+    src = datasource.get_source(source)
+    load = lambda table: datasource.load_series(table, start_date, end_date, 'UTC', source)
+    if not isinstance(src, datasource.PostgresSource):
+        return [load(table) for table in tables]
+    with ThreadPoolExecutor(max_workers=min(workers or len(tables), src.pool.maxconn)) as executor:
+        return list(executor.map(load, tables))
+
+def local_hours(frames, zones):
+    """Converts the UTC timestamps of many series to local wall-clock epoch hours.
+
+    All series are concatenated and each distinct timezone is converted in one vectorized
+    tz_convert over all of its rows, so cities sharing a zone cost one conversion and the
+    DST rules of the zone apply to every instant.
+
+    Args:
+        frames (list): DataFrames with tz-aware 'datetime' columns.
+        zones (list): IANA timezone of each frame.
+
+    Returns:
+        list: int64 local epoch hours per frame.
+    """
+    import numpy as np
+    import pandas as pd
+
+    from compact import HOUR_NS
+
+    lengths = [len(frame) for frame in frames]
+    utc = np.concatenate([frame['datetime'].dt.tz_convert('UTC').dt.tz_localize(None).to_numpy('datetime64[ns]')
+                          .astype(np.int64) for frame in frames]) if frames else np.empty(0, dtype=np.int64)
+    names, codes = np.unique(np.repeat(np.array(zones, dtype=object), lengths).astype(str), return_inverse=True)
+    local = np.empty_like(utc)
+    for code, tz in enumerate(names):
+        rows = codes == code
+        local[rows] = pd.DatetimeIndex(utc[rows], tz='UTC').tz_convert(tz).tz_localize(None).asi8
+    return np.split(local // HOUR_NS, np.cumsum(lengths)[:-1])
+
+def _labelled(stats, grouping, labels=None):
+    import numpy as np
+
+    stats = stats.reset_index(names='key')
+    if labels is not None:
+        stats['key'] = np.array(labels)[stats['key']]
+    return stats.assign(grouping=grouping)
+
+def city_statistics(table, tz, hours, values):
+    """Seasonal, monthly, daily and weekday-vs-weekend statistics of one city.
+
+    Returns:
+        pd.DataFrame: Long format with COLUMNS: grouping is season, month, hour, day_type,
+        weekday_hour or weekend_hour, and key the season, month, hour or day type.
+    """
+    import numpy as np
+    import pandas as pd
+
+    from compact import CompactSeries
+
+    series = CompactSeries(hours, values, tz)
+    weekend = (series.weekday >= 5).astype(np.intp)
+    by_type_hour = series.group_stats(weekend * 24 + series.hour, 2 * 24)
+    weekday_hour = by_type_hour[by_type_hour.index < 24]
+    weekend_hour = by_type_hour[by_type_hour.index >= 24]
+    weekend_hour.index = weekend_hour.index - 24
+    pieces = [
+        _labelled(series.group_stats(series.month % 12 // 3, len(SEASONS)), 'season', SEASONS),
+        _labelled(series.month_profile(), 'month'),
+        _labelled(series.profile(), 'hour'),
+        _labelled(series.group_stats(weekend, len(DAY_TYPES)), 'day_type', DAY_TYPES),
+        _labelled(weekday_hour, 'weekday_hour'),
+        _labelled(weekend_hour, 'weekend_hour'),
+    ]
+    return pd.concat(pieces, ignore_index=True).assign(table=table, tz=tz)[COLUMNS]
+
+def run_batch(cities, start_date=None, end_date=None, source=None, workers=None):
+    """Loads every (table, timezone) pair, converts them to local time and computes all statistics.
+
+    Args:
+        cities (list): (table, IANA timezone) pairs.
+        start_date (str): Inclusive start (UTC), or None.
+        end_date (str): Exclusive end (UTC), or None.
+        source (str): Data source URL (see datasource.get_source).
+        workers (int): Loading threads and statistics processes (default: one per CPU).
+
+    Returns:
+        pd.DataFrame: The combined statistics of every city, in COLUMNS.
+    """
+    import pandas as pd
+
+    tables = [table for table, _ in cities]
+    zones = [tz for _, tz in cities]
+    frames = load_utc(tables, start_date, end_date, source, workers)
+    hours = local_hours(frames, zones)
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(city_statistics, table, tz, city_hours, frame['value'].to_numpy())
+                   for (table, tz), city_hours, frame in zip(cities, hours, frames)]
+        results = [future.result() for future in futures]
+    return pd.concat(results, ignore_index=True) if results else pd.DataFrame(columns=COLUMNS)
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the seasonal, daily and weekday/weekend statistics of many cities in local time.")
+    parser.add_argument("cities", nargs="+", type=parse_city,
+                        help="TABLE=TIMEZONE pairs with IANA timezones (e.g. SANTA_ANITA_pm10=America/Lima)")
+    parser.add_argument("--start_date", help="Start date (YYYY-MM-DD)")
+    parser.add_argument("--end_date", help="End date (YYYY-MM-DD)")
+    parser.add_argument("--source", default=datasource.DEFAULT_SOURCE,
+                        help="Data source URL (postgresql://..., duckdb:///path/to/cleaned/files or binary:///path/to/f32/files)")
+    parser.add_argument("--output", default='batch_analysis.csv', help="Combined result set (CSV)")
+    parser.add_argument("--workers", type=int, help="Loading threads and statistics processes (default: one per CPU)")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    results = run_batch(args.cities, args.start_date, args.end_date, args.source, args.workers)
+    results.to_csv(args.output, index=False)
+
+    print(f"{'table':<24} {'timezone':<22} {'mean':>7} {'weekday':>8} {'weekend':>8} {'peak hour':>9} {'top season':>10}")
+    for (table, tz), stats in results.groupby(['table', 'tz'], sort=False):
+        by = {grouping: part.set_index('key') for grouping, part in stats.groupby('grouping')}
+        day_type = by['day_type']['mean']
+        mean = (by['day_type']['mean'] * by['day_type']['count']).sum() / by['day_type']['count'].sum()
+        print(f"{table:<24} {tz:<22} {mean:>7.2f} {day_type.get('weekday', float('nan')):>8.2f} "
+              f"{day_type.get('weekend', float('nan')):>8.2f} {by['hour']['mean'].idxmax():>9} "
+              f"{by['season']['mean'].idxmax():>10}")
+    print(f"{len(results)} rows for {len(args.cities)} series written to {args.output} "
+          f"in {time.perf_counter() - started:.2f}s")
+
+if __name__ == "__main__":
+    main()
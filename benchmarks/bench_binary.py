@@ -0,0 +1,73 @@
+import argparse
+import resource
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "scripts"))
+sys.path.insert(0, str(ROOT))
+
+import binseries
+import datasource
+
+
+def write_stations(directory, stations, years, seed=0):
+    """Writes synthetic hourly stations as cleaned CSV files and binary series files side by side."""
+    rng = np.random.default_rng(seed)
+    times = pd.date_range('2015-01-01', periods=round(24 * 365 * years), freq='h', tz='UTC')
+    hours = times.as_unit('ns').asi8 // binseries.HOUR_NS
+    tables = []
+    for i in range(stations):
+        table = f"BENCH_{i}_pm10"
+        values = (30 + 10 * np.sin(np.arange(len(times)) * 2 * np.pi / 24) + rng.normal(0, 4, len(times))).astype(np.float32)
+        pd.DataFrame({'datetime': times, 'value': values}).to_csv(directory / f"measurements_{table}.csv", index=False)
+        binseries.write(binseries.series_path(directory, table), int(hours[0]), values, np.zeros(len(values), dtype=bool))
+        tables.append(table)
+    return tables, times
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return time.perf_counter() - start, result
+
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare reads of binary series files and cleaned CSV files.")
+    parser.add_argument("--stations", type=int, default=100, help="Number of synthetic stations")
+    parser.add_argument("--years", type=float, default=10, help="Years of hourly data per station")
+    parser.add_argument("--tz", default='America/Lima', help="Local timezone of the hour profiles")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        directory = Path(tmp)
+        tables, times = write_stations(directory, args.stations, args.years)
+        size = sum(path.stat().st_size for path in directory.glob(f"*{binseries.SUFFIX}")) / 2 ** 20
+        print(f"{args.stations} stations x {len(times)} hours, {size:.0f} MiB of binary series")
+        month = (times[len(times) // 2].strftime('%Y-%m-01'), (times[len(times) // 2] + pd.DateOffset(months=1)).strftime('%Y-%m-01'))
+
+        print(f"{'read':<28} {'duckdb (s)':>10} {'binary (s)':>10} {'speedup':>8}")
+        cases = [
+            ('one month of every station', lambda source: [datasource.load_series(table, *month, 'UTC', source) for table in tables]),
+            ('hour profile of every station', lambda source: [datasource.hour_profile(table, None, None, args.tz, source=source)
+                                                              for table in tables]),
+        ]
+        for name, read in cases:
+            rss = peak_rss_mb()
+            binary_seconds, _ = timed(lambda: read(f"binary://{directory}"))
+            binary_rss = peak_rss_mb() - rss
+            duckdb_seconds, _ = timed(lambda: read(f"duckdb://{directory}"))
+            print(f"{name:<28} {duckdb_seconds:>10.3f} {binary_seconds:>10.3f} {duckdb_seconds / binary_seconds:>7.1f}x"
+                  f"  (binary peak RSS growth {binary_rss:.0f} MiB)")
+
+if __name__ == "__main__":
+    main()
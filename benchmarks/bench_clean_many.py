@@ -0,0 +1,53 @@
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
+
+import clean
+
+
+def synthetic_series(n_series, hours, seed=0):
+    """Long-format raw frame of hourly series with gaps, duplicates, -999 sentinels and spikes."""
+    rng = np.random.default_rng(seed)
+    start = np.datetime64('2022-01-01T00:00')
+    frames = []
+    for i in range(n_series):
+        times = start + np.arange(hours).astype('timedelta64[h]')
+        values = 30 + 10 * np.sin(np.arange(hours) * 2 * np.pi / 24) + rng.normal(0, 5, hours)
+        values[rng.random(hours) < 0.02] = -999
+        values[rng.random(hours) < 0.005] = 500
+        keep = rng.random(hours) > 0.05
+        frames.append(pd.DataFrame({'location': f'Station {i}', 'parameter': 'pm25',
+                                    'datetime': times[keep], 'value': values[keep].round(2)}))
+    return pd.concat(frames, ignore_index=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure clean_many throughput as the number of series grows.")
+    parser.add_argument("--series", type=int, nargs="+", default=[1, 10, 100], help="Series counts to try")
+    parser.add_argument("--hours", type=int, default=8760, help="Hours per series")
+    args = parser.parse_args()
+
+    print(f"{'series':>6} {'rows':>9} {'batch (s)':>10} {'rows/s':>10} {'per-series loop (s)':>20}")
+    for n_series in args.series:
+        df = synthetic_series(n_series, args.hours)
+
+        start = time.perf_counter()
+        clean.clean_many(df)
+        batch = time.perf_counter() - start
+
+        # Same cleaning applied series by series, as the one-process-per-file flow does
+        start = time.perf_counter()
+        for _, series in df.groupby(['location', 'parameter']):
+            clean.clean_many(series)
+        loop = time.perf_counter() - start
+
+        print(f"{n_series:>6} {len(df):>9} {batch:>10.3f} {len(df) / batch:>10.0f} {loop:>20.3f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
+
+from compact import CompactSeries
+
+
+def synthetic_frame(stations, years, tz, seed=0):
+    """Long frame of hourly series for several stations, with local timestamps and a few NaNs."""
+    rng = np.random.default_rng(seed)
+    times = pd.date_range('2015-01-01', periods=round(24 * 365 * years), freq='h', tz='UTC').tz_convert(tz)
+    frames = []
+    for _ in range(stations):
+        values = 30 + 10 * np.sin(np.arange(len(times)) * 2 * np.pi / 24) + rng.normal(0, 4, len(times))
+        values[rng.random(len(times)) < 0.01] = np.nan
+        frames.append(pd.DataFrame({'datetime': times, 'value': values}))
+    return pd.concat(frames, ignore_index=True)
+
+
+def best_of(repeat, func):
+    seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        seconds.append(time.perf_counter() - start)
+    return min(seconds), result
+
+
+def pandas_profile(df, weekday):
+    """The grouping the analysis scripts did before: hour and day-name columns, then a groupby."""
+    df = df.assign(hour=df['datetime'].dt.hour)
+    keys = ['hour']
+    if weekday:
+        df['day_of_week'] = df['datetime'].dt.day_name()
+        keys.insert(0, 'day_of_week')
+    return df, df.groupby(keys)['value'].agg(['mean', 'median', 'count'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare memory and group-by time of DataFrames and CompactSeries.")
+    parser.add_argument("--stations", type=int, default=10, help="Number of synthetic stations")
+    parser.add_argument("--years", type=float, default=5, help="Years of hourly data per station")
+    parser.add_argument("--tz", default='America/Los_Angeles', help="Local timezone of the grouping")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per variant, the fastest is reported")
+    args = parser.parse_args()
+
+    df = synthetic_frame(args.stations, args.years, args.tz)
+    build_seconds, series = best_of(args.repeat, lambda: CompactSeries.from_frame(df))
+    print(f"{len(df)} points, CompactSeries built in {build_seconds:.3f}s")
+
+    print(f"{'grouping':<18} {'pandas (s)':>10} {'compact (s)':>11} {'speedup':>8} {'max diff':>9}")
+    for weekday in (False, True):
+        pandas_seconds, (grouped_df, expected) = best_of(args.repeat, lambda: pandas_profile(df, weekday))
+        compact_seconds, profile = best_of(args.repeat, lambda: series.profile(weekday))
+        # Values are compared at float32 precision, which is what the compact series stores
+        difference = np.nanmax(np.abs(expected.to_numpy() - profile.to_numpy()) / np.maximum(np.abs(expected.to_numpy()), 1))
+        name = 'day of week, hour' if weekday else 'hour'
+        print(f"{name:<18} {pandas_seconds:>10.3f} {compact_seconds:>11.3f} "
+              f"{pandas_seconds / compact_seconds:>7.1f}x {difference:>9.1e}")
+
+    print(f"{'memory':<18} {grouped_df.memory_usage(deep=True).sum() / 2 ** 20:>9.1f}M "
+          f"{series.nbytes / 2 ** 20:>10.1f}M {grouped_df.memory_usage(deep=True).sum() / series.nbytes:>7.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+import argparse
+import io
+import os
+import sys
+import time
+from pathlib import Path
+from urllib.parse import quote
+
+import numpy as np
+import pandas as pd
+import psycopg2
+
+os.environ['MPLBACKEND'] = 'Agg'
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "scripts"))
+sys.path.insert(0, str(ROOT))
+
+import datasource
+import downsample
+from line_graph_y import plot_tables
+
+
+def create_tables(conn, tables, years, seed=0):
+    """Fills plain (rollup-free) tables with hourly synthetic series through COPY."""
+    rng = np.random.default_rng(seed)
+    times = pd.date_range('2015-01-01', periods=round(24 * 365 * years), freq='h')
+    with conn.cursor() as cur:
+        for table in tables:
+            values = (30 + 10 * np.sin(np.arange(len(times)) * 2 * np.pi / 24)
+                      + 15 * np.sin(np.arange(len(times)) * 2 * np.pi / 8760) + rng.normal(0, 4, len(times)))
+            cur.execute(f"DROP TABLE IF EXISTS {table}")
+            cur.execute(f"CREATE TABLE {table} (datetime TIMESTAMP PRIMARY KEY, value REAL)")
+            buffer = io.StringIO()
+            pd.DataFrame({'datetime': times, 'value': values}).to_csv(buffer, header=False, index=False)
+            buffer.seek(0)
+            cur.copy_expert(f"COPY {table} (datetime, value) FROM STDIN WITH (FORMAT csv)", buffer)
+    conn.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time exact and downsampled line plots of many long series.")
+    parser.add_argument("--host", default="localhost", help="PostgreSQL database host")
+    parser.add_argument("--dbname", default="air_quality", help="PostgreSQL database name")
+    parser.add_argument("--user", default="postgres", help="PostgreSQL user")
+    parser.add_argument("--tables", type=int, default=4, help="Number of synthetic tables plotted together")
+    parser.add_argument("--years", type=float, default=10, help="Years of hourly data per table")
+    parser.add_argument("--width", type=int, default=downsample.DEFAULT_WIDTH, help="Pixel columns to downsample to")
+    args = parser.parse_args()
+
+    tables = [f"Bench_plot_{i}_pm10" for i in range(args.tables)]
+    source = f"postgresql://{args.user}@{quote(args.host, safe='')}/{args.dbname}"
+    with psycopg2.connect(host=args.host, dbname=args.dbname, user=args.user) as conn:
+        create_tables(conn, tables, args.years)
+        try:
+            # The first figure pays for Matplotlib's font and backend setup, keep it out of the timings
+            plot_tables({'warm-up': pd.DataFrame({'timestamp': [0, 1], 'value': [0, 1]})}, os.devnull)
+            print(f"{'method':<8} {'points':>10} {'query (s)':>10} {'render (s)':>11}")
+            for method in downsample.METHODS:
+                start = time.perf_counter()
+                data = {table: datasource.load_downsampled(table, source=source, width=args.width, method=method)
+                        .rename(columns={'datetime': 'timestamp'}) for table in tables}
+                query_seconds = time.perf_counter() - start
+                start = time.perf_counter()
+                plot_tables(data, os.devnull)
+                render_seconds = time.perf_counter() - start
+                points = sum(len(df) for df in data.values())
+                print(f"{method:<8} {points:>10} {query_seconds:>10.3f} {render_seconds:>11.3f}")
+        finally:
+            with conn.cursor() as cur:
+                for table in tables:
+                    cur.execute(f"DROP TABLE IF EXISTS {table}")
+            conn.commit()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
+
+import extract
+from stub_openaq import start_stub_server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure extraction pages/sec against a local stub API.")
+    parser.add_argument("--locations", type=int, default=16, help="Number of synthetic locations")
+    parser.add_argument("--days", type=int, default=30, help="Length of the extraction window in days")
+    parser.add_argument("--latency", type=float, default=0.05, help="Simulated round trip per request in seconds")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8, 16], help="Worker counts to try")
+    parser.add_argument("--shard", choices=sorted(extract.SHARD_FREQUENCIES),
+                        help="Also split each pair's window into time shards")
+    parser.add_argument("--shard-workers", type=int, default=extract.DEFAULT_SHARD_WORKERS,
+                        help="Shards of one pair fetched at the same time")
+    args = parser.parse_args()
+
+    server, url = start_stub_server(latency=args.latency)
+    pairs = [(f"Station {i}", parameter) for i in range(args.locations) for parameter in ('pm10', 'pm25')]
+    start = datetime(2022, 1, 1, tzinfo=timezone.utc)
+    start_date = start.isoformat()
+    end_date = (start + timedelta(days=args.days)).isoformat()
+
+    print(f"{'workers':>8} {'pages':>8} {'seconds':>9} {'pages/s':>9}")
+    for workers in args.concurrency:
+        with tempfile.TemporaryDirectory() as tmp:
+            cwd = os.getcwd()
+            os.chdir(tmp)
+            try:
+                started = time.perf_counter()
+                # The rate limit is lifted so the benchmark measures the engine, not the API budget
+                summary = extract.fetch_pairs(pairs, start_date, end_date, workers=workers,
+                                              rate_limit=10 ** 6, url=url, shard=args.shard,
+                                              shard_workers=args.shard_workers)
+                elapsed = time.perf_counter() - started
+            finally:
+                os.chdir(cwd)
+        pages = sum(result['pages'] for result in summary.values())
+        print(f"{workers:>8} {pages:>8} {elapsed:>9.2f} {pages / elapsed:>9.1f}")
+
+    server.shutdown()
+
+if __name__ == "__main__":
+    main()
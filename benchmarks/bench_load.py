@@ -0,0 +1,56 @@
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import psycopg2
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
+
+import load
+import rollups
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare executemany and COPY load throughput.")
+    parser.add_argument("--host", default="localhost", help="PostgreSQL database host")
+    parser.add_argument("--dbname", default="air_quality", help="PostgreSQL database name")
+    parser.add_argument("--user", default="postgres", help="PostgreSQL user")
+    parser.add_argument("--batch_size", type=int, default=load.DEFAULT_BATCH_SIZE, help="Rows per COPY batch")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per method and file")
+    args = parser.parse_args()
+
+    files = sorted(ROOT.glob("measurements_SANTA_ANITA_*.csv"))
+
+    print(f"{'method':<8} {'file':<36} {'rows':>6} {'best (s)':>9} {'rows/s':>9}")
+    with psycopg2.connect(host=args.host, dbname=args.dbname, user=args.user) as conn:
+        for method in ('insert', 'copy'):
+            for csv_file in files:
+                table_name = f"bench_load_{method}"
+                best = None
+                for _ in range(args.repeat):
+                    with conn.cursor() as cur:
+                        for name in (table_name,) + tuple(table_name + suffix for suffix in rollups.SUFFIXES):
+                            cur.execute(f"DROP TABLE IF EXISTS {name}")
+                        load.create_table(cur, table_name)
+                        conn.commit()
+
+                        start = time.perf_counter()
+                        if method == 'copy':
+                            rows = load.copy_rows(cur, csv_file, table_name, args.batch_size)
+                        else:
+                            rows = load.insert_rows(cur, csv_file, table_name)
+                        conn.commit()
+                        elapsed = time.perf_counter() - start
+                    best = elapsed if best is None else min(best, elapsed)
+                print(f"{method:<8} {csv_file.name:<36} {rows:>6} {best:>9.3f} {rows / best:>9.0f}")
+
+        with conn.cursor() as cur:
+            for method in ('insert', 'copy'):
+                for suffix in ('',) + rollups.SUFFIXES:
+                    cur.execute(f"DROP TABLE IF EXISTS bench_load_{method}{suffix}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
+
+import outliers
+
+
+def synthetic_hourly(points, seed=0):
+    """Hourly series with daily and yearly cycles, noise, isolated spikes and a few gaps."""
+    rng = np.random.default_rng(seed)
+    hours = np.arange(points)
+    values = (30 + 10 * np.sin(hours * 2 * np.pi / 24) + 15 * np.sin(hours * 2 * np.pi / 8760)
+              + rng.normal(0, 4, points))
+    spikes = rng.random(points) < 0.002
+    values[spikes] += rng.uniform(60, 200, spikes.sum())
+    values[rng.random(points) < 0.001] = np.nan
+    return values, spikes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the throughput of each outlier detection method.")
+    parser.add_argument("--points", type=int, default=1_000_000, help="Length of the hourly series")
+    parser.add_argument("--window", type=int, default=outliers.DEFAULT_WINDOW, help="Window length in hours")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per method, the fastest is reported")
+    args = parser.parse_args()
+
+    values, spikes = synthetic_hourly(args.points)
+    runs = [(method, 'numpy') for method in outliers.METHODS]
+    if outliers.HAS_NUMBA:
+        # The first call compiles the kernel, so it is warmed up outside the timing
+        outliers.detect(values[:1000], 'hampel', args.window, engine='numba')
+        runs.append(('hampel', 'numba'))
+
+    print(f"{'method':<16} {'engine':<7} {'seconds':>8} {'points/s':>12} {'flagged':>8} {'spikes found':>12}")
+    for method, engine in runs:
+        best = float('inf')
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            flags, _ = outliers.detect(values, method, args.window, engine=engine)
+            best = min(best, time.perf_counter() - start)
+        found = (flags & spikes).sum() / max(spikes.sum(), 1)
+        print(f"{method:<16} {engine:<7} {best:>8.3f} {args.points / best:>12.0f} {flags.sum():>8} {found:>12.1%}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+import argparse
+import http.client
+import json
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "scripts"))
+
+from load import NOTIFY_CHANNEL
+
+
+def request(conn, path):
+    """GETs a path over a kept-alive connection and returns (seconds, X-Cache outcome)."""
+    start = time.perf_counter()
+    conn.request('GET', path)
+    response = conn.getresponse()
+    response.read()
+    if response.status != 200:
+        raise RuntimeError(f"GET {path}: {response.status}")
+    return time.perf_counter() - start, response.headers['X-Cache']
+
+
+def wait_ready(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port)
+            request(conn, '/cache')
+            return conn
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare cold and cached dashboard requests to the analytics service.")
+    parser.add_argument("--source", required=True, help="Data source URL served by service.py")
+    parser.add_argument("--tables", help="Comma-separated tables (default: every table of the source)")
+    parser.add_argument("--start_date", default='2022-01-01', help="Start date of the requests")
+    parser.add_argument("--end_date", default='2022-07-01', help="End date of the requests")
+    parser.add_argument("--tz", default='America/Lima', help="Timezone of the requests")
+    parser.add_argument("--repeat", type=int, default=20, help="Cached requests per endpoint")
+    parser.add_argument("--port", type=int, default=8059, help="Port of the service started by the benchmark")
+    args = parser.parse_args()
+
+    service = subprocess.Popen([sys.executable, '-W', 'ignore', str(ROOT / 'service.py'), '--source', args.source,
+                                '--port', str(args.port)], stdout=subprocess.DEVNULL)
+    try:
+        conn = wait_ready(args.port)
+        if args.tables:
+            tables = args.tables.split(',')
+        else:
+            conn.request('GET', '/tables')
+            tables = json.loads(conn.getresponse().read())
+        query = f"start={args.start_date}&end={args.end_date}&tz={args.tz}"
+        paths = [f"/summary?start={args.start_date}&end={args.end_date}"]
+        for table in tables:
+            paths += [f"/avgday/{table}?{query}", f"/hourstats/{table}?{query}&weekday=1",
+                      f"/series/{table}?{query}", f"/avgday/{table}?{query}&format=png"]
+
+        print(f"{'request':<64} {'cold (ms)':>10} {'cached (ms)':>12}")
+        for path in paths:
+            cold, _ = request(conn, path)
+            cached = statistics.median(request(conn, path)[0] for _ in range(args.repeat))
+            print(f"{path[:64]:<64} {cold * 1000:>10.1f} {cached * 1000:>12.2f}")
+
+        if args.source.startswith('postgres'):
+            import psycopg2
+
+            with psycopg2.connect(args.source) as db, db.cursor() as cur:
+                cur.execute("SELECT pg_notify(%s, %s)", (NOTIFY_CHANNEL, tables[0]))
+            time.sleep(0.2)
+            seconds, outcome = request(conn, paths[1])
+            print(f"after a load of {tables[0]}: {paths[1]} -> {outcome} ({seconds * 1000:.1f} ms)")
+    finally:
+        service.terminate()
+        service.wait()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from aq import COMMANDS
+
+HEAVY = ('pandas', 'numpy', 'matplotlib', 'seaborn', 'psycopg2', 'pyarrow', 'duckdb', 'requests', 'yaml')
+# Only plotting code paths may import these, never --help or a summary
+PLOTTING = ('matplotlib', 'seaborn')
+# Runs aq.py and reports on exit which of HEAVY ended up in sys.modules
+WRAPPER = f"""
+import atexit, sys
+sys.argv = ['aq.py', *sys.argv[1:]]
+atexit.register(lambda: print('HEAVY:' + ','.join(m for m in {HEAVY!r} if m in sys.modules), file=sys.stderr))
+sys.path.insert(0, {str(ROOT)!r})
+import aq
+aq.main()
+"""
+
+
+def run(argv, repeat):
+    """Median wall time of `aq argv...` over `repeat` runs, and the heavy modules it imported."""
+    times, heavy = [], []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = subprocess.run([sys.executable, '-W', 'ignore', '-c', WRAPPER, *argv],
+                                capture_output=True, text=True, cwd=ROOT)
+        times.append(time.perf_counter() - start)
+        lines = [line for line in result.stderr.splitlines() if line.startswith('HEAVY:')]
+        if result.returncode != 0 or not lines:
+            raise RuntimeError(f"aq {' '.join(argv)} failed:\n{result.stderr}")
+        heavy = [module for module in lines[-1][len('HEAVY:'):].split(',') if module]
+    return statistics.median(times), heavy
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the startup time and imports of every aq subcommand.")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per command (the median is reported)")
+    parser.add_argument("--source", default=f"duckdb://{ROOT}",
+                        help="Data source of the real 'aq summary' run (default: the cleaned CSV files of the repo)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        subprocess.run([sys.executable, '-c', 'pass'])
+    bare = (time.perf_counter() - start) / args.repeat
+
+    cases = [['--help']] + [[command, '--help'] for command in COMMANDS]
+    cases.append(['summary', '--source', args.source, '--csv', os.devnull])
+
+    print(f"bare interpreter: {bare:.3f}s")
+    print(f"{'command':<44} {'seconds':>8}  imported")
+    failures = []
+    for argv in cases:
+        seconds, heavy = run(argv, args.repeat)
+        print(f"{'aq ' + ' '.join(argv):<44} {seconds:>8.3f}  {', '.join(heavy) or '-'}")
+        failures += [f"aq {' '.join(argv)} imports {module}" for module in heavy if module in PLOTTING]
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
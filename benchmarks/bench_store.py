@@ -0,0 +1,55 @@
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
+
+import store
+from bench_clean_many import synthetic_series
+
+
+def dir_size(path):
+    return sum(f.stat().st_size for f in Path(path).rglob('*') if f.is_file())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare CSV and columnar store read/write time and size.")
+    parser.add_argument("--series", type=int, default=10, help="Number of synthetic series")
+    parser.add_argument("--hours", type=int, default=8760, help="Hours per series")
+    args = parser.parse_args()
+
+    df = synthetic_series(args.series, args.hours)
+    df['datetime'] = pd.to_datetime(df['datetime']).dt.tz_localize('UTC')
+    series = [(location, parameter, frame[['datetime', 'value']])
+              for (location, parameter), frame in df.groupby(['location', 'parameter'])]
+
+    print(f"{args.series} series, {len(df)} rows")
+    print(f"{'format':<8} {'write (s)':>10} {'read (s)':>10} {'size (MB)':>10}")
+    for fmt in ('csv', 'parquet', 'arrow'):
+        with tempfile.TemporaryDirectory() as tmp:
+            start = time.perf_counter()
+            for location, parameter, frame in series:
+                if fmt == 'csv':
+                    frame.to_csv(Path(tmp) / f"measurements_{location.replace(' ', '_')}_{parameter}.csv", index=False)
+                else:
+                    store.write_series(tmp, store.CLEAN, location, parameter, frame, fmt=fmt)
+            write = time.perf_counter() - start
+
+            # Reads include datetime parsing, which is what clean/load/plotting pay for CSV
+            start = time.perf_counter()
+            for location, parameter, _ in series:
+                if fmt == 'csv':
+                    frame = pd.read_csv(Path(tmp) / f"measurements_{location.replace(' ', '_')}_{parameter}.csv")
+                    frame['datetime'] = pd.to_datetime(frame['datetime'])
+                else:
+                    store.read_series(tmp, store.CLEAN, location, parameter)
+            read = time.perf_counter() - start
+
+            print(f"{fmt:<8} {write:>10.3f} {read:>10.3f} {dir_size(tmp) / 1e6:>10.2f}")
+
+if __name__ == "__main__":
+    main()
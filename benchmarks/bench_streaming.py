@@ -0,0 +1,106 @@
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import psycopg2
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
+
+import rollups
+from stub_openaq import start_stub_server
+
+ROOT = Path(__file__).resolve().parent.parent
+
+CONFIG = """extract:
+  locations: [{locations}]
+  parameters: [pm10, pm25]
+  start_date: 2022-01-01T00:00:00Z
+  end_date: {end_date}
+  base_url: {url}
+load:
+  host: {host}
+  dbname: {dbname}
+  user: {user}
+"""
+
+
+def drop_tables(conn, tables):
+    with conn.cursor() as cur:
+        for table in tables:
+            for name in (table,) + tuple(table + suffix for suffix in rollups.SUFFIXES):
+                cur.execute(f"DROP TABLE IF EXISTS {name}")
+    conn.commit()
+
+
+def watch_first_row(conn, tables, started, stop, result):
+    """Polls the target tables until one of them has a row and records when that happened."""
+    while not stop.is_set():
+        for table in tables:
+            with conn.cursor() as cur:
+                cur.execute("SELECT to_regclass(%s) IS NOT NULL", [table.lower()])
+                if cur.fetchone()[0]:
+                    cur.execute(f"SELECT EXISTS (SELECT 1 FROM {table})")
+                    if cur.fetchone()[0]:
+                        result['first_row'] = time.perf_counter() - started
+                        return
+            conn.commit()
+        time.sleep(0.02)
+
+
+def run(mode, config_path, workdir, conn, tables):
+    """Runs orchestrate.py in one mode and returns (wall seconds, first-row seconds, peak RSS in MB)."""
+    drop_tables(conn, tables)
+    result = {'first_row': None}
+    stop = threading.Event()
+
+    started = time.perf_counter()
+    watcher = threading.Thread(target=watch_first_row, args=(conn, tables, started, stop, result))
+    watcher.start()
+    process = subprocess.Popen([sys.executable, '-W', 'ignore', str(ROOT / 'orchestrate.py'),
+                                '--config', str(config_path), mode],
+                               cwd=workdir, stdout=subprocess.DEVNULL)
+    # wait4 reports the largest RSS of the child and the workers it spawned
+    _, _, usage = os.wait4(process.pid, 0)
+    elapsed = time.perf_counter() - started
+    stop.set()
+    watcher.join()
+    return elapsed, result['first_row'], usage.ru_maxrss / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the file-based and the streaming pipeline end to end.")
+    parser.add_argument("--host", default="localhost", help="PostgreSQL database host")
+    parser.add_argument("--dbname", default="air_quality", help="PostgreSQL database name")
+    parser.add_argument("--user", default="postgres", help="PostgreSQL user")
+    parser.add_argument("--locations", type=int, default=2, help="Number of synthetic locations")
+    parser.add_argument("--days", type=int, default=60, help="Length of the extraction window in days")
+    parser.add_argument("--latency", type=float, default=0.05, help="Simulated round trip per request in seconds")
+    args = parser.parse_args()
+
+    server, url = start_stub_server(latency=args.latency)
+    locations = [f"Bench {i}" for i in range(args.locations)]
+    tables = [f"Bench_{i}_{parameter}" for i in range(args.locations) for parameter in ('pm10', 'pm25')]
+    end_date = (datetime(2022, 1, 1) + timedelta(days=args.days)).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+    print(f"{'mode':<12} {'wall (s)':>9} {'first row (s)':>13} {'peak RSS (MB)':>14}")
+    with tempfile.TemporaryDirectory() as workdir, \
+            psycopg2.connect(host=args.host, dbname=args.dbname, user=args.user) as conn:
+        config_path = Path(workdir) / 'config.yaml'
+        config_path.write_text(CONFIG.format(locations=', '.join(locations), end_date=end_date, url=url,
+                                             host=args.host, dbname=args.dbname, user=args.user))
+        for mode in ('--parallel', '--streaming'):
+            elapsed, first_row, peak_mb = run(mode, config_path, workdir, conn, tables)
+            first = f"{first_row:.2f}" if first_row is not None else "-"
+            print(f"{mode.lstrip('-'):<12} {elapsed:>9.2f} {first:>13} {peak_mb:>14.0f}")
+        drop_tables(conn, tables)
+
+    server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from urllib.parse import quote
+
+import pandas as pd
+
+os.environ['MPLBACKEND'] = 'Agg'
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "scripts"))
+sys.path.insert(0, str(ROOT))
+
+import clean
+import extract
+import load
+import rollups
+from stub_openaq import start_stub_server
+
+DEFAULT_BASELINE = Path(__file__).resolve().parent / 'baseline.json'
+# Slowdowns smaller than this many seconds are timer noise, whatever their relative size
+NOISE_FLOOR = 0.05
+
+
+def timed(results, stage, func, rows=None):
+    """Runs func() quietly, records its wall time (and rows/s when `rows` is given) under `stage`."""
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        value = func()
+    seconds = time.perf_counter() - start
+    entry = {'seconds': round(seconds, 4)}
+    count = rows(value) if callable(rows) else rows
+    if count is not None:
+        entry['rows'] = count
+        entry['rows_per_s'] = round(count / max(seconds, 1e-9), 1)
+    results[stage] = entry
+    print(f"{stage:<28} {seconds:>9.3f}s" + (f" {entry['rows_per_s']:>12.0f} rows/s" if count is not None else ""))
+    return value
+
+
+def bench_pipeline(args, workdir, results):
+    """Extract from the mock API, clean every file, then load and analyse them if a database is reachable."""
+    server, url = start_stub_server(latency=args.latency, gap_rate=args.gap_rate,
+                                    sentinel_rate=args.sentinel_rate, outlier_rate=args.outlier_rate)
+    pairs = [(f"Bench {i}", parameter) for i in range(args.stations) for parameter in args.parameters]
+    start = datetime(2022, 1, 1, tzinfo=timezone.utc)
+    end = start + timedelta(days=round(365 * args.years))
+
+    summary = timed(results, 'extract', lambda: extract.fetch_pairs(
+        pairs, start.isoformat(), end.isoformat(), workers=args.workers, rate_limit=10 ** 6, url=url),
+        rows=lambda summary: sum(result['rows'] for result in summary.values()))
+    server.shutdown()
+    files = [result['file'] for result in summary.values()]
+
+    raw_rows = sum(result['rows'] for result in summary.values())
+    raw = {path: Path(path).read_text() for path in files}
+    timed(results, 'clean', lambda: [clean.check_missing_times_and_outliers(path) for path in files],
+          rows=raw_rows)
+    cleaned = {path: Path(path).read_text() for path in files}
+
+    for path, text in raw.items():
+        Path(path).write_text(text)
+    timed(results, 'clean_streaming', lambda: [clean.clean_streaming(path, args.chunksize) for path in files],
+          rows=raw_rows)
+
+    long_frame = pd.concat([pd.read_csv(io.StringIO(text), header=None, names=clean.COLUMN_NAMES).assign(file=path)
+                            for path, text in raw.items()])
+    timed(results, 'clean_many', lambda: clean.clean_many(long_frame, keys=('file',)), rows=raw_rows)
+    for path, text in cleaned.items():
+        Path(path).write_text(text)
+
+    if args.host is None:
+        print("No --host given, skipping the load and analysis stages")
+        return
+
+    import psycopg2
+    try:
+        psycopg2.connect(host=args.host, dbname=args.dbname, user=args.user).close()
+    except psycopg2.OperationalError as e:
+        print(f"Database not reachable ({e.__class__.__name__}), skipping the load and analysis stages")
+        return
+
+    tables = [f"Bench_{location.split()[1]}_{parameter}" for location, parameter in pairs]
+    try:
+        timed(results, 'load', lambda: sum(
+            load.create_and_populate_table(path, table, args.host, args.dbname, args.user)
+            for path, table in zip(files, tables)), rows=lambda rows: rows)
+        bench_analysis(args, workdir, tables, start, end, results)
+    finally:
+        with psycopg2.connect(host=args.host, dbname=args.dbname, user=args.user) as conn:
+            with conn.cursor() as cur:
+                for table in tables:
+                    for suffix in ('',) + rollups.SUFFIXES:
+                        cur.execute(f"DROP TABLE IF EXISTS {table}{suffix}")
+
+
+def bench_analysis(args, workdir, tables, start, end, results):
+    """Times what each plotting/statistics script does for one table, then the combined report."""
+    import datasource
+    import report
+    from average_day import plot_average_day
+    from crtanje import plot_day_of_week
+    from crtanje2 import plot_hourly_boxplot
+    from crtanje3 import plot_stats_table
+    from crtanje4 import plot_day_tables
+    from line_graph_y import plot_tables
+
+    source = f"postgresql://{args.user}@{quote(args.host, safe='')}/{args.dbname}"
+    table, tz = tables[0], args.tz
+    start_date, end_date = start.date().isoformat(), end.date().isoformat()
+    out = Path(workdir) / 'figures'
+    out.mkdir()
+
+    def day_of_week():
+        profile = datasource.hour_profile(table, start_date, end_date, tz, weekday=True, source=source,
+                                          approximate=True)
+        totals = (profile['mean'] * profile['count']).groupby(level='hour').sum()
+        overall = totals / profile['count'].groupby(level='hour').sum()
+        plot_day_of_week(profile['mean'].unstack(level=0), overall, out / 'data_plot.png')
+
+    scripts = {
+        'average_day.py': lambda: plot_average_day(
+            datasource.hour_profile(table, start_date, end_date, tz, source=source, approximate=True)['mean'],
+            'Average Day',
+            out / 'average_day.png'),
+        'crtanje.py': day_of_week,
+        'crtanje2.py': lambda: plot_hourly_boxplot(
+            datasource.load_series(table, start_date, end_date, tz, source), out / 'data_boxplot.png'),
+        'crtanje3.py': lambda: plot_stats_table(
+            datasource.hour_profile(table, start_date, end_date, tz, source=source)[['mean', 'median']],
+            out / 'hourly_stats_table.png'),
+        'crtanje4.py': lambda: plot_day_tables(
+            datasource.hour_profile(table, start_date, end_date, tz, weekday=True, source=source)[['mean', 'median']],
+            str(out / 'hourly_stats_{day}.png')),
+        'line_graph_y.py': lambda: plot_tables(
+            {name: datasource.load_downsampled(name, start_date, end_date, source=source).rename(
+                columns={'datetime': 'timestamp'}) for name in tables}, out / 'plot_from_multiple_tables.png'),
+        'summary.py': lambda: datasource.summaries(tables, start_date, end_date, source),
+    }
+    for name, func in scripts.items():
+        timed(results, name, func)
+    timed(results, 'report.py', lambda: report.build_report(tables, start_date, end_date, tz, source,
+                                                            out / 'report', args.workers))
+
+
+def compare(results, baseline, tolerance):
+    """Returns the stages that got slower than the baseline by more than `tolerance` (a fraction)."""
+    regressions = []
+    for stage, entry in results['stages'].items():
+        before = baseline['stages'].get(stage)
+        if before is None:
+            continue
+        change = entry['seconds'] / max(before['seconds'], 1e-9) - 1
+        regressed = change > tolerance and entry['seconds'] - before['seconds'] > NOISE_FLOOR
+        marker = "REGRESSION" if regressed else ""
+        print(f"{stage:<28} {before['seconds']:>9.3f}s -> {entry['seconds']:>9.3f}s {change:>+8.1%} {marker}")
+        if regressed:
+            regressions.append(stage)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time every pipeline stage on synthetic data and compare with a baseline.")
+    parser.add_argument("--stations", type=int, default=4, help="Number of synthetic stations")
+    parser.add_argument("--parameters", nargs="+", default=['pm10', 'pm25'], help="Parameters per station")
+    parser.add_argument("--years", type=float, default=1, help="Years of hourly data per series")
+    parser.add_argument("--gap-rate", type=float, default=0.05, help="Share of hours missing from the API")
+    parser.add_argument("--sentinel-rate", type=float, default=0.02, help="Share of hours reported as -999")
+    parser.add_argument("--outlier-rate", type=float, default=0.005, help="Share of hours reported at 10x their value")
+    parser.add_argument("--latency", type=float, default=0.0, help="Simulated API round trip per request in seconds")
+    parser.add_argument("--workers", type=int, default=4, help="Extract threads and report processes")
+    parser.add_argument("--chunksize", type=int, default=1000, help="Rows per chunk for clean_streaming")
+    parser.add_argument("--tz", default='UTC', help="Timezone for the analysis stages")
+    parser.add_argument("--host", help="PostgreSQL host (load and analysis stages are skipped without it)")
+    parser.add_argument("--dbname", default="air_quality", help="PostgreSQL database name")
+    parser.add_argument("--user", default="postgres", help="PostgreSQL user")
+    parser.add_argument("--output", default="benchmark_results.json", help="Where to write this run's results")
+    parser.add_argument("--baseline", default=str(DEFAULT_BASELINE), help="Baseline results to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="Store this run as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="Slowdown (fraction) above which a stage is flagged as a regression")
+    args = parser.parse_args()
+
+    results = {
+        'created': datetime.now(timezone.utc).isoformat(),
+        'machine': {'platform': platform.platform(), 'python': platform.python_version(), 'cpus': os.cpu_count()},
+        'scale': {'stations': args.stations, 'parameters': args.parameters, 'years': args.years,
+                  'gap_rate': args.gap_rate, 'sentinel_rate': args.sentinel_rate, 'outlier_rate': args.outlier_rate},
+        'stages': {},
+    }
+
+    with tempfile.TemporaryDirectory() as workdir:
+        cwd = os.getcwd()
+        os.chdir(workdir)
+        try:
+            bench_pipeline(args, workdir, results['stages'])
+        finally:
+            os.chdir(cwd)
+
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+        return
+
+    if os.path.exists(args.baseline):
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)
+        if baseline['scale'] != results['scale']:
+            print("Baseline was recorded at a different scale, timings are not comparable")
+            return
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} stage(s) slower than the baseline by more than {args.tolerance:.0%}")
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
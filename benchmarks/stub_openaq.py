@@ -0,0 +1,131 @@
+import argparse
+import json
+import math
+import threading
+import time
+import zlib
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+
+def parse_iso(value):
+    """Parses an ISO 8601 timestamp (with or without a trailing Z) into an aware UTC datetime."""
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+
+def synthetic_value(location, parameter, hour_index):
+    """Deterministic, vaguely realistic concentration for a given hour."""
+    seed = sum(map(ord, location + parameter))
+    return round(30 + 15 * math.sin((hour_index + seed) * 2 * math.pi / 24) + (seed % 7), 2)
+
+
+def _draw(location, parameter, hour):
+    """Deterministic uniform number in [0, 1) for one hour of one series."""
+    return zlib.crc32(f"{location}|{parameter}|{hour}".encode()) / 2 ** 32
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Serves OpenAQ v2 shaped /v2/measurements pages of hourly synthetic data.
+
+    The gap, sentinel and outlier rates make some hours missing, -999 or ten times their
+    usual value, decided per hour so every window and page agrees on them.
+    """
+
+    latency = 0.0
+    gap_rate = 0.0
+    sentinel_rate = 0.0
+    outlier_rate = 0.0
+
+    def measurement(self, location, parameter, hour):
+        value = synthetic_value(location, parameter, hour)
+        draw = _draw(location, parameter, hour) - self.gap_rate
+        if 0 <= draw < self.sentinel_rate:
+            return -999
+        if 0 <= draw - self.sentinel_rate < self.outlier_rate:
+            return round(value * 10, 2)
+        return value
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+
+        if self.latency:
+            time.sleep(self.latency)
+
+        start = parse_iso(query['date_from'])
+        end = parse_iso(query['date_to'])
+        limit = int(query.get('limit', 100))
+        page = int(query.get('page', 1))
+
+        # Whole UTC hours in (date_from, date_to], so any split of a range returns the same rows
+        hours = range(int(start.timestamp() // 3600) + 1, int(end.timestamp() // 3600) + 1)
+        if self.gap_rate:
+            hours = [hour for hour in hours if _draw(query['location'], query['parameter'], hour) >= self.gap_rate]
+        total_hours = len(hours)
+        first = (page - 1) * limit
+        results = []
+        for hour in hours[first:first + limit]:
+            ts = datetime.fromtimestamp(hour * 3600, timezone.utc)
+            results.append({
+                'location': query['location'],
+                'parameter': query['parameter'],
+                'value': self.measurement(query['location'], query['parameter'], hour),
+                'date': {'utc': ts.isoformat(), 'local': ts.isoformat()},
+                'unit': 'µg/m³',
+            })
+
+        body = json.dumps({
+            'meta': {'name': 'openaq-api', 'page': page, 'limit': limit, 'found': total_hours},
+            'results': results,
+        }).encode()
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub_server(port=0, latency=0.0, gap_rate=0.0, sentinel_rate=0.0, outlier_rate=0.0):
+    """Starts the stub server on a background thread.
+
+    Args:
+        port (int): Port to listen on (0 picks a free port).
+        latency (float): Artificial delay per request in seconds, to mimic network round trips.
+        gap_rate (float): Share of hours left out of the responses.
+        sentinel_rate (float): Share of hours reported as -999.
+        outlier_rate (float): Share of hours reported at ten times their value.
+
+    Returns:
+        tuple: The running server and the measurements URL to point the extractor at.
+    """
+    handler = type('Handler', (StubHandler,), {'latency': latency, 'gap_rate': gap_rate,
+                                               'sentinel_rate': sentinel_rate, 'outlier_rate': outlier_rate})
+    server = ThreadingHTTPServer(('127.0.0.1', port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/v2/measurements"
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a local stub of the OpenAQ measurements API.")
+    parser.add_argument("--port", type=int, default=8000, help="Port to listen on")
+    parser.add_argument("--latency", type=float, default=0.0, help="Artificial delay per request in seconds")
+    parser.add_argument("--gap-rate", type=float, default=0.0, help="Share of hours left out")
+    parser.add_argument("--sentinel-rate", type=float, default=0.0, help="Share of hours reported as -999")
+    parser.add_argument("--outlier-rate", type=float, default=0.0, help="Share of hours reported at 10x their value")
+    args = parser.parse_args()
+
+    server, url = start_stub_server(args.port, args.latency, args.gap_rate, args.sentinel_rate, args.outlier_rate)
+    print(f"Serving stub OpenAQ API at {url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -1,48 +1,18 @@
 import argparse
-import pandas as pd
-import matplotlib.pyplot as plt
-import pytz
-from sqlalchemy import create_engine
 
+import datasource
 
-def main():
-    # Argument parsing
-    parser = argparse.ArgumentParser(description="Generate plots and statistics from PostgreSQL data.")
-    parser.add_argument("host", help="PostgreSQL server hostname/IP")
-    parser.add_argument("database", help="Database name")
-    parser.add_argument("username", help="Database username")
-    parser.add_argument("table", help="Table name")
-    parser.add_argument("start_date", help="Start date (YYYY-MM-DD)")
-    parser.add_argument("end_date", help="End date (YYYY-MM-DD)")
-    parser.add_argument("utc_offset", type=int, help="UTC offset (for target timezone)")
-    args = parser.parse_args()
 
-    # Database connection (Modify with your credentials)
-    engine = create_engine(f"postgresql://{args.username}@localhost/{args.database}")  # No password
+def plot_day_of_week(day_averages, overall_average, output_file='data_plot.png'):
+    """Plots one hourly average line per day of the week, with the overall average on top.
 
-    # Data query 
-    sql = f"""  
-    SELECT datetime, value
-    FROM {args.table}
-    WHERE datetime >= '{args.start_date}' AND datetime < '{args.end_date}'
+    Args:
+        day_averages (pd.DataFrame): Mean value indexed by hour, one column per day.
+        overall_average (pd.Series): Mean value indexed by hour over all days.
+        output_file (str): Output image path.
     """
+    import matplotlib.pyplot as plt
 
-    df = pd.read_sql(sql, engine)
-
-    # Timezone conversion 
-    target_timezone = pytz.timezone('Etc/GMT{}'.format(-args.utc_offset)) 
-    df['datetime'] = df['datetime'].dt.tz_localize('UTC').dt.tz_convert(target_timezone)
-
-    # Day-of-week grouping and averaging
-    df['day_of_week'] = df['datetime'].dt.day_name()
-    df['hour'] = df['datetime'].dt.hour  # Capture the hour
-    grouped = df.groupby(['day_of_week', 'hour'])['value']
-    day_averages = grouped.mean().unstack(level=0)  # Unstack for plotting
-
-    # Overall average
-    overall_average = df.groupby('hour')['value'].mean()
-
-    # Plotting
     plt.figure(figsize=(10, 6))
 
     for day, data in day_averages.items():
@@ -56,8 +26,38 @@ def main():
     plt.legend()
     plt.grid(True)
 
-    # Save the plot
-    plt.savefig('data_plot.png')
+    plt.savefig(output_file)
+    plt.close()
+
+
+def main():
+    # Argument parsing
+    parser = argparse.ArgumentParser(description="Generate plots and statistics from PostgreSQL data.")
+    parser.add_argument("host", help="PostgreSQL server hostname/IP")
+    parser.add_argument("database", help="Database name")
+    parser.add_argument("username", help="Database username")
+    parser.add_argument("table", help="Table name")
+    parser.add_argument("start_date", help="Start date (YYYY-MM-DD)")
+    parser.add_argument("end_date", help="End date (YYYY-MM-DD)")
+    parser.add_argument("utc_offset", help="UTC offset in hours, or an IANA timezone name (for target timezone)")
+    parser.add_argument("--source", help="Data source URL (default: PostgreSQL from host/database/username, "
+                                         "or duckdb:///path/to/cleaned/files or binary:///path/to/f32/files to run offline)")
+    args = parser.parse_args()
+
+    # Data query, with timestamps converted to the target timezone
+    source = args.source or f"postgresql://{args.username}@{args.host}/{args.database}"
+    # Day-of-week grouping and averaging (from the load-time rollups when available;
+    # only their medians are approximate)
+    grouped = datasource.hour_profile(args.table, args.start_date, args.end_date, args.utc_offset,
+                                      weekday=True, source=source, approximate=True)
+    day_averages = grouped['mean'].unstack(level=0)  # Unstack for plotting
+
+    # Overall average, weighted from the same day-of-week groups instead of a second query
+    totals = (grouped['mean'] * grouped['count']).groupby(level='hour').sum()
+    overall_average = totals / grouped['count'].groupby(level='hour').sum()
+
+    # Plotting
+    plot_day_of_week(day_averages, overall_average, 'data_plot.png')
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
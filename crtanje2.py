@@ -1,41 +1,20 @@
 import argparse
-import pandas as pd
-import matplotlib.pyplot as plt
-import pytz
-from sqlalchemy import create_engine
-import seaborn as sns  # Import seaborn for boxplots
 
-def main():
-    # Argument parsing (same as before)
-    parser = argparse.ArgumentParser(description="Generate boxplots from PostgreSQL data.")
-    parser.add_argument("host", help="PostgreSQL server hostname/IP")
-    parser.add_argument("database", help="Database name")
-    parser.add_argument("username", help="Database username")
-    parser.add_argument("table", help="Table name")
-    parser.add_argument("start_date", help="Start date (YYYY-MM-DD)")
-    parser.add_argument("end_date", help="End date (YYYY-MM-DD)")
-    parser.add_argument("utc_offset", type=int, help="UTC offset (for target timezone)")
-    args = parser.parse_args()
+import datasource
 
-    # Database connection (Same as before)
-    engine = create_engine(f"postgresql://{args.username}@localhost/{args.database}")
+def plot_hourly_boxplot(df, output_file='data_boxplot.png'):
+    """Draws one boxplot (with mean markers) per local hour of the day.
 
-    # Data query (Same as before)
-    sql = f"""  
-    SELECT datetime, value
-    FROM {args.table}
-    WHERE datetime >= '{args.start_date}' AND datetime < '{args.end_date}'
+    Args:
+        df (pd.DataFrame): Series with tz-aware 'datetime' and 'value' columns.
+        output_file (str): Output image path.
     """
-    df = pd.read_sql(sql, engine)
-
-    # Timezone conversion (Same as before)
-    target_timezone = pytz.timezone('Etc/GMT{}'.format(-args.utc_offset)) 
-    df['datetime'] = df['datetime'].dt.tz_localize('UTC').dt.tz_convert(target_timezone)
+    import matplotlib.pyplot as plt
+    import seaborn as sns  # Import seaborn for boxplots
 
     # Prepare data for boxplots
-    df['hour'] = df['datetime'].dt.hour  
+    df = df.assign(hour=df['datetime'].dt.hour)
 
-    # Plotting with boxplots
     plt.figure(figsize=(10, 6))
 
     sns.boxplot(
@@ -50,8 +29,29 @@ def main():
     plt.title('Hourly Data Distribution with Timezone Offset')
     plt.grid(True)
 
-    # Save the plot
-    plt.savefig('data_boxplot.png')
+    plt.savefig(output_file)
+    plt.close()
+
+def main():
+    # Argument parsing (same as before)
+    parser = argparse.ArgumentParser(description="Generate boxplots from PostgreSQL data.")
+    parser.add_argument("host", help="PostgreSQL server hostname/IP")
+    parser.add_argument("database", help="Database name")
+    parser.add_argument("username", help="Database username")
+    parser.add_argument("table", help="Table name")
+    parser.add_argument("start_date", help="Start date (YYYY-MM-DD)")
+    parser.add_argument("end_date", help="End date (YYYY-MM-DD)")
+    parser.add_argument("utc_offset", help="UTC offset in hours, or an IANA timezone name (for target timezone)")
+    parser.add_argument("--source", help="Data source URL (default: PostgreSQL from host/database/username, "
+                                         "or duckdb:///path/to/cleaned/files or binary:///path/to/f32/files to run offline)")
+    args = parser.parse_args()
+
+    # Data query, with timestamps converted to the target timezone
+    source = args.source or f"postgresql://{args.username}@{args.host}/{args.database}"
+    df = datasource.load_series(args.table, args.start_date, args.end_date, args.utc_offset, source)
+
+    # Plotting with boxplots
+    plot_hourly_boxplot(df, 'data_boxplot.png')
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
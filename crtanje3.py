@@ -1,41 +1,16 @@
 import argparse
-import pandas as pd
-import matplotlib.pyplot as plt
-from sqlalchemy import create_engine
 
-def main():
-    # Argument parsing
-    parser = argparse.ArgumentParser(description="Generate statistics from PostgreSQL data.")
-    parser.add_argument("host", help="PostgreSQL server hostname/IP")
-    parser.add_argument("database", help="Database name")
-    parser.add_argument("username", help="Database username")
-    parser.add_argument("table", help="Table name")
-    parser.add_argument("start_date", help="Start date (YYYY-MM-DD)")
-    parser.add_argument("end_date", help="End date (YYYY-MM-DD)")
-    parser.add_argument("utc_offset", type=int, help="UTC offset (for target timezone)")
-    args = parser.parse_args()
+import datasource
 
-    # Database connection (Modify with your credentials)
-    engine = create_engine(f"postgresql://{args.username}@localhost/{args.database}") # No password
-
-    # Data query with timezone handling in SQL
-    sql = f""" 
-    SELECT 
-        EXTRACT(HOUR FROM datetime + INTERVAL '{args.utc_offset} HOUR') AS hour,
-        value, -- Include the 'value' column directly
-        AVG(value) as average_value
-    FROM {args.table}
-    WHERE datetime >= '{args.start_date}' AND datetime < '{args.end_date}'
-    GROUP BY hour, value -- Group by both 'hour' and 'value'
-    ORDER BY hour;
-    """
-    df = pd.read_sql(sql, engine)
+def plot_stats_table(statistics, output_file):
+    """Renders an hourly statistics frame (indexed by hour) as a Matplotlib table image.
 
-    # Calculate mean and median for each hour
-   
-    statistics_by_hour = df.groupby('hour')['value'].agg(['mean', 'median'])
+    Args:
+        statistics (pd.DataFrame): One row per hour, one column per statistic.
+        output_file (str): Output image path.
+    """
+    import matplotlib.pyplot as plt
 
-    # Create Matplotlib table
     fig, ax = plt.subplots()
 
     # Hide axes
@@ -43,17 +18,41 @@ def main():
     ax.axis('tight')
 
     # Build table
-    table = ax.table(cellText=statistics_by_hour.values, 
-                     colLabels=statistics_by_hour.columns, 
-                     rowLabels=statistics_by_hour.index.astype(str) + ':00', 
+    table = ax.table(cellText=statistics.values,
+                     colLabels=statistics.columns,
+                     rowLabels=statistics.index.astype(str) + ':00',
                      loc='center')
 
     # Adjust table properties (optional)
     table.auto_set_font_size(False)
-    table.set_fontsize(12) 
+    table.set_fontsize(12)
+
+    fig.savefig(output_file)
+    plt.close(fig)
 
-    # Save the figure
-    fig.savefig('hourly_stats_table.png')
+def main():
+    # Argument parsing
+    parser = argparse.ArgumentParser(description="Generate statistics from PostgreSQL data.")
+    parser.add_argument("host", help="PostgreSQL server hostname/IP")
+    parser.add_argument("database", help="Database name")
+    parser.add_argument("username", help="Database username")
+    parser.add_argument("table", help="Table name")
+    parser.add_argument("start_date", help="Start date (YYYY-MM-DD)")
+    parser.add_argument("end_date", help="End date (YYYY-MM-DD)")
+    parser.add_argument("utc_offset", help="UTC offset in hours, or an IANA timezone name (for target timezone)")
+    parser.add_argument("--source", help="Data source URL (default: PostgreSQL from host/database/username, "
+                                         "or duckdb:///path/to/cleaned/files or binary:///path/to/f32/files to run offline)")
+    parser.add_argument("--approximate", action="store_true",
+                        help="Read the load-time rollups when available (medians to the histogram bin width)")
+    args = parser.parse_args()
+
+    # Calculate mean and median for each local hour
+    source = args.source or f"postgresql://{args.username}@{args.host}/{args.database}"
+    statistics_by_hour = datasource.hour_profile(args.table, args.start_date, args.end_date, args.utc_offset,
+                                                 source=source, approximate=args.approximate)[['mean', 'median']]
+
+    # Create Matplotlib table
+    plot_stats_table(statistics_by_hour, 'hourly_stats_table.png')
 
 if __name__ == "__main__":
    main()
@@ -1,8 +1,23 @@
 import argparse
-import pandas as pd
-import matplotlib.pyplot as plt
-import pytz
-from sqlalchemy import create_engine
+
+import datasource
+from crtanje3 import plot_stats_table
+
+def plot_day_tables(statistics_by_day_hour, output_pattern='hourly_stats_{day}.png'):
+    """Renders one hourly statistics table per day of the week.
+
+    Args:
+        statistics_by_day_hour (pd.DataFrame): Indexed by (day_of_week, hour).
+        output_pattern (str): Output path with a {day} placeholder.
+
+    Returns:
+        list: The files written.
+    """
+    files = []
+    for day in statistics_by_day_hour.index.get_level_values('day_of_week').unique():
+        files.append(output_pattern.format(day=day))
+        plot_stats_table(statistics_by_day_hour.loc[day], files[-1])
+    return files
 
 def main():
     # ... (Argument parsing, database connection, timezone conversion - same as before) ...
@@ -13,44 +28,22 @@ def main():
     parser.add_argument("table", help="Table name")
     parser.add_argument("start_date", help="Start date (YYYY-MM-DD)")
     parser.add_argument("end_date", help="End date (YYYY-MM-DD)")
-    parser.add_argument("utc_offset", type=int, help="UTC offset (for target timezone)")
+    parser.add_argument("utc_offset", help="UTC offset in hours, or an IANA timezone name (for target timezone)")
+    parser.add_argument("--source", help="Data source URL (default: PostgreSQL from host/database/username, "
+                                         "or duckdb:///path/to/cleaned/files or binary:///path/to/f32/files to run offline)")
+    parser.add_argument("--approximate", action="store_true",
+                        help="Read the load-time rollups when available (medians to the histogram bin width)")
     args = parser.parse_args()
 
-    # Database connection (Modify with your credentials)
-    engine = create_engine(f"postgresql://{args.username}@localhost/{args.database}")  # No password
-
-    # Data query 
-    sql = f"""  
-    SELECT datetime, value
-    FROM {args.table}
-    WHERE datetime >= '{args.start_date}' AND datetime < '{args.end_date}'
-    """
-    df = pd.read_sql(sql, engine)
-
+    # Data query, with timestamps converted to the target timezone
+    source = args.source or f"postgresql://{args.username}@{args.host}/{args.database}"
     # Calculate mean and median for each hour, grouped by day of the week
-    df['day_of_week'] = df['datetime'].dt.day_name()
-    df['hour'] = df['datetime'].dt.hour
-    statistics_by_day_hour = df.groupby(['day_of_week', 'hour'])['value'].agg(['mean', 'median'])
+    statistics_by_day_hour = datasource.hour_profile(args.table, args.start_date, args.end_date, args.utc_offset,
+                                                     weekday=True, source=source,
+                                                     approximate=args.approximate)[['mean', 'median']]
 
     # Create a separate table for each day of the week
-    days_of_week = statistics_by_day_hour.index.get_level_values('day_of_week').unique()
-
-    for day in days_of_week:
-        day_data = statistics_by_day_hour.loc[day]
-
-        fig, ax = plt.subplots()
-        ax.axis('off')
-        ax.axis('tight')
-
-        table = ax.table(cellText=day_data.values, 
-                         colLabels=day_data.columns, 
-                         rowLabels=day_data.index.astype(str) + ':00', 
-                         loc='center')
-
-        table.auto_set_font_size(False)
-        table.set_fontsize(12)
-
-        fig.savefig(f'hourly_stats_{day}.png')
+    plot_day_tables(statistics_by_day_hour)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
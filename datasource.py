@@ -0,0 +1,541 @@
+import sys
+from pathlib import Path
+from urllib.parse import urlparse
+
+sys.path.insert(0, str(Path(__file__).resolve().parent / "scripts"))
+
+DEFAULT_SOURCE = "postgresql://postgres@localhost/air_quality"
+SUMMARY_COLUMNS = ['table_name', 'maximum', 'minimum', 'mean', 'median', 'p95', 'count',
+                   'first_time', 'last_time', 'coverage', 'approximate']
+
+_sources = {}
+
+def resolve_tz(tz):
+    """Accepts an IANA timezone name or an integer UTC offset in hours (as the scripts' utc_offset)."""
+    if tz is None:
+        return 'UTC'
+    try:
+        offset = int(tz)
+    except (TypeError, ValueError):
+        return tz
+    # The Etc/GMT zones have their sign inverted: UTC+2 is Etc/GMT-2
+    return 'Etc/GMT{:+d}'.format(-offset) if offset else 'UTC'
+
+def _finish(df, tz):
+    """Turns naive UTC timestamps into tz-aware local ones and sorts by time."""
+    import pandas as pd
+
+    df['datetime'] = pd.to_datetime(df['datetime'])
+    if df['datetime'].dt.tz is None:
+        df['datetime'] = df['datetime'].dt.tz_localize('UTC')
+    df['datetime'] = df['datetime'].dt.tz_convert(resolve_tz(tz))
+    df['value'] = df['value'].astype('float64')
+    return df.sort_values('datetime', kind='stable').reset_index(drop=True)
+
+def _utc(ts):
+    """Parses a range bound as a UTC instant (naive values are taken as UTC)."""
+    import pandas as pd
+
+    ts = pd.Timestamp(ts)
+    return ts.tz_localize('UTC') if ts.tz is None else ts.tz_convert('UTC')
+
+def _where(start, end, placeholder):
+    """Builds the WHERE clause and its parameters for an optional [start, end) range."""
+    conditions, params = [], []
+    if start is not None:
+        conditions.append(f"datetime >= {placeholder}")
+        params.append(_utc(start))
+    if end is not None:
+        conditions.append(f"datetime < {placeholder}")
+        params.append(_utc(end))
+    return (f"WHERE {' AND '.join(conditions)}" if conditions else ""), params
+
+def _split_table(table):
+    """'SANTA_ANITA_pm10' -> ('SANTA_ANITA', 'pm10')."""
+    location, _, parameter = table.rpartition('_')
+    return location, parameter
+
+def _summary_sql(relations, where, placeholder):
+    """One UNION ALL query computing the summary statistics of every (name, relation) pair.
+
+    Each arm takes the name as its first parameter, followed by the parameters of `where`.
+    """
+    return "\nUNION ALL\n".join(f"""
+        SELECT CAST({placeholder} AS VARCHAR) AS table_name, MAX(value) AS maximum, MIN(value) AS minimum, AVG(value) AS mean,
+               percentile_cont(0.5) WITHIN GROUP (ORDER BY value) AS median,
+               percentile_cont(0.95) WITHIN GROUP (ORDER BY value) AS p95,
+               COUNT(value) AS count, MIN(datetime) AS first_time, MAX(datetime) AS last_time
+        FROM {relation} {where}""" for _, relation in relations)
+
+
+class PostgresSource:
+    """Reads series from the PostgreSQL tables written by load.py through a small connection pool.
+
+    Args:
+        dsn (str): libpq connection URI, e.g. postgresql://postgres@localhost/air_quality.
+        max_connections (int): Upper bound of the pool.
+    """
+
+    def __init__(self, dsn, max_connections=4):
+        from psycopg2.pool import ThreadedConnectionPool
+
+        self.dsn = dsn
+        self.pool = ThreadedConnectionPool(1, max_connections, dsn=dsn)
+
+    def query(self, sql, params=None):
+        """Runs a query on a pooled connection and returns the result as a DataFrame."""
+        import pandas as pd
+
+        conn = self.pool.getconn()
+        try:
+            with conn.cursor() as cur:
+                cur.execute(sql, params)
+                columns = [column.name for column in cur.description]
+                rows = cur.fetchall()
+            conn.commit()
+        finally:
+            self.pool.putconn(conn)
+        return pd.DataFrame(rows, columns=columns)
+
+    def load_series(self, table, start=None, end=None, tz='UTC'):
+        where, params = _where(start, end, "%s")
+        # The tables store naive UTC timestamps
+        params = [bound.tz_localize(None).to_pydatetime() for bound in params]
+        df = self.query(f"SELECT datetime, value FROM {table} {where} ORDER BY datetime", params)
+        return _finish(df, tz)
+
+    def load_minmax(self, table, start=None, end=None, tz='UTC', buckets=None):
+        import downsample
+
+        where, params = _where(start, end, "%s")
+        params = [bound.tz_localize(None).to_pydatetime() for bound in params]
+        return _finish(self.query(downsample.minmax_sql(table, where, buckets), params), tz)
+
+    def list_tables(self):
+        """Every <location>_<parameter> table of the schema: exactly the datetime and value columns."""
+        df = self.query("""
+            SELECT table_name FROM information_schema.columns
+            WHERE table_schema = current_schema()
+            GROUP BY table_name
+            HAVING COUNT(*) = 2 AND bool_and(column_name IN ('datetime', 'value'))
+            ORDER BY table_name
+        """)
+        return [name for name in df['table_name'] if '_' in name]
+
+    def rollup_tables(self):
+        """The tables for which load.py maintains rollups (lower case, as the catalog stores them)."""
+        df = self.query("SELECT table_name FROM information_schema.tables "
+                        "WHERE table_schema = current_schema() AND table_name LIKE %s", ['%\\_value\\_hist'])
+        return {name[:-len('_value_hist')] for name in df['table_name']}
+
+    def summaries(self, tables, start=None, end=None):
+        """Exact summary statistics of many tables in a single query."""
+        where, params = _where(start, end, "%s")
+        params = [bound.tz_localize(None).to_pydatetime() for bound in params]
+        return self.query(_summary_sql([(table, table) for table in tables], where, "%s"),
+                          [param for table in tables for param in [table] + params])
+
+    def gap_index(self, table):
+        """None: the tables hold the interpolated hours and no record of which ones were missing."""
+        return None
+
+    def has_rollups(self, table):
+        """True when load.py maintains rollup tables for this table."""
+        df = self.query("SELECT to_regclass(%s) IS NOT NULL AS present", [f"{table}_hourly_stats".lower()])
+        return bool(df['present'].iloc[0])
+
+    def close(self):
+        self.pool.closeall()
+
+
+class DuckDBSource:
+    """Runs the same queries offline with DuckDB over the cleaned files in a directory.
+
+    A table name such as SANTA_ANITA_pm10 maps to measurements_SANTA_ANITA_pm10.csv, or to the
+    clean stage of a columnar store (store/clean/location=SANTA_ANITA/parameter=pm10) when the
+    directory holds one.
+
+    Args:
+        directory (str): Directory with the cleaned CSV files or the columnar store root.
+    """
+
+    def __init__(self, directory):
+        import duckdb
+
+        self.directory = Path(directory)
+        self.conn = duckdb.connect()
+
+    def _relation(self, table):
+        import store
+
+        location, parameter = _split_table(table)
+        store_dir = store.series_dir(self.directory, store.CLEAN, location, parameter)
+        if store_dir.exists():
+            return f"read_parquet('{store_dir}/month=*/*.parquet')"
+        return f"read_csv_auto('{self.directory / f'measurements_{table}.csv'}')"
+
+    def query(self, sql, params=None):
+        return self.conn.execute(sql, params or []).df()
+
+    def list_tables(self):
+        """The series of the directory: cleaned CSV files and cleaned series of a columnar store."""
+        import store
+
+        tables = {path.stem[len('measurements_'):] for path in self.directory.glob('measurements_*.csv')}
+        tables.update(f"{location}_{parameter}" for location, parameter in store.list_series(self.directory, store.CLEAN))
+        return sorted(tables)
+
+    def summaries(self, tables, start=None, end=None):
+        """Exact summary statistics of many series in a single query (Arrow IPC series in memory)."""
+        import pandas as pd
+        import store
+
+        relations, in_memory = [], []
+        for table in tables:
+            location, parameter = _split_table(table)
+            store_dir = store.series_dir(self.directory, store.CLEAN, location, parameter)
+            if store_dir.exists() and not any(store_dir.glob('month=*/*.parquet')):
+                in_memory.append(table)
+            else:
+                relations.append((table, self._relation(table)))
+
+        frames = []
+        if relations:
+            where, params = _where(start, end, "?")
+            params = [bound.to_pydatetime() for bound in params]
+            frames.append(self.query(_summary_sql(relations, where, "?"),
+                                     [param for name, _ in relations for param in [name] + params]))
+        for table in in_memory:
+            df = self.load_series(table, start, end)
+            frames.append(pd.DataFrame([{'table_name': table, **summary_frame(df),
+                                         'p95': float(df['value'].quantile(0.95)),
+                                         'first_time': df['datetime'].min(), 'last_time': df['datetime'].max()}]))
+        return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=SUMMARY_COLUMNS[:-2])
+
+    def gap_index(self, table):
+        """The gap index clean.py kept with the series, or None when there is none."""
+        import gaps
+        import store
+
+        location, parameter = _split_table(table)
+        path = gaps.store_gaps_path(self.directory, location, parameter)
+        if not path.parent.exists():
+            path = gaps.gaps_path(self.directory / f'measurements_{table}.csv')
+        return gaps.GapIndex.load(path) if path.exists() else None
+
+    def load_series(self, table, start=None, end=None, tz='UTC'):
+        import store
+
+        # Arrow IPC partitions are read through the store, which already prunes by month
+        location, parameter = _split_table(table)
+        store_dir = store.series_dir(self.directory, store.CLEAN, location, parameter)
+        if store_dir.exists() and not any(store_dir.glob('month=*/*.parquet')):
+            return _finish(store.read_series(self.directory, store.CLEAN, location, parameter, start, end), tz)
+
+        # Cleaned files carry UTC offsets, so compare against aware UTC instants
+        where, params = _where(start, end, "?")
+        params = [bound.to_pydatetime() for bound in params]
+        df = self.query(f"SELECT datetime, value FROM {self._relation(table)} {where} ORDER BY datetime", params)
+        return _finish(df, tz)
+
+    def load_minmax(self, table, start=None, end=None, tz='UTC', buckets=None):
+        import downsample
+        import store
+
+        location, parameter = _split_table(table)
+        store_dir = store.series_dir(self.directory, store.CLEAN, location, parameter)
+        if store_dir.exists() and not any(store_dir.glob('month=*/*.parquet')):
+            return downsample.downsample_frame(self.load_series(table, start, end, tz), buckets, 'minmax')
+
+        where, params = _where(start, end, "?")
+        params = [bound.to_pydatetime() for bound in params]
+        return _finish(self.query(downsample.minmax_sql(self._relation(table), where, buckets), params), tz)
+
+    def close(self):
+        self.conn.close()
+
+
+class BinarySource:
+    """Reads the memory-mapped binary series files written by clean.py and load.py --binary.
+
+    A table name such as SANTA_ANITA_pm10 maps to measurements_SANTA_ANITA_pm10.f32 in the
+    directory, or to the binary file of the clean stage of a columnar store. Date ranges are
+    sliced out of the mapping by offset, so only the requested hours are read from disk and
+    no rows are parsed.
+
+    Args:
+        directory (str): Directory with the .f32 files or the columnar store root.
+    """
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+
+    def open(self, table):
+        """The BinarySeries of a table."""
+        import binseries
+
+        path = binseries.series_path(self.directory, table)
+        if not path.exists():
+            path = binseries.store_path(self.directory, *_split_table(table))
+        if not path.exists():
+            raise FileNotFoundError(f"No binary series for {table} in {self.directory}")
+        return binseries.BinarySeries(path)
+
+    def list_tables(self):
+        """The series of the directory: .f32 files and binary files of a columnar store."""
+        import binseries
+        import store
+
+        tables = {path.stem[len('measurements_'):] for path in self.directory.glob(f'measurements_*{binseries.SUFFIX}')}
+        tables.update(f"{location}_{parameter}" for location, parameter in store.list_series(self.directory, store.CLEAN)
+                      if binseries.store_path(self.directory, location, parameter).exists())
+        return sorted(tables)
+
+    def gap_index(self, table):
+        """The gap index of the series, from the gap bitmap of its file."""
+        return self.open(table).gap_index()
+
+    def load_series(self, table, start=None, end=None, tz='UTC'):
+        return self.open(table).to_frame(start, end, resolve_tz(tz))
+
+    def load_compact(self, table, start=None, end=None, tz='UTC'):
+        return self.open(table).to_compact(start, end, resolve_tz(tz))
+
+    def load_minmax(self, table, start=None, end=None, tz='UTC', buckets=None):
+        import binseries
+        import downsample
+        import numpy as np
+        import pandas as pd
+
+        # Only the kept points become timestamps
+        first, values = self.open(table).slice(start, end)
+        present = np.flatnonzero(~np.isnan(values))
+        kept = present[downsample.minmax_indices((first + present) * binseries.HOUR_NS, values[present], buckets)]
+        times = pd.DatetimeIndex((first + kept) * binseries.HOUR_NS, tz='UTC').tz_convert(resolve_tz(tz))
+        return pd.DataFrame({'datetime': times, 'value': values[kept].astype('float64')})
+
+    def summaries(self, tables, start=None, end=None):
+        """Exact summary statistics of many series, each computed over its mapped slice."""
+        import binseries
+        import numpy as np
+        import pandas as pd
+
+        rows = []
+        for table in tables:
+            first, values = self.open(table).slice(start, end)
+            present = np.flatnonzero(~np.isnan(values))
+            data = values[present].astype('float64')
+            row = {'table_name': table, 'count': len(data)}
+            if len(data):
+                row.update(maximum=data.max(), minimum=data.min(), mean=data.mean(), median=np.median(data),
+                           p95=np.percentile(data, 95),
+                           first_time=pd.Timestamp((first + present[0]) * binseries.HOUR_NS, tz='UTC'),
+                           last_time=pd.Timestamp((first + present[-1]) * binseries.HOUR_NS, tz='UTC'))
+            rows.append(row)
+        return pd.DataFrame(rows, columns=SUMMARY_COLUMNS[:-2])
+
+    def close(self):
+        pass
+
+
+def get_source(url=None):
+    """Returns a shared source for the URL, so every query in a process reuses one pool.
+
+    Args:
+        url (str): postgresql://user@host/dbname for PostgreSQL, duckdb:///path/to/dir to
+            query cleaned files offline, or binary:///path/to/dir to map binary series files
+            (default: the local air_quality database).
+    """
+    url = url or DEFAULT_SOURCE
+    if url not in _sources:
+        scheme = urlparse(url).scheme
+        if scheme in ('postgresql', 'postgres'):
+            _sources[url] = PostgresSource(url)
+        elif scheme == 'duckdb':
+            _sources[url] = DuckDBSource(url[len('duckdb://'):])
+        elif scheme == 'binary':
+            _sources[url] = BinarySource(url[len('binary://'):])
+        else:
+            raise ValueError(f"Unsupported data source: {url}")
+    return _sources[url]
+
+def load_series(table, start=None, end=None, tz='UTC', source=None):
+    """Loads one series as a DataFrame with tz-aware 'datetime' and 'value' columns.
+
+    Args:
+        table (str): Table name, e.g. SANTA_ANITA_pm10.
+        start (str): Inclusive start (UTC), or None for the beginning of the data.
+        end (str): Exclusive end (UTC), or None for the end of the data.
+        tz (str or int): IANA timezone name or integer UTC offset for the returned timestamps.
+        source (str): Data source URL (see get_source).
+    """
+    return get_source(source).load_series(table, start, end, tz)
+
+def load_downsampled(table, start=None, end=None, tz='UTC', source=None, width=None, method='minmax'):
+    """load_series() reduced to about `width` points for plotting, with the reduction done by the source.
+
+    - minmax: the lowest and highest point of each of `width` time buckets, selected in SQL, so
+      at most two points per pixel column are transferred and the drawn line is unchanged.
+    - lttb: the minmax points reduced further to `width` points by Largest-Triangle-Three-Buckets.
+    - exact: every row (load_series()).
+
+    Args:
+        width (int): Pixel columns of the plot (default: downsample.DEFAULT_WIDTH).
+        method (str): One of downsample.METHODS.
+    """
+    import downsample
+
+    width = width or downsample.DEFAULT_WIDTH
+    if method == 'exact':
+        return load_series(table, start, end, tz, source)
+    if method not in downsample.METHODS:
+        raise ValueError(f"Unknown downsampling method: {method} (expected one of {', '.join(downsample.METHODS)})")
+    df = get_source(source).load_minmax(table, start, end, tz, width)
+    if method == 'lttb':
+        df = downsample.downsample_frame(df, width, 'lttb').reset_index(drop=True)
+    return df
+
+def load_compact(table, start=None, end=None, tz='UTC', source=None):
+    """load_series() as a CompactSeries (epoch hours, float32 values and hour/weekday/month codes).
+
+    Binary sources build it straight from the mapped values, without an intermediate frame.
+    """
+    from compact import CompactSeries
+
+    src = get_source(source)
+    if isinstance(src, BinarySource):
+        return src.load_compact(table, start, end, tz)
+    return CompactSeries.from_frame(load_series(table, start, end, tz, source))
+
+def profile_frame(df, weekday=False):
+    """hour_profile() for a series that is already in memory (local timestamps)."""
+    from compact import CompactSeries
+
+    return CompactSeries.from_frame(df).profile(weekday)
+
+def summary_frame(df):
+    """summary() for a series that is already in memory."""
+    values = df['value']
+    return {'maximum': float(values.max()), 'minimum': float(values.min()), 'mean': float(values.mean()),
+            'count': float(values.count()), 'median': float(values.median())}
+
+def _fixed_offset(tz):
+    """The UTC offset in whole hours for 'UTC' or an integer offset, None for named timezones."""
+    if tz is None or tz == 'UTC':
+        return 0
+    try:
+        return int(tz)
+    except (TypeError, ValueError):
+        return None
+
+def _rollup_source(table, start, end, tz, source):
+    """Returns the PostgreSQL source when the request can be answered from the rollups, else None.
+
+    The rollups are keyed by UTC month, so the range has to be month-aligned, and the local
+    shift is applied to whole hours, so only fixed offsets qualify (DST zones read raw rows).
+    """
+    import rollups
+
+    src = get_source(source)
+    if not isinstance(src, PostgresSource) or _fixed_offset(tz) is None:
+        return None
+    if not rollups.month_aligned(start, end) or not src.has_rollups(table):
+        return None
+    return src
+
+def hour_profile(table, start=None, end=None, tz='UTC', weekday=False, source=None, approximate=False):
+    """Mean/median/count per local hour of day (optionally per day of week and hour).
+
+    The series is loaded into a CompactSeries and grouped with integer bincounts. With
+    `approximate`, the rollup tables answer instead when possible, so the cost does not grow
+    with the number of stored years; their means and counts are exact, their medians
+    approximate to rollups.HIST_BIN_WIDTH.
+
+    Returns:
+        pd.DataFrame: Indexed by hour, or by (day_of_week, hour) with day names, with
+        mean, median and count columns.
+    """
+    import rollups
+
+    src = _rollup_source(table, start, end, tz, source) if approximate else None
+    if src is not None:
+        return rollups.query_hour_profile(src.query, table, start, end, _fixed_offset(tz), weekday)
+
+    return load_compact(table, start, end, tz, source).profile(weekday)
+
+def summary(table, start=None, end=None, source=None, approximate=False):
+    """Maximum, minimum, mean, median and count of a series (from the rollups with `approximate`).
+
+    Returns:
+        dict: maximum, minimum, mean, median and count (median approximate from the rollups).
+    """
+    import rollups
+
+    src = _rollup_source(table, start, end, 'UTC', source) if approximate else None
+    if src is not None:
+        return rollups.query_summary(src.query, table, start, end)
+
+    return summary_frame(load_series(table, start, end, source=source))
+
+def list_tables(source=None):
+    """Every <location>_<parameter> series of a data source."""
+    return get_source(source).list_tables()
+
+def _coverage(index, start=None, end=None):
+    """Share of the hours of [start, end) (default: the span of the index) that were observed."""
+    import gaps
+
+    if index is None or index.empty:
+        return float('nan')
+    # Epoch hours of the first hour at or after each bound
+    first = index.first if start is None else -(-_utc(start).value // gaps.HOUR_NS)
+    last = index.last + 1 if end is None else -(-_utc(end).value // gaps.HOUR_NS)
+    return index.observed_between(first, last) / (last - first) if last > first else float('nan')
+
+def summaries(tables=None, start=None, end=None, source=None, approximate=False):
+    """Summary statistics of many series (default: all of them) with one query per kind.
+
+    Exact statistics come from a single UNION ALL query over the raw rows. With `approximate`,
+    tables that have rollups are answered from their daily rollup and value histogram in
+    another single query instead, so the cost does not grow with their row counts (PostgreSQL
+    and month-aligned ranges only; medians and p95 to rollups.HIST_BIN_WIDTH).
+
+    Args:
+        tables (list): Table names (default: list_tables()).
+        start (str): Inclusive start (UTC), or None.
+        end (str): Exclusive end (UTC), or None.
+        source (str): Data source URL (see get_source).
+        approximate (bool): Use the rollups where possible.
+
+    Returns:
+        pd.DataFrame: One row per table in SUMMARY_COLUMNS; coverage is the share of hours
+        between the first and last reading (or of the requested range) that were observed
+        rather than filled in by clean.py, or NaN when the source keeps no gap index. In
+        rows marked approximate, first_time and last_time are rounded out to whole UTC days
+        (00:00 of the first day, 23:00 of the last), as the daily rollup keeps no timestamps.
+    """
+    import pandas as pd
+    import rollups
+
+    src = get_source(source)
+    tables = list(tables) if tables is not None else src.list_tables()
+    frames = []
+    if approximate and isinstance(src, PostgresSource) and rollups.month_aligned(start, end):
+        with_rollups = src.rollup_tables()
+        rolled = [table for table in tables if table.lower() in with_rollups]
+        tables = [table for table in tables if table.lower() not in with_rollups]
+        frames.append(rollups.query_summaries(src.query, rolled, start, end).assign(approximate=True))
+    if tables:
+        frames.append(src.summaries(tables, start, end).assign(approximate=False))
+    frames = [frame for frame in frames if len(frame)]
+    if not frames:
+        return pd.DataFrame(columns=SUMMARY_COLUMNS)
+    result = pd.concat(frames, ignore_index=True)
+
+    for column in ('first_time', 'last_time'):
+        result[column] = pd.to_datetime(result[column], utc=True)
+    for column in ('maximum', 'minimum', 'mean', 'median', 'p95'):
+        result[column] = pd.to_numeric(result[column], errors='coerce').astype('float64')
+    result['count'] = result['count'].fillna(0).astype('int64')
+    result['coverage'] = [_coverage(src.gap_index(table), start, end) for table in result['table_name']]
+    return result[SUMMARY_COLUMNS].sort_values('table_name', ignore_index=True)
@@ -1,46 +1,35 @@
-import psycopg2
-import pandas as pd
-import matplotlib.pyplot as plt
 import argparse
+import time
 from collections import deque
 
+import datasource
+from downsample import DEFAULT_WIDTH, METHODS
 
-def get_data_from_db(host, dbname, user, table, args):
-    """Connects to PostgreSQL database and fetches data."""
 
-    try:
-        conn = psycopg2.connect(
-            host=host,
-            dbname=dbname,
-            user=user
-        )
-        cursor = conn.cursor()
+def plot_tables(all_data, output_file='plot_from_multiple_tables.png'):
+    """Plots the series of several tables on one time axis.
 
-        # Process start and end dates if provided
-        if args.start_date and args.end_date:
-            cursor.execute(f"""
-                SELECT datetime, value 
-                FROM {table}
-                WHERE datetime >= %s AND datetime <= %s
-            """, (args.start_date, args.end_date))
+    Args:
+        all_data (dict): Maps each table name to a frame with 'timestamp' and 'value' columns.
+        output_file (str): Output image path.
+    """
+    import matplotlib.pyplot as plt
 
-        else:
-            cursor.execute(f"SELECT datetime, value FROM {table}")
+    plt.figure(figsize=(30, 10))
 
-        data = cursor.fetchall()
+    colors = deque(['blue', 'green', 'red', 'cyan', 'magenta'])
+    for table, df in all_data.items():
+       plt.plot(df['timestamp'], df['value'], color=colors[0], label=table)
+       colors.rotate(1)
 
-        # Create a Pandas DataFrame
-        df = pd.DataFrame(data, columns=['timestamp', 'value'])
+    plt.xlabel('Timestamp')
+    plt.ylabel('Value')
+    plt.title('Data from multiple tables')
+    plt.legend()
 
-        return df
+    plt.savefig(output_file)
+    plt.close()
 
-    except psycopg2.OperationalError as e:
-        print(f"Unable to connect: {e}")
-        exit()
-    finally:
-        if conn:
-            cursor.close()
-            conn.close()
 
 def main():
     # Argument parsing for flexibility
@@ -48,35 +37,28 @@ def main():
     parser.add_argument('--tables', required=True, help="Comma-separated list of database tables")
     parser.add_argument('--start_date', type=str, help="Start date (format: YYYY-MM-DD)")
     parser.add_argument('--end_date', type=str, help="End date (format: YYYY-MM-DD)")
+    parser.add_argument('--source', default=datasource.DEFAULT_SOURCE,
+                        help="Data source URL (postgresql://..., duckdb:///path/to/cleaned/files or binary:///path/to/f32/files)")
+    parser.add_argument('--method', choices=METHODS, default='minmax',
+                        help="Downsampling done by the data source: min/max per pixel column, LTTB, or every row")
+    parser.add_argument('--width', type=int, default=DEFAULT_WIDTH, help="Pixel columns to downsample to")
     args = parser.parse_args()
 
-   # Database credentials (Fill in your actual credentials here)
-    host = 'localhost'
-    dbname = 'air_quality'
-    user = 'postgres'
-
-   # Fetch the data 
+   # Fetch the data, every table through the same pooled source, downsampled to the plot width
     all_data = {}
     table_names = args.tables.split(',')
+    print(f"{'table':<24} {'points':>8} {'seconds':>8}")
     for table in table_names:
-       df = get_data_from_db(host, dbname, user, table, args)
-       all_data[table] = df 
+       start = time.perf_counter()
+       df = datasource.load_downsampled(table, args.start_date, args.end_date, source=args.source,
+                                        width=args.width, method=args.method)
+       all_data[table] = df.rename(columns={'datetime': 'timestamp'})
+       print(f"{table:<24} {len(df):>8} {time.perf_counter() - start:>8.3f}")
 
    # Create the line plot
-    plt.figure(figsize=(30, 10))
-
-    colors = deque(['blue', 'green', 'red', 'cyan', 'magenta']) 
-    for table, df in all_data.items():
-       plt.plot(df['timestamp'], df['value'], color=colors[0], label=table)
-       colors.rotate(1) 
-
-    plt.xlabel('Timestamp')
-    plt.ylabel('Value')
-    plt.title('Data from multiple tables')
-    plt.legend() 
-
-   # Save the plot 
-    plt.savefig('plot_from_multiple_tables.png') 
+    start = time.perf_counter()
+    plot_tables(all_data, 'plot_from_multiple_tables.png')
+    print(f"Rendered {len(all_data)} series ({args.method}) in {time.perf_counter() - start:.3f}s")
 
 if __name__ == "__main__":
    main()
@@ -1,64 +1,492 @@
 import argparse
+import os
 import subprocess
+import sys
 import yaml
+from collections import defaultdict
+from functools import partial
+from datetime import timedelta
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
 from pathlib import Path
 import time
 
+# Make the stage modules in scripts/ importable for the in-process mode
+sys.path.insert(0, str(Path(__file__).resolve().parent / "scripts"))
+
+import metrics
+
 def get_table_name(filename):
     parts = filename.stem.split("_")  # Split 'measurements_Location_parameter'
     location = "_".join(parts[1:-1])
     parameter = parts[-1]
     return f"{location}_{parameter}"  # Construct the table name
 
-def main():
-    parser = argparse.ArgumentParser(description="Orchestrate the ETL workflow.")
-    parser.add_argument("--config", default="config.yaml", help="Path to the configuration file.")
-    args = parser.parse_args()
+def timed(func, *args):
+    """Runs func(*args) and returns (result, start, end) so the scheduler can account stage time."""
+    start = time.time()
+    result = func(*args)
+    return result, start, time.time()
 
-    with open(args.config, "r") as f:
-        config = yaml.safe_load(f)
+def timed_worker(profile_dir, name, func, *args):
+    """timed() for the process pool: profiles the task and ships the metrics it recorded back to the parent."""
+    # Pool processes run many tasks, only this task's metrics go back
+    metrics.reset()
+    with metrics.profile(name, profile_dir):
+        result = timed(func, *args)
+    return result + (metrics.snapshot(),)
+
+def outlier_options(config):
+    """The clean.outliers section of config.yaml as keyword arguments for the clean functions."""
+    section = config.get('clean', {}).get('outliers') or {}
+    return {option: section.get(option) for option in ('method', 'window', 'threshold', 'engine')
+            if section.get(option) is not None}
+
+def run_subprocess(config, metrics_file=None, profile_dir=None):
+    """Runs each stage as a separate script invocation, one after another.
+
+    Args:
+        config (dict): Parsed config.yaml.
+        metrics_file (str): JSON lines file every script appends its metrics to.
+        profile_dir (str): Directory receiving a cProfile dump per script invocation.
+    """
+    observability = []
+    if metrics_file:
+        observability += ['--metrics', metrics_file]
+    if profile_dir:
+        observability += ['--profile', profile_dir]
+
+    store_dir = config.get('store', {}).get('dir')
+    store_options = ['--store', str(store_dir), '--format', config['store'].get('format', 'parquet')] if store_dir else []
 
     # Extract Phase
+    # CSV file name -> (location, parameter), for committing incremental high-water marks after the load
+    pairs = {}
     for location in config['extract']['locations']:
        for parameter in config['extract']['parameters']:
+           pairs[f'measurements_{location.replace(" ", "_")}_{parameter}.csv'] = (location, parameter)
            # Convert dates to ISO 8601 strings
            start_date_str = config['extract']['start_date'].isoformat()
            end_date_str = config['extract']['end_date'].isoformat()
 
            extract_cmd = [
-               'python', 'scripts/extract.py', 
-               location, 
-               start_date_str, 
+               'python', 'aq.py', 'extract',
+               location,
+               start_date_str,
                end_date_str,
                parameter
            ]
-           subprocess.run(extract_cmd)
+           if config['extract'].get('base_url'):
+               extract_cmd += ['--base-url', config['extract']['base_url']]
+           if config['extract'].get('incremental'):
+               extract_cmd += ['--incremental', '--state-file', config['extract'].get('state_file', 'extract_state.json')]
+               if config['extract'].get('refetch_gaps_hours'):
+                   extract_cmd += ['--refetch-gaps', str(config['extract']['refetch_gaps_hours'])]
+           if config['extract'].get('shard'):
+               extract_cmd += ['--shard', config['extract']['shard'],
+                               '--state-file', config['extract'].get('state_file', 'extract_state.json')]
+               if config['extract'].get('shard_workers'):
+                   extract_cmd += ['--shard-workers', str(config['extract']['shard_workers'])]
+           if config.get('cache'):
+               extract_cmd += ['--cache', '--cache-dir', str(config['cache'].get('dir', '.openaq_cache'))]
+               if config['cache'].get('ttl') is not None:
+                   extract_cmd += ['--cache-ttl', str(config['cache']['ttl'])]
+               if config['cache'].get('max_mb') is not None:
+                   extract_cmd += ['--cache-max-mb', str(config['cache']['max_mb'])]
+               if config['cache'].get('offline'):
+                   extract_cmd += ['--offline']
+           subprocess.run(extract_cmd + store_options + observability)
 
     # Clean Phase
-    clean_files = list(Path('.').glob('measurements_*.csv')) 
+    # With a columnar store, one clean run covers every raw series of the store
+    clean_files = [] if store_dir else list(Path('.').glob('measurements_*.csv'))
     print(list(clean_files))
+    if store_dir:
+        clean_cmd = ['python', 'aq.py', 'clean'] + store_options
+        for option, value in outlier_options(config).items():
+            clean_cmd += [f"--{'outlier-method' if option == 'method' else option}", str(value)]
+        subprocess.run(clean_cmd + observability)
     for clean_file in clean_files:
-        clean_cmd = ['python', 'scripts/clean.py', clean_file]
-        subprocess.run(clean_cmd)
+        clean_cmd = ['python', 'aq.py', 'clean', clean_file]
+        if config.get('clean', {}).get('chunksize'):
+            clean_cmd += ['--chunksize', str(config['clean']['chunksize'])]
+        for option, value in outlier_options(config).items():
+            clean_cmd += [f"--{'outlier-method' if option == 'method' else option}", str(value)]
+        subprocess.run(clean_cmd + observability)
     time.sleep(2)
     print(list(clean_files))
-    
+
     # Load Phase
-    for clean_file in clean_files:
+    # (CSV file or None, table name) per series; store series are loaded by location and parameter
+    loads = [(clean_file, get_table_name(clean_file)) for clean_file in clean_files]
+    if store_dir:
+        loads = [(None, name[len('measurements_'):-len('.csv')]) for name in pairs]
+    for clean_file, table_name in loads:
         print(list(clean_files))
-        print("Filename causing the error:", clean_file) 
-        table_name = get_table_name(clean_file)
+        print("Filename causing the error:", clean_file)
         print(f"Table name derived from '{clean_file}': {table_name}")
         load_cmd = [
-            'python', 'scripts/load.py',
-            clean_file,
-            '--table_name', table_name,  
+            'python', 'aq.py', 'load',
+            *([clean_file] if clean_file is not None else []),
+            '--table_name', table_name,
             '--host', config['load']['host'],
             '--dbname', config['load']['dbname'],
-            '--user', config['load']['user'] 
+            '--user', config['load']['user'],
+            '--schema', config['load'].get('schema') or 'per_table'
         ]
+        if config['load'].get('binary_dir'):
+            load_cmd += ['--binary', config['load']['binary_dir']]
+        name = f'measurements_{table_name}.csv'
+        if store_dir:
+            location, parameter = pairs[name]
+            load_cmd += ['--store', str(store_dir), '--location', location, '--parameter', parameter]
+        if config['extract'].get('incremental') and name in pairs:
+            # load.py advances the high-water mark only once the slice is committed
+            location, parameter = pairs[name]
+            load_cmd += ['--state-file', config['extract'].get('state_file', 'extract_state.json')]
+            if not store_dir:
+                load_cmd += ['--location', location, '--parameter', parameter]
         print(f"Load command constructed: {load_cmd}")
-        subprocess.run(load_cmd) 
+        subprocess.run(load_cmd + observability)
+
+def run_parallel(config, workers, profile_dir=None):
+    """Runs extract -> clean -> load for every location/parameter pair as a dependency DAG.
+
+    Extraction is network bound, so it runs on a thread pool sharing one rate limiter.
+    Cleaning and loading are imported directly and run on a process pool, so cleaning
+    one file overlaps with extracting and loading others.
+
+    Args:
+        config (dict): Parsed config.yaml.
+        workers (int): Number of extract threads and clean/load processes.
+        profile_dir (str): Directory receiving a cProfile dump of the extract threads and
+            one per clean/load task.
+    """
+    import extract
+    import clean
+    import load
+    from cache import ResponseCache, DEFAULT_CACHE_DIR, DEFAULT_TTL, DEFAULT_MAX_MB
+    from state import ExtractState
+
+    start_date_str = config['extract']['start_date'].isoformat()
+    end_date_str = config['extract']['end_date'].isoformat()
+    pairs = [(location, parameter)
+             for location in config['extract']['locations']
+             for parameter in config['extract']['parameters']]
+
+    busy = defaultdict(float)
+    spans = {}
+    tasks = defaultdict(int)
+    rows_loaded = 0
+    started = time.time()
+
+    chunksize = config.get('clean', {}).get('chunksize')
+    outliers = outlier_options(config)
+    store_dir = config.get('store', {}).get('dir')
+    store_format = config.get('store', {}).get('format', 'parquet')
+    limiter = extract.TokenBucket(rate=extract.DEFAULT_RATE_LIMIT / 60, capacity=extract.DEFAULT_RATE_LIMIT)
+    state = None
+    if config['extract'].get('incremental'):
+        state = ExtractState(config['extract'].get('state_file', 'extract_state.json'))
+    shard = config['extract'].get('shard')
+    shard_workers = config['extract'].get('shard_workers') or extract.DEFAULT_SHARD_WORKERS
+    checkpoints = (state or ExtractState(config['extract'].get('state_file', 'extract_state.json'))) if shard else None
+    cache = None
+    if config.get('cache'):
+        cache = ResponseCache(config['cache'].get('dir', DEFAULT_CACHE_DIR), config['cache'].get('ttl', DEFAULT_TTL),
+                              config['cache'].get('max_mb', DEFAULT_MAX_MB), config['cache'].get('offline', False))
+
+    with metrics.profile('extract', profile_dir), ThreadPoolExecutor(max_workers=workers) as io_pool, \
+            ProcessPoolExecutor(max_workers=workers) as cpu_pool:
+        pending = {}
+        for location, parameter in pairs:
+            future = io_pool.submit(timed, extract.fetch_pair, location, parameter, start_date_str, end_date_str,
+                                    limiter, config['extract'].get('base_url'), extract.DEFAULT_PAGE_LIMIT, state,
+                                    store_dir, store_format, cache, shard, shard_workers, checkpoints,
+                                    config['extract'].get('refetch_gaps_hours'))
+            pending[future] = ('extract', (location, parameter))
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage, job = pending.pop(future)
+                result, start, end, *worker_metrics = future.result()
+                if worker_metrics:
+                    metrics.merge(worker_metrics[0])
+                metrics.observe(f'{stage}_seconds', end - start)
+
+                busy[stage] += end - start
+                first, last = spans.get(stage, (start, end))
+                spans[stage] = (min(first, start), max(last, end))
+                tasks[stage] += 1
+
+                # Schedule the next stage for this file as soon as its dependency finishes
+                if stage == 'extract':
+                    # Nothing new for this pair in incremental mode
+                    if result['rows'] == 0:
+                        continue
+                    name = f"clean_{job[0]}_{job[1]}"
+                    if store_dir:
+                        future = cpu_pool.submit(timed_worker, profile_dir, name, partial(clean.clean_store, **outliers),
+                                                 store_dir, [job], None, store_format)
+                    elif chunksize:
+                        future = cpu_pool.submit(timed_worker, profile_dir, name, clean.clean_streaming,
+                                                 result['file'], chunksize, outliers.get('threshold'))
+                    else:
+                        future = cpu_pool.submit(timed_worker, profile_dir, name,
+                                                 partial(clean.check_missing_times_and_outliers, **outliers),
+                                                 result['file'])
+                    pending[future] = ('clean', job + (result,))
+                elif stage == 'clean':
+                    if store_dir:
+                        clean_file = None
+                        table_name = f"{job[0].replace(' ', '_')}_{job[1]}"
+                    else:
+                        clean_file = job[2]['file']
+                        table_name = get_table_name(Path(clean_file))
+                    future = cpu_pool.submit(timed_worker, profile_dir, f"load_{table_name}",
+                                             load.create_and_populate_table, clean_file, table_name,
+                                             config['load']['host'], config['load']['dbname'], config['load']['user'],
+                                             'copy', load.DEFAULT_BATCH_SIZE, store_dir, job[0], job[1],
+                                             config['load'].get('schema') or 'per_table',
+                                             config['load'].get('binary_dir'))
+                    pending[future] = ('load', job)
+                else:
+                    rows_loaded += result or 0
+                    # Only advance the high-water mark once the new slice is in the database
+                    if state is not None and result:
+                        state.update(job[0], job[1], job[2]['last_utc'])
+
+    total = time.time() - started
+
+    print(f"{'stage':<8} {'tasks':>5} {'busy (s)':>9} {'wall (s)':>9}")
+    for stage in ('extract', 'clean', 'load'):
+        first, last = spans.get(stage, (0, 0))
+        print(f"{stage:<8} {tasks[stage]:>5} {busy[stage]:>9.2f} {last - first:>9.2f}")
+    print(f"Total wall time: {total:.2f}s, {rows_loaded} rows loaded ({rows_loaded / total:.1f} rows/s)")
+    if cache is not None:
+        print(f"Response cache: {cache.hits} hits, {cache.misses} misses")
+
+def stream_pair(config, location, parameter, limiter, state=None, cache=None, queue_size=8):
+    """Streams one location/parameter pair from the API into its table without intermediate files.
+
+    A producer thread walks the API pages into a bounded queue (it blocks when the database side
+    falls behind). The consumer cleans the pages incrementally and COPYs each cleaned batch into
+    the table as it arrives, so the first rows are queryable long before the last page is fetched.
+    Z-score outliers need the statistics of the whole series, so they are replaced at the end,
+    using the moments of the rows already in the table plus those of the new slice.
+
+    Returns:
+        dict: Rows loaded, outliers replaced, seconds until the first commit and the latest UTC timestamp.
+    """
+    import io
+    import queue
+    import threading
+
+    import numpy as np
+    import pandas as pd
+    import psycopg2
+    import requests
+
+    import binseries
+    import clean
+    import extract
+    import gaps
+    import load
+    import outliers
+    from state import parse_utc
+
+    started = time.time()
+    start_date = config['extract']['start_date'].isoformat()
+    end_date = config['extract']['end_date'].isoformat()
+    table_name = f"{location.replace(' ', '_')}_{parameter}".replace('-', '_')
+    schema = config['load'].get('schema') or 'per_table'
+    summary = {'rows': 0, 'outliers': 0, 'first_row_seconds': None, 'last_utc': None}
+
+    if state is not None:
+        last_ingested = state.high_water_mark(location, parameter)
+        if last_ingested is not None:
+            if last_ingested >= parse_utc(end_date):
+                return summary
+            start_date = max(parse_utc(start_date), last_ingested + timedelta(seconds=1)).isoformat()
+
+    pages = queue.Queue(maxsize=queue_size)
+    # Set when the consumer gives up, so a producer blocked on a full queue can exit
+    stop = threading.Event()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                pages.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def produce():
+        try:
+            with requests.Session() as session:
+                for rows in extract.iter_pages(session, location, parameter, start_date, end_date, limiter,
+                                               config['extract'].get('base_url'), extract.DEFAULT_PAGE_LIMIT, cache):
+                    if rows:
+                        # Pages come oldest first, so the last row is the newest
+                        summary['last_utc'] = parse_utc(rows[-1][3])
+                    if not put(pd.DataFrame(rows, columns=clean.COLUMN_NAMES)):
+                        return
+            put(None)
+        except Exception as e:
+            put(e)
+
+    def frames():
+        while True:
+            page = pages.get()
+            if page is None:
+                return
+            if isinstance(page, Exception):
+                raise page
+            yield page
+
+    producer = threading.Thread(target=produce, daemon=True)
+    producer.start()
+
+    index = gaps.GapIndex()
+    first = last = None
+    try:
+        with psycopg2.connect(host=config['load']['host'], dbname=config['load']['dbname'],
+                              user=config['load']['user']) as conn:
+            with conn.cursor() as cur:
+                load.create_table(cur, table_name, schema)
+                conn.commit()
+                # An incremental slice is judged against the whole series, as cleaning it in one go would be
+                moments = load.stored_moments(cur, table_name) if state is not None else (0, 0.0, 0.0)
+
+                for resampled_df, chunk_index in clean.clean_chunks(frames(), f"{location} {parameter}"):
+                    moments = clean.update_moments(moments, resampled_df['value'])
+                    index = index.merge(chunk_index)
+                    buffer = io.StringIO()
+                    resampled_df.to_csv(buffer, header=False)
+                    buffer.seek(0)
+                    load.merge_batch(cur, table_name, buffer, schema)
+                    conn.commit()
+
+                    if summary['first_row_seconds'] is None:
+                        summary['first_row_seconds'] = time.time() - started
+                    first = first if first is not None else resampled_df.index[0]
+                    last = resampled_df.index[-1]
+                    summary['rows'] += len(resampled_df)
+
+                count, mean, m2 = moments
+                if count > 1 and summary['rows']:
+                    std = np.sqrt(m2 / (count - 1))
+                    threshold = outlier_options(config).get('threshold', outliers.DEFAULT_THRESHOLDS['zscore'])
+                    summary['outliers'] = load.replace_outliers(cur, table_name, first.tz_localize(None),
+                                                                last.tz_localize(None), mean, std, threshold,
+                                                                schema=schema)
+                    conn.commit()
+
+                if config['load'].get('binary_dir') and summary['rows']:
+                    Path(config['load']['binary_dir']).mkdir(parents=True, exist_ok=True)
+                    binseries.export_table(cur, table_name,
+                                           binseries.series_path(config['load']['binary_dir'], table_name), index)
+    finally:
+        stop.set()
+        producer.join()
+
+    metrics.incr('clean_rows', summary['rows'])
+    metrics.incr('clean_gaps_filled', index.missing)
+    metrics.incr('clean_outliers_replaced', summary['outliers'])
+    metrics.incr('load_rows', summary['rows'])
+
+    # Only advance the high-water mark once the new slice is in the database
+    if state is not None and summary['rows'] > 0:
+        state.update(location, parameter, summary['last_utc'])
+    return summary
+
+def run_streaming(config, workers, queue_size=8):
+    """Runs extract -> clean -> load as one stream per location/parameter pair, with no files in between.
+
+    Args:
+        config (dict): Parsed config.yaml.
+        workers (int): Number of pairs streamed at the same time.
+        queue_size (int): API pages buffered per pair before the fetcher waits for the loader.
+    """
+    import resource
+
+    import extract
+    from cache import ResponseCache, DEFAULT_CACHE_DIR, DEFAULT_TTL, DEFAULT_MAX_MB
+    from state import ExtractState
+
+    if outlier_options(config).get('method', 'zscore') != 'zscore':
+        raise ValueError("--streaming only supports the zscore outlier method")
+
+    pairs = [(location, parameter)
+             for location in config['extract']['locations']
+             for parameter in config['extract']['parameters']]
+    limiter = extract.TokenBucket(rate=extract.DEFAULT_RATE_LIMIT / 60, capacity=extract.DEFAULT_RATE_LIMIT)
+    state = None
+    if config['extract'].get('incremental'):
+        state = ExtractState(config['extract'].get('state_file', 'extract_state.json'))
+    cache = None
+    if config.get('cache'):
+        cache = ResponseCache(config['cache'].get('dir', DEFAULT_CACHE_DIR), config['cache'].get('ttl', DEFAULT_TTL),
+                              config['cache'].get('max_mb', DEFAULT_MAX_MB), config['cache'].get('offline', False))
+
+    started = time.time()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {pair: executor.submit(stream_pair, config, pair[0], pair[1], limiter, state, cache, queue_size)
+                   for pair in pairs}
+        results = {pair: future.result() for pair, future in futures.items()}
+    total = time.time() - started
+
+    rows_loaded = sum(result['rows'] for result in results.values())
+    print(f"{'pair':<24} {'rows':>7} {'outliers':>8} {'first row (s)':>13}")
+    for (location, parameter), result in results.items():
+        first_row = result['first_row_seconds']
+        print(f"{location + ' ' + parameter:<24} {result['rows']:>7} {result['outliers']:>8} "
+              f"{first_row if first_row is not None else float('nan'):>13.2f}")
+    # ru_maxrss is in kilobytes on Linux
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"Total wall time: {total:.2f}s, {rows_loaded} rows loaded ({rows_loaded / total:.1f} rows/s), "
+          f"peak memory {peak_mb:.0f} MB")
+
+def main():
+    parser = argparse.ArgumentParser(description="Orchestrate the ETL workflow.")
+    parser.add_argument("--config", default="config.yaml", help="Path to the configuration file.")
+    parser.add_argument("--parallel", action="store_true",
+                        help="Run the stages in-process as a parallel DAG instead of one subprocess per step.")
+    parser.add_argument("--workers", type=int, default=4, help="Worker count for --parallel and --streaming modes.")
+    parser.add_argument("--streaming", action="store_true",
+                        help="Stream API pages through an incremental cleaner straight into the database, "
+                             "without intermediate files.")
+    parser.add_argument("--queue-size", type=int, default=8,
+                        help="Pages buffered per pair in --streaming mode before fetching waits for the loader.")
+    parser.add_argument("--metrics", help="Write the run's counters and timers to this file.")
+    parser.add_argument("--metrics-format", choices=metrics.FORMATS, default='jsonl',
+                        help="JSON lines (appended) or Prometheus text format (replaced) for --metrics.")
+    parser.add_argument("--profile", help="Write cProfile dumps per stage to this directory.")
+    args = parser.parse_args()
+
+    with open(args.config, "r") as f:
+        config = yaml.safe_load(f)
+
+    if args.streaming:
+        with metrics.profile('streaming', args.profile):
+            run_streaming(config, args.workers, args.queue_size)
+    elif args.parallel:
+        run_parallel(config, args.workers, args.profile)
+    else:
+        # The scripts append JSON lines themselves; for Prometheus they are summed into one exposition
+        prometheus = args.metrics is not None and args.metrics_format == 'prometheus'
+        script_metrics = f"{args.metrics}.jsonl" if prometheus else args.metrics
+        run_subprocess(config, script_metrics, args.profile)
+        if not prometheus:
+            return
+        if os.path.exists(script_metrics):
+            metrics.merge(metrics.read_jsonl(script_metrics))
+            os.remove(script_metrics)
+
+    if args.metrics:
+        metrics.export(args.metrics, args.metrics_format, stage='orchestrate')
+        print(f"Metrics written to {args.metrics}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
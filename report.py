@@ -0,0 +1,131 @@
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+# Worker processes only write image files, never open windows
+os.environ['MPLBACKEND'] = 'Agg'
+
+import datasource
+from average_day import plot_average_day
+from crtanje import plot_day_of_week
+from crtanje2 import plot_hourly_boxplot
+from crtanje3 import plot_stats_table
+from crtanje4 import plot_day_tables
+from line_graph_y import plot_tables
+
+def render(func, output, *args):
+    """Runs func(*args, output) in a worker and returns (files written, seconds)."""
+    start = time.perf_counter()
+    files = func(*args, output)
+    if not isinstance(files, list):
+        files = [output]
+    return files, time.perf_counter() - start
+
+def figure_jobs(table, df, series, out_dir, start_date, end_date):
+    """Derives every frame the report needs from one in-memory series.
+
+    The profiles are grouped on the compact copy of the series (`series`), the line plot gets
+    the min/max points per pixel column of the frame and the box plot the frame itself.
+
+    Returns:
+        list: (figure name, plotting function, output path, plotting arguments) tuples.
+    """
+    from downsample import downsample_frame
+
+    by_hour = series.profile()
+    by_day_hour = series.profile(weekday=True)
+    hour_stats = by_hour[['mean', 'median']]
+    return [
+        ('line', plot_tables, out_dir / 'line.png',
+         ({table: downsample_frame(df).rename(columns={'datetime': 'timestamp'})},)),
+        ('day_of_week', plot_day_of_week, out_dir / 'day_of_week.png',
+         (by_day_hour['mean'].unstack(level=0), by_hour['mean'])),
+        ('boxplot', plot_hourly_boxplot, out_dir / 'boxplot.png', (df,)),
+        ('hourly_stats', plot_stats_table, out_dir / 'hourly_stats.png', (hour_stats,)),
+        ('hourly_stats_by_day', plot_day_tables, out_dir / 'hourly_stats_{day}.png',
+         (by_day_hour[['mean', 'median']],)),
+        ('average_day', plot_average_day, out_dir / 'average_day.png',
+         (by_hour['mean'], f"Average Day ({start_date} to {end_date})")),
+    ]
+
+def build_report(tables, start_date, end_date, tz, source, output_dir, workers=None):
+    """Loads each table once and renders all of its figures on a process pool.
+
+    Args:
+        tables (list): Table names, e.g. SANTA_ANITA_pm10.
+        start_date (str): Inclusive start (UTC), or None.
+        end_date (str): Exclusive end (UTC), or None.
+        tz (str or int): IANA timezone name or integer UTC offset for the local-time figures.
+        source (str): Data source URL (see datasource.get_source).
+        output_dir (str): Directory receiving one subdirectory per table and manifest.json.
+        workers (int): Number of rendering processes (default: one per CPU).
+
+    Returns:
+        dict: The manifest that was written.
+    """
+    from compact import CompactSeries
+
+    started = time.perf_counter()
+    output_dir = Path(output_dir)
+    manifest = {'start_date': start_date, 'end_date': end_date, 'tz': str(tz), 'source': source,
+                'tables': {}, 'figures': []}
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {}
+        for table in tables:
+            load_start = time.perf_counter()
+            df = datasource.load_series(table, start_date, end_date, tz, source)
+            load_seconds = time.perf_counter() - load_start
+
+            out_dir = output_dir / table
+            out_dir.mkdir(parents=True, exist_ok=True)
+            summary = datasource.summary_frame(df)
+            series = CompactSeries.from_frame(df)
+            with open(out_dir / 'summary.json', 'w') as f:
+                json.dump(summary, f, indent=2)
+            manifest['tables'][table] = {'rows': len(df), 'load_seconds': round(load_seconds, 3),
+                                         'summary': str(out_dir / 'summary.json')}
+
+            # Each figure gets its own copy of the frames it needs, the rendering runs in parallel
+            for name, func, output, func_args in figure_jobs(table, df, series, out_dir, start_date, end_date):
+                future = executor.submit(render, func, str(output), *func_args)
+                futures[future] = (table, name)
+
+        for future in as_completed(futures):
+            table, name = futures[future]
+            files, seconds = future.result()
+            manifest['figures'].append({'table': table, 'figure': name, 'files': files,
+                                        'seconds': round(seconds, 3)})
+
+    manifest['figures'].sort(key=lambda entry: (entry['table'], entry['figure']))
+    manifest['total_seconds'] = round(time.perf_counter() - started, 3)
+    with open(output_dir / 'manifest.json', 'w') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+def main():
+    parser = argparse.ArgumentParser(description="Render every chart and table for one or more series from a single load.")
+    parser.add_argument("tables", nargs="+", help="Table names (e.g. SANTA_ANITA_pm10)")
+    parser.add_argument("--start_date", help="Start date (YYYY-MM-DD)")
+    parser.add_argument("--end_date", help="End date (YYYY-MM-DD)")
+    parser.add_argument("--tz", default='UTC', help="UTC offset in hours, or an IANA timezone name (for target timezone)")
+    parser.add_argument("--source", default=datasource.DEFAULT_SOURCE,
+                        help="Data source URL (postgresql://..., duckdb:///path/to/cleaned/files or binary:///path/to/f32/files)")
+    parser.add_argument("--output_dir", default='report', help="Directory for the figures and manifest.json")
+    parser.add_argument("--workers", type=int, help="Number of rendering processes (default: one per CPU)")
+    args = parser.parse_args()
+
+    manifest = build_report(args.tables, args.start_date, args.end_date, args.tz, args.source,
+                            args.output_dir, args.workers)
+
+    print(f"{'table':<24} {'figure':<20} {'seconds':>8}")
+    for entry in manifest['figures']:
+        print(f"{entry['table']:<24} {entry['figure']:<20} {entry['seconds']:>8.2f}")
+    print(f"Total wall time: {manifest['total_seconds']:.2f}s, manifest written to "
+          f"{Path(args.output_dir) / 'manifest.json'}")
+
+if __name__ == "__main__":
+    main()
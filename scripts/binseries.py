@@ -0,0 +1,248 @@
+import argparse
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import gaps
+import store
+
+SUFFIX = '.f32'
+MAGIC = b'AQHOURLY'
+VERSION = 1
+HOUR_NS = 3600 * 10 ** 9
+# Fixed 64 byte header, read with np.fromfile like the rest of the file
+HEADER = np.dtype([('magic', 'S8'), ('version', '<u4'), ('reserved', '<u4'), ('start_hour', '<i8'),
+                   ('hours', '<i8'), ('values_offset', '<i8'), ('padding', '<i8', 3)])
+
+
+def file_path(csv_file):
+    """The binary series kept next to a cleaned CSV file (measurements_X.csv -> measurements_X.f32)."""
+    return Path(csv_file).with_suffix(SUFFIX)
+
+
+def series_path(directory, table):
+    """The binary series of a <location>_<parameter> table in a directory, named like its cleaned CSV file."""
+    return Path(directory) / f"measurements_{table}{SUFFIX}"
+
+
+def store_path(store_dir, location, parameter):
+    """The binary series kept with a cleaned series in the columnar store."""
+    return store.series_dir(store_dir, store.CLEAN, location, parameter) / f"series{SUFFIX}"
+
+
+def _first_hour(ts):
+    """The first whole UTC epoch hour at or after a timestamp (naive values are taken as UTC)."""
+    ts = pd.Timestamp(ts)
+    ts = ts.tz_localize('UTC') if ts.tz is None else ts.tz_convert('UTC')
+    return -(-ts.value // HOUR_NS)
+
+
+class BinarySeries:
+    """A read-only, memory-mapped hourly series file.
+
+    Layout: a 64 byte header (magic, version, first UTC epoch hour, number of hours, offset
+    of the values), the gap bitmap (one bit per hour, set for hours that were missing and
+    interpolated by clean, or are NaN) and then one float32 value per hour. Hour i of the
+    file is start_hour + i, so a date range is two subtractions away and slicing returns
+    views of the mapping: nothing is parsed or copied, and only the pages that are touched
+    are read from disk.
+
+    Args:
+        path (str): The .f32 file.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        header = np.fromfile(self.path, dtype=HEADER, count=1)
+        if len(header) == 0 or header['magic'][0] != MAGIC or header['version'][0] != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} binary series file")
+        self.start_hour = int(header['start_hour'][0])
+        self.hours = int(header['hours'][0])
+        if self.hours:
+            self.bitmap = np.memmap(self.path, dtype=np.uint8, mode='r', offset=HEADER.itemsize,
+                                    shape=((self.hours + 7) // 8,))
+            self.values = np.memmap(self.path, dtype=np.float32, mode='r', offset=int(header['values_offset'][0]),
+                                    shape=(self.hours,))
+        else:
+            self.bitmap = np.empty(0, dtype=np.uint8)
+            self.values = np.empty(0, dtype=np.float32)
+
+    def __len__(self):
+        return self.hours
+
+    @property
+    def end_hour(self):
+        """The epoch hour after the last one of the file."""
+        return self.start_hour + self.hours
+
+    def offsets(self, start=None, end=None):
+        """Positions [i, j) of the hours in [start, end) (UTC, naive values are taken as UTC)."""
+        first = self.start_hour if start is None else _first_hour(start)
+        last = self.end_hour if end is None else _first_hour(end)
+        i = min(max(first - self.start_hour, 0), self.hours)
+        j = min(max(last - self.start_hour, i), self.hours)
+        return i, j
+
+    def slice(self, start=None, end=None):
+        """The values of [start, end) as a view of the file.
+
+        Returns:
+            tuple: (epoch hour of the first value, float32 array).
+        """
+        i, j = self.offsets(start, end)
+        return self.start_hour + i, self.values[i:j]
+
+    def gap_mask(self, start=None, end=None):
+        """Boolean mask of the hours of [start, end) that were missing, unpacking only their bytes."""
+        i, j = self.offsets(start, end)
+        bits = np.unpackbits(self.bitmap[i // 8:(j + 7) // 8], bitorder='little')
+        return bits[i % 8:i % 8 + j - i].astype(bool)
+
+    def gap_index(self):
+        """The GapIndex of the whole file (its NaN hours count as missing too)."""
+        missing = self.gap_mask()
+        observed = np.flatnonzero(~missing)
+        return gaps.GapIndex.from_hours(self.start_hour + observed)
+
+    def to_frame(self, start=None, end=None, tz='UTC'):
+        """The hours of [start, end) that have a value, as a frame with tz-aware 'datetime' and 'value' columns."""
+        first, values = self.slice(start, end)
+        present = np.flatnonzero(~np.isnan(values))
+        times = pd.DatetimeIndex((first + present) * HOUR_NS, tz='UTC').tz_convert(tz)
+        return pd.DataFrame({'datetime': times, 'value': values[present].astype(np.float64)})
+
+    def to_compact(self, start=None, end=None, tz='UTC'):
+        """The hours of [start, end) as a CompactSeries on the local wall clock of `tz`.
+
+        For UTC the values are the mapped array itself; other zones only add the local
+        hours. NaN hours stay in and are skipped by the group-bys.
+        """
+        from compact import CompactSeries
+
+        first, values = self.slice(start, end)
+        hours = first + np.arange(len(values), dtype=np.int64)
+        if tz != 'UTC':
+            local = pd.DatetimeIndex(hours * HOUR_NS, tz='UTC').tz_convert(tz).tz_localize(None)
+            hours = local.as_unit('ns').asi8 // HOUR_NS
+        return CompactSeries(hours, values, tz)
+
+
+def write(path, start_hour, values, missing):
+    """Writes a binary series file, replacing any previous one atomically.
+
+    Readers that still map the old file keep reading it until they reopen.
+
+    Args:
+        path (str): The .f32 file.
+        start_hour (int): UTC epoch hour of values[0].
+        values (np.ndarray): One value per hour (NaN where there is none).
+        missing (np.ndarray): Boolean flag per hour, set for gaps.
+    """
+    values = np.asarray(values, dtype=np.float32)
+    bitmap = np.packbits(np.asarray(missing, dtype=bool) | np.isnan(values), bitorder='little')
+    # Values start on an 8 byte boundary after the bitmap
+    values_offset = HEADER.itemsize + (len(bitmap) + 7) // 8 * 8
+    header = np.zeros(1, dtype=HEADER)
+    header[0] = (MAGIC, VERSION, 0, start_hour, len(values), values_offset, 0)
+
+    path = Path(path)
+    tmp_path = path.with_name(f"{path.name}.tmp")
+    with open(tmp_path, 'wb') as f:
+        header.tofile(f)
+        bitmap.tofile(f)
+        f.write(b'\0' * (values_offset - HEADER.itemsize - len(bitmap)))
+        values.tofile(f)
+    os.replace(tmp_path, path)
+
+
+def update(path, times, values, index=None):
+    """Merges a cleaned hourly slice into the binary series at `path` (created if needed).
+
+    The slice is authoritative over its own hours, as GapIndex.merge; hours between the
+    stored series and the slice become NaN gaps.
+
+    Args:
+        path (str): The .f32 file.
+        times (array-like): On-the-hour timestamps of the slice (naive values are UTC).
+        values (array-like): Values aligned with `times`.
+        index (GapIndex): Observed hours of the slice (default: every hour with a value).
+
+    Returns:
+        int: Number of hours in the file.
+    """
+    times = pd.DatetimeIndex(times)
+    if times.tz is not None:
+        times = times.tz_convert('UTC').tz_localize(None)
+    ns = times.as_unit('ns').asi8
+    if (ns % HOUR_NS).any():
+        raise ValueError("Binary series only hold on-the-hour data")
+    hours = ns // HOUR_NS
+    values = np.asarray(values, dtype=np.float32)
+    if len(hours) == 0:
+        return BinarySeries(path).hours if Path(path).exists() else 0
+
+    old = BinarySeries(path) if Path(path).exists() else None
+    first, last = int(hours.min()), int(hours.max()) + 1
+    if old is not None and len(old):
+        first, last = min(first, old.start_hour), max(last, old.end_hour)
+    merged = np.full(last - first, np.nan, dtype=np.float32)
+    missing = np.zeros(last - first, dtype=bool)
+    if old is not None and len(old):
+        merged[old.start_hour - first:old.end_hour - first] = old.values
+        missing[old.start_hour - first:old.end_hour - first] = old.gap_mask()
+
+    new_first = int(hours.min())
+    span = slice(new_first - first, int(hours.max()) + 1 - first)
+    merged[span] = np.nan
+    missing[span] = True
+    merged[hours - first] = values
+    missing[hours - first] = np.isnan(values)
+    if index is not None and not index.empty:
+        filled = index.missing_hours()
+        missing[filled[(filled >= first) & (filled < last)] - first] = True
+    del old
+    write(path, first, merged, missing)
+    return len(merged)
+
+
+def export_table(cur, table_name, path, index=None):
+    """Writes the whole series of a database table (or unified view) as a binary series file.
+
+    Args:
+        cur: Database cursor.
+        table_name (str): <location>_<parameter> table.
+        path (str): The .f32 file.
+        index (GapIndex): Observed hours of the series, e.g. from clean's gap index.
+
+    Returns:
+        int: Number of hours in the file.
+    """
+    cur.execute(f"SELECT floor(EXTRACT(EPOCH FROM datetime) / 3600)::bigint, value FROM {table_name} ORDER BY 1")
+    rows = np.array(cur.fetchall(), dtype=np.float64).reshape(-1, 2)
+    hours = rows[:, 0].astype(np.int64)
+    if len(hours) == 0:
+        return 0
+    values = np.full(hours[-1] - hours[0] + 1, np.nan, dtype=np.float32)
+    values[hours - hours[0]] = rows[:, 1]
+    missing = np.isnan(values)
+    if index is not None and not index.empty:
+        filled = index.missing_hours() - hours[0]
+        missing[filled[(filled >= 0) & (filled < len(values))]] = True
+    write(path, int(hours[0]), values, missing)
+    return len(values)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Describe binary series files.")
+    parser.add_argument("paths", nargs="+", help=f"{SUFFIX} files")
+    args = parser.parse_args()
+
+    print(f"{'series':<40} {'first':<26} {'hours':>7} {'MiB':>6} {'missing':>8} {'coverage':>9}")
+    for path in args.paths:
+        series = BinarySeries(path)
+        index = series.gap_index()
+        first = pd.Timestamp(series.start_hour * HOUR_NS, tz='UTC').isoformat()
+        print(f"{Path(path).name:<40} {first:<26} {len(series):>7} {Path(path).stat().st_size / 2 ** 20:>6.2f} "
+              f"{int(series.gap_mask().sum()):>8} {index.coverage:>9.1%}")
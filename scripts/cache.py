@@ -0,0 +1,116 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from state import parse_utc
+
+DEFAULT_CACHE_DIR = '.openaq_cache'
+# Pages of windows that are still open (or just closed) are refetched after this many seconds
+DEFAULT_TTL = 3600
+DEFAULT_MAX_MB = 512
+# OpenAQ keeps ingesting late measurements for a while after they were taken
+CLOSED_AFTER = timedelta(days=2)
+
+
+class CacheMiss(LookupError):
+    """Raised in offline mode when a page is not in the cache."""
+
+
+class ResponseCache:
+    """On-disk cache of API pages, addressed by a hash of the endpoint and query parameters.
+
+    The query parameters carry the location, parameter, date window and page, so each page
+    is stored once. Pages of closed windows (date_to older than CLOSED_AFTER) never change
+    and are kept until evicted, the others expire after `ttl` seconds. When the cache grows
+    past `max_mb`, the least recently used pages are removed first.
+
+    Args:
+        directory (str): Cache directory (created on demand).
+        ttl (float): Lifetime in seconds of pages from windows that are still open.
+        max_mb (float): Size cap of the cache directory in megabytes.
+        offline (bool): Never touch the network; a missing page raises CacheMiss.
+    """
+
+    def __init__(self, directory=DEFAULT_CACHE_DIR, ttl=DEFAULT_TTL, max_mb=DEFAULT_MAX_MB, offline=False):
+        self.directory = Path(directory)
+        self.ttl = ttl
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.offline = offline
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._size = sum(path.stat().st_size for path in self.directory.glob('*/*.json'))
+
+    def _path(self, url, params):
+        # The same window spelled '...Z' or '...+00:00' maps to the same page
+        params = {name: parse_utc(str(value)).isoformat() if name in ('date_from', 'date_to') else value
+                  for name, value in params.items()}
+        key = json.dumps({'url': url, 'params': params}, sort_keys=True, default=str)
+        digest = hashlib.sha256(key.encode()).hexdigest()
+        return self.directory / digest[:2] / f'{digest}.json'
+
+    @staticmethod
+    def is_closed(params):
+        """True when the page belongs to a window that can no longer receive new measurements."""
+        date_to = params.get('date_to')
+        if not date_to:
+            return False
+        return parse_utc(str(date_to)) + CLOSED_AFTER <= datetime.now(timezone.utc)
+
+    def get(self, url, params):
+        """Returns the cached JSON body for the request, or None if it is missing or expired."""
+        path = self._path(url, params)
+        try:
+            with open(path, 'r') as f:
+                entry = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            entry = None
+
+        if entry is not None and (entry['closed'] or time.time() - entry['fetched_at'] < self.ttl):
+            # The modification time doubles as the last-use time for LRU eviction
+            os.utime(path)
+            with self._lock:
+                self.hits += 1
+            return entry['body']
+
+        with self._lock:
+            self.misses += 1
+        if self.offline:
+            raise CacheMiss(f"Page {params.get('page')} of {params.get('location')} {params.get('parameter')} "
+                            f"({params.get('date_from')} - {params.get('date_to')}) is not cached")
+        return None
+
+    def put(self, url, params, body):
+        """Stores a JSON body, then evicts the least recently used pages if the cache is over its cap."""
+        path = self._path(url, params)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        previous = path.stat().st_size if path.exists() else 0
+
+        tmp_path = path.with_name(f'{path.name}.{threading.get_ident()}.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump({'fetched_at': time.time(), 'closed': self.is_closed(params), 'body': body}, f)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            self._size += path.stat().st_size - previous
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        """Removes the least recently used pages until the cache is back under 90% of its cap."""
+        entries = []
+        for path in self.directory.glob('*/*.json'):
+            stat = path.stat()
+            entries.append((stat.st_mtime, stat.st_size, path))
+        entries.sort()
+
+        self._size = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if self._size <= self.max_bytes * 0.9:
+                break
+            path.unlink(missing_ok=True)
+            self._size -= size
@@ -1,82 +1,519 @@
-import pandas as pd
-import numpy as np
 import argparse
+import os
 
-def check_missing_times_and_outliers(csv_file_path):
+import metrics
+import outliers
+import store
+
+# Column names of the raw extract files
+COLUMN_NAMES = ['location', 'sensor_type', 'value', 'datetime', 'unit']
+
+def check_missing_times_and_outliers(csv_file_path, method=outliers.DEFAULT_METHOD, window=outliers.DEFAULT_WINDOW,
+                                    threshold=None, engine='numpy'):
     """
     Loads a CSV file (no header), checks for missing hourly timestamps, reports findings,
     and performs outlier detection.
 
     Args:
         csv_file_path (str): The path to the CSV file.
+        method (str): Outlier detection method (see outliers.METHODS).
+        window (int): Window length in hours for the rolling methods.
+        threshold (float): Outlier cut-off (default: the method's own, see outliers.DEFAULT_THRESHOLDS).
+        engine (str): 'numpy' or 'numba' for the Hampel kernel.
+
+    Returns:
+        int: Number of hourly rows written.
     """
+    import numpy as np
+    import pandas as pd
 
-    # Column names for clarity
-    column_names = ['location', 'sensor_type', 'value', 'datetime', 'unit']
+    import binseries
+    import gaps
 
     # Load the CSV into a Pandas DataFrame, assigning column names
-    df = pd.read_csv(csv_file_path, header=None, names=column_names)
+    df = pd.read_csv(csv_file_path, header=None, names=COLUMN_NAMES)
 
     # Convert the 'datetime' column to proper datetime format
     df['datetime'] = pd.to_datetime(df['datetime'])
 
     # Set 'datetime' as the index for later resampling
     df.set_index('datetime', inplace=True)
-    df = df.groupby('datetime').mean()
+    df = df.groupby('datetime')[['value']].mean()
     df.replace(-999, np.nan, inplace=True)
     df.fillna(method='ffill', inplace=True) 
     df.fillna(method='bfill', inplace=True)
 
-    # Resample dataframe to 1 hour intervals
-    resampled_df = df.resample('H').interpolate(method='time')
-    resampled_df['value'] = resampled_df.groupby('datetime')['value'].transform('mean')
+    # Gap index of the observed hours, kept next to the file for coverage reports and refetching
+    index = gaps.GapIndex.from_times(df.index)
 
+    # Fill the gaps straight from the index when every reading is on the hour,
+    # otherwise resample dataframe to 1 hour intervals
+    if len(df) and (df.index == df.index.floor('h')).all() and not df['value'].isna().any():
+        grid, values = index.interpolate(df.index, df['value'].to_numpy())
+        resampled_df = pd.DataFrame({'value': values}, index=grid)
+    else:
+        resampled_df = df.resample('H').interpolate(method='time')
+        resampled_df['value'] = resampled_df.groupby('datetime')['value'].transform('mean')
 
-    # Check for missing times
-    missing_times = resampled_df.index.difference(df.index)
-
-    # Print missing times
-    if missing_times.empty:
+    # Print missing times, one line per gap
+    if index.missing == 0:
         print("No missing times found.")
     else:
-        print("Missing times in", csv_file_path)
-        for time in missing_times:
-            print(time)
+        print(f"Missing times in {csv_file_path}: {index.missing} hours in {len(index.runs)} gaps")
+        for line in index.describe():
+            print(line)
+    gaps.update(gaps.gaps_path(csv_file_path), index)
 
     print(resampled_df)
+
+    # Check for outliers, replace them in place and flag them in an 'outlier' column
+    replaced = outliers.replace(resampled_df, 'value', method, window, threshold, engine)
+
+    # Print outlier findings
+    if replaced:
+        print(f"Outliers detected by the {method} method and replaced:")
+        print(resampled_df.loc[resampled_df['outlier'], 'value'])
+    else:
+        print(f"No outliers detected by the {method} method.")
+
     resampled_df.to_csv(csv_file_path, index=True)
+    binseries.update(binseries.file_path(csv_file_path), resampled_df.index, resampled_df['value'], index)
+    metrics.incr('clean_rows', len(resampled_df))
+    metrics.incr('clean_gaps_filled', index.missing)
+    metrics.incr('clean_outliers_replaced', replaced)
+    return len(resampled_df)
 
-    # Check for outliers (Z-score method)
-    def detect_outliers_zscore(data, threshold=3):
-        """Detects outliers using Z-score."""
-        mean = data.mean()
-        std = data.std()
-        z_scores = np.abs((data - mean) / std)
-        return data[z_scores > threshold]
+def _iter_clean_chunks(csv_file_path, chunksize):
+    """Yields (hourly_frame, gap_index) for a time-ordered raw file, one chunk at a time."""
+    import pandas as pd
 
-    outliers_zscore = detect_outliers_zscore(resampled_df['value']) 
+    reader = pd.read_csv(csv_file_path, header=None, names=COLUMN_NAMES,
+                         usecols=['value', 'datetime'], chunksize=chunksize)
+    yield from clean_chunks(reader, csv_file_path)
 
-    # Print outlier findings
-    if not outliers_zscore.empty:
-        print("Outliers detected by Z-score method:")
-        print(outliers_zscore)
+def clean_chunks(chunks, name='stream'):
+    """Yields (hourly_frame, gap_index) for time-ordered raw chunks with 'datetime' and 'value' columns.
+
+    Applies the same steps as check_missing_times_and_outliers (per-timestamp mean, -999 masking,
+    ffill/bfill, hourly time interpolation) while carrying just enough state across chunk edges:
+    the rows of the last timestamp (they may continue in the next chunk), the last valid value
+    (for ffill), the rows before the first valid value (for bfill) and the last emitted hourly
+    point (the left anchor for interpolating a gap that spans two chunks).
+
+    Outliers are not replaced here, that needs the statistics of the whole series. The gap index
+    covers the hours observed in the chunk; merging the indexes of consecutive chunks also
+    accounts for the gap across their edge.
+
+    Args:
+        chunks: Iterable of DataFrames, e.g. a chunked CSV reader or API pages.
+        name (str): Name of the input, for error messages.
+    """
+    import numpy as np
+    import pandas as pd
+
+    import gaps
+
+    carry = None
+    last_ts = None
+    last_value = None
+    leading = None
+    anchor = None
+
+    chunks = iter(chunks)
+    chunk = next(chunks, None)
+    while chunk is not None:
+        next_chunk = next(chunks, None)
+        final = next_chunk is None
+
+        chunk = chunk[['datetime', 'value']].assign(datetime=pd.to_datetime(chunk['datetime']))
+        if chunk.empty:
+            chunk = next_chunk
+            continue
+        if (last_ts is not None and chunk['datetime'].iloc[0] < last_ts) or not chunk['datetime'].is_monotonic_increasing:
+            raise ValueError(f"{name} is not sorted by time; use the in-memory path instead")
+        last_ts = chunk['datetime'].iloc[-1]
+
+        if carry is not None:
+            chunk = pd.concat([carry, chunk])
+        # Hold back the last timestamp, its duplicates may continue in the next chunk
+        if not final:
+            held = chunk['datetime'] == last_ts
+            carry = chunk[held]
+            chunk = chunk[~held]
+            if chunk.empty:
+                chunk = next_chunk
+                continue
+
+        df = chunk.groupby('datetime')[['value']].mean()
+        df.replace(-999, np.nan, inplace=True)
+
+        # Forward fill from the previous chunk, backward fill the rows before the first valid value
+        if last_value is not None and np.isnan(df['value'].iloc[0]):
+            df.iloc[0, 0] = last_value
+        df = df.ffill()
+        if last_value is None:
+            if leading is not None:
+                df = pd.concat([leading, df])
+            if df['value'].isna().all() and not final:
+                leading = df
+                chunk = next_chunk
+                continue
+            leading = None
+            df = df.bfill()
+        last_value = df['value'].iloc[-1]
+
+        # Resample with the last emitted point as the left edge of any gap
+        if anchor is not None:
+            resampled_df = pd.concat([anchor, df]).resample('h').interpolate(method='time').iloc[1:]
+        else:
+            resampled_df = df.resample('h').interpolate(method='time')
+        anchor = resampled_df.iloc[-1:].copy()
+
+        yield resampled_df, gaps.GapIndex.from_times(df.index)
+        chunk = next_chunk
+
+def update_moments(moments, values):
+    """Merges the count/mean/M2 of `values` into running moments (Chan et al. parallel update).
+
+    Args:
+        moments (tuple): (count, mean, m2) so far, (0, 0.0, 0.0) to start.
+        values (pd.Series): New values (NaNs are ignored).
+
+    Returns:
+        tuple: The updated (count, mean, m2); the sample std is sqrt(m2 / (count - 1)).
+    """
+    values = values.dropna()
+    if values.empty:
+        return moments
+    chunk_mean = values.mean()
+    return merge_moments(moments, (len(values), chunk_mean, ((values - chunk_mean) ** 2).sum()))
+
+def merge_moments(moments, other):
+    """Combines two (count, mean, M2) tuples, e.g. the stored series and a new slice."""
+    count, mean, m2 = moments
+    n, other_mean, other_m2 = other
+    if n == 0:
+        return moments
+    delta = other_mean - mean
+    total = count + n
+    return total, mean + delta * n / total, m2 + other_m2 + delta ** 2 * count * n / total
+
+def clean_streaming(csv_file_path, chunksize=100000, threshold=None):
+    """Streaming version of check_missing_times_and_outliers for large, time-ordered raw files.
+
+    Makes two passes over the input in chunks of `chunksize` rows. The first pass accumulates
+    the running mean/variance of the cleaned hourly series, the second replaces z-score
+    outliers with that mean and writes each chunk out. The rolling outlier methods need
+    windows across chunk edges and are only available on the in-memory paths. Memory is bounded by the chunk size,
+    the output is written exactly once and matches the in-memory path.
+
+    Args:
+        csv_file_path (str): The path to the raw CSV file (no header, ascending time order).
+        chunksize (int): Number of raw rows per chunk.
+        threshold (float): Z-score cut-off (default: outliers.DEFAULT_THRESHOLDS['zscore']).
+
+    Returns:
+        int: Number of hourly rows written.
+    """
+    import numpy as np
+    import pandas as pd
+
+    import binseries
+    import gaps
+
+    if threshold is None:
+        threshold = outliers.DEFAULT_THRESHOLDS['zscore']
+
+    # First pass: running mean/variance
+    count, mean, m2 = 0, 0.0, 0.0
+    for resampled_df, _ in _iter_clean_chunks(csv_file_path, chunksize):
+        count, mean, m2 = update_moments((count, mean, m2), resampled_df['value'])
+    std = np.sqrt(m2 / (count - 1)) if count > 1 else np.nan
+
+    # Second pass: replace outliers and write the cleaned file once
+    tmp_path = f"{csv_file_path}.tmp"
+    rows, replaced = 0, 0
+    index = gaps.GapIndex()
+    # The binary series is written once at the end; at 12 bytes per hour, a decade is about 1 MB
+    hours, values = [], []
+    with open(tmp_path, 'w', newline='') as out:
+        for resampled_df, chunk_index in _iter_clean_chunks(csv_file_path, chunksize):
+            index = index.merge(chunk_index)
 
-        # Replace outliers with mean
-        resampled_df['value'].loc[outliers_zscore.index] = resampled_df['value'].mean()
-        print("Outliers replaced with mean.")
+            z_scores = np.abs((resampled_df['value'] - mean) / std)
+            flagged = z_scores > threshold
+            resampled_df.loc[flagged, 'value'] = mean
+            resampled_df['outlier'] = flagged
+
+            resampled_df.to_csv(out, index=True, header=rows == 0)
+            hours.append(gaps.epoch_hours(resampled_df.index))
+            values.append(resampled_df['value'].to_numpy(np.float32))
+            rows += len(resampled_df)
+            replaced += int(flagged.sum())
+    os.replace(tmp_path, csv_file_path)
+    gaps.update(gaps.gaps_path(csv_file_path), index)
+    if hours:
+        binseries.update(binseries.file_path(csv_file_path), pd.to_datetime(np.concatenate(hours) * gaps.HOUR_NS),
+                         np.concatenate(values), index)
+    metrics.incr('clean_rows', rows)
+    metrics.incr('clean_gaps_filled', index.missing)
+    metrics.incr('clean_outliers_replaced', replaced)
+
+    if index.missing == 0:
+        print("No missing times found.")
+    else:
+        print(f"Missing times in {csv_file_path}: {index.missing} hours in {len(index.runs)} gaps")
+        for line in index.describe():
+            print(line)
+    if replaced:
+        print(f"{replaced} outliers detected by Z-score method and replaced with mean.")
     else:
         print("No outliers detected by Z-score method.")
+    return rows
 
-    resampled_df.to_csv(csv_file_path, index=True)
+def clean_many(df, keys=('location', 'parameter'), threshold=None, method=outliers.DEFAULT_METHOD,
+               window=outliers.DEFAULT_WINDOW, engine='numpy'):
+    """Cleans many series at once from a long-format frame, without a Python loop over series.
+
+    Applies the same steps as check_missing_times_and_outliers to every series: per-timestamp
+    mean, -999 masking, ffill/bfill, hourly reindex with time interpolation and z-score outlier
+    replacement with the series mean. Every step is a grouped pandas fill or a flat NumPy
+    operation over all series, so the cost grows with the total number of rows, not the number
+    of series. The rolling outlier methods run series by series, so no window spans two series.
+
+    Args:
+        df (pd.DataFrame): Long-format frame with the `keys` columns plus 'datetime' and 'value'.
+        keys (tuple): Columns identifying a series.
+        threshold (float): Outlier cut-off (default: the method's own, see outliers.DEFAULT_THRESHOLDS).
+        method (str): Outlier detection method (see outliers.METHODS).
+        window (int): Window length in hours for the rolling methods.
+        engine (str): 'numpy' or 'numba' for the Hampel kernel.
+
+    Returns:
+        pd.DataFrame: Hourly frame with the `keys` columns, 'datetime', 'value' and boolean
+        'missing' and 'outlier' columns marking hours that were not in the input and values
+        that were replaced.
+    """
+    import numpy as np
+    import pandas as pd
+
+    keys = list(keys)
+    hour = np.timedelta64(1, 'h')
+
+    df = df[keys + ['datetime', 'value']].copy()
+    df['datetime'] = pd.to_datetime(df['datetime'])
+
+    # Per-timestamp mean, then -999 masking and ffill/bfill within each series
+    df = df.groupby(keys + ['datetime'], sort=True)['value'].mean().reset_index()
+    df['value'] = df['value'].replace(-999, np.nan)
+    df['value'] = df.groupby(keys, sort=False)['value'].ffill()
+    df['value'] = df.groupby(keys, sort=False)['value'].bfill()
+
+    # Hourly grid for every series: [floor(first), floor(last)] laid out back to back
+    tz = df['datetime'].dt.tz
+    times = (df['datetime'].dt.tz_convert(None) if tz is not None else df['datetime']).to_numpy()
+    series_id = df.groupby(keys, sort=False).ngroup().to_numpy()
+    # Rows are sorted by key then time, so the first/last row of each series bound its range
+    boundaries = np.flatnonzero(np.diff(series_id, prepend=-1))
+    ends = np.append(boundaries[1:], len(df)) - 1
+    first = times[boundaries].astype('datetime64[h]')
+    last = times[ends].astype('datetime64[h]')
+    n_series = len(boundaries)
+
+    lengths = ((last - first) // hour).astype(np.int64) + 1
+    offsets = np.concatenate([[0], np.cumsum(lengths)[:-1]])
+    total = int(lengths.sum())
+    grid_series = np.repeat(np.arange(n_series), lengths)
+    grid_pos = np.arange(total) - np.repeat(offsets, lengths)
+    grid_times = np.repeat(first, lengths) + grid_pos * hour
+
+    # Place the observed points that fall on the grid
+    on_grid = times == times.astype('datetime64[h]')
+    position = offsets[series_id] + (times - first[series_id]) // hour
+    values = np.full(total, np.nan)
+    values[position[on_grid]] = df['value'].to_numpy()[on_grid]
+    known = ~np.isnan(values)
+    missing = np.ones(total, dtype=bool)
+    missing[position[on_grid]] = False
+
+    # Linear (time) interpolation between the previous and next known point of the same series
+    index = np.arange(total)
+    prev_known = np.maximum.accumulate(np.where(known, index, -1))
+    next_known = np.minimum.accumulate(np.where(known, index, total)[::-1])[::-1]
+    series_start = np.repeat(offsets, lengths)
+    series_end = series_start + np.repeat(lengths, lengths) - 1
+    has_prev = prev_known >= series_start
+    has_next = next_known <= series_end
+    prev_value = values[np.clip(prev_known, 0, total - 1)]
+    next_value = values[np.clip(next_known, 0, total - 1)]
+    span = np.where(has_prev & has_next, next_known - prev_known, 1)
+    # Known points have span 0; both branches are evaluated and the known ones are discarded below
+    with np.errstate(invalid='ignore', divide='ignore'):
+        interpolated = np.where(
+            has_prev & has_next,
+            prev_value + (next_value - prev_value) * (index - prev_known) / span,
+            # Past the last known point the value is carried forward, before the first it stays NaN
+            np.where(has_prev, prev_value, np.nan),
+        )
+    values = np.where(known, values, interpolated)
+
+    if threshold is None:
+        threshold = outliers.DEFAULT_THRESHOLDS[method]
+    if method == 'zscore':
+        # Z-score outliers against each series' own mean/std
+        valid = ~np.isnan(values)
+        counts = np.bincount(grid_series[valid], minlength=n_series)
+        means = np.bincount(grid_series[valid], weights=values[valid], minlength=n_series) / np.maximum(counts, 1)
+        deviations = np.where(valid, values - means[grid_series], 0.0)
+        m2 = np.bincount(grid_series, weights=deviations ** 2, minlength=n_series)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            stds = np.sqrt(m2 / (counts - 1))
+            flagged = np.abs(deviations / stds[grid_series]) > threshold
+        values[flagged] = means[grid_series][flagged]
+    else:
+        flagged = np.zeros(total, dtype=bool)
+        for offset, length in zip(offsets, lengths):
+            part = slice(offset, offset + length)
+            flagged[part], replacement = outliers.detect(values[part], method, window, threshold, engine)
+            values[part] = np.where(flagged[part], replacement, values[part])
+
+    key_values = df[keys].to_numpy()[boundaries]
+    result = pd.DataFrame({key: np.repeat(key_values[:, i], lengths) for i, key in enumerate(keys)})
+    result['datetime'] = pd.DatetimeIndex(grid_times.astype('datetime64[ns]'))
+    if tz is not None:
+        result['datetime'] = result['datetime'].dt.tz_localize('UTC').dt.tz_convert(tz)
+    result['value'] = values
+    result['missing'] = missing
+    result['outlier'] = flagged
+    metrics.incr('clean_rows', total)
+    metrics.incr('clean_gaps_filled', int(missing.sum()))
+    metrics.incr('clean_outliers_replaced', int(flagged.sum()))
+    return result
+
+def clean_files(csv_file_paths, **outlier_options):
+    """Cleans several raw extract files in one vectorized pass and rewrites each in place.
+
+    Args:
+        csv_file_paths (list): Paths to raw CSV files (no header).
+        **outlier_options: method, window, threshold and engine, passed on to clean_many().
+
+    Returns:
+        int: Number of hourly rows written across all files.
+    """
+    import pandas as pd
+
+    import binseries
+    import gaps
+
+    frames = []
+    for path in csv_file_paths:
+        frame = pd.read_csv(path, header=None, names=COLUMN_NAMES, usecols=['value', 'datetime'])
+        frame['file'] = str(path)
+        frames.append(frame)
+
+    cleaned = clean_many(pd.concat(frames, ignore_index=True), keys=('file',), **outlier_options)
+
+    for path, series in cleaned.groupby('file', sort=False):
+        missing = int(series['missing'].sum())
+        print(f"{path}: {len(series)} hourly rows, {missing} missing times filled")
+        series[['datetime', 'value', 'outlier']].to_csv(path, index=False)
+        index = gaps.GapIndex.from_times(series.loc[~series['missing'], 'datetime'])
+        gaps.update(gaps.gaps_path(path), index)
+        binseries.update(binseries.file_path(path), series['datetime'], series['value'], index)
+    return len(cleaned)
+
+def clean_store(store_dir, pairs=None, start=None, fmt='parquet', **outlier_options):
+    """Cleans series from the raw stage of the columnar store into its clean stage.
+
+    All requested series are read from their month partitions and cleaned together with
+    clean_many(). The cleaned months replace what was previously stored for them.
+
+    Args:
+        store_dir (str): Store root directory.
+        pairs (list): (location, parameter) pairs to clean (default: every raw series).
+        start (str): Only clean raw data from the UTC month of this timestamp on (e.g. a new
+            incremental slice). The clean stage is replaced month by month, so the whole month
+            of `start` is re-read and re-cleaned.
+        fmt (str): 'parquet' or 'arrow' for the cleaned partitions.
+        **outlier_options: method, window, threshold and engine, passed on to clean_many().
+
+    Returns:
+        int: Number of hourly rows written.
+    """
+    import pandas as pd
+
+    import binseries
+    import gaps
+
+    pairs = pairs or store.list_series(store_dir, store.RAW)
+    if start is not None:
+        # write_series replaces whole month partitions, so start from the first hour of the month
+        start = store.month_start(start)
+    frames = []
+    for location, parameter in pairs:
+        frame = store.read_series(store_dir, store.RAW, location, parameter, start=start)
+        frame['location'] = location
+        frame['parameter'] = parameter
+        if len(frame):
+            frames.append(frame)
+    if not frames:
+        return 0
+
+    raw = pd.concat(frames, ignore_index=True)
+    raw['value'] = raw['value'].astype('float64')
+    cleaned = clean_many(raw, **outlier_options)
+
+    for (location, parameter), series in cleaned.groupby(['location', 'parameter'], sort=False):
+        print(f"{location} {parameter}: {len(series)} hourly rows, {int(series['missing'].sum())} missing times filled")
+        store.write_series(store_dir, store.CLEAN, location, parameter, series, fmt=fmt)
+        index = gaps.GapIndex.from_times(series.loc[~series['missing'], 'datetime'])
+        gaps.update(gaps.store_gaps_path(store_dir, location, parameter), index)
+        binseries.update(binseries.store_path(store_dir, location, parameter), series['datetime'], series['value'], index)
+    return len(cleaned)
 
 # Example usage:
 if __name__ == "__main__":
     # Create argument parser
     parser = argparse.ArgumentParser(description="Process CSV data for missing times and outliers")
-    parser.add_argument("csv_file_path", help="Path to the CSV file")
+    parser.add_argument("csv_file_path", nargs="*", help="Path to the CSV file (several files are cleaned in one batch)")
+    parser.add_argument("--store", help="Clean every raw series of this columnar store instead of CSV files")
+    parser.add_argument("--format", choices=sorted(store.FORMATS), default='parquet', help="Columnar store format")
+    parser.add_argument("--chunksize", type=int,
+                        help="Stream the (time-ordered) file in chunks of this many rows to bound memory")
+    parser.add_argument("--outlier-method", choices=outliers.METHODS, default=outliers.DEFAULT_METHOD,
+                        help="Outlier detection: global z-score (default), rolling z-score, Hampel or IQR")
+    parser.add_argument("--window", type=int, default=outliers.DEFAULT_WINDOW,
+                        help="Window length in hours for the rolling outlier methods")
+    parser.add_argument("--threshold", type=float,
+                        help="Outlier cut-off (default: 3 for the z-score and Hampel methods, 1.5 for IQR)")
+    parser.add_argument("--engine", choices=outliers.ENGINES, default='numpy', help="Kernel for the Hampel method")
+    parser.add_argument("--metrics", help="Write row, gap and outlier counts to this file")
+    parser.add_argument("--metrics-format", choices=metrics.FORMATS, default='jsonl', help="Format of --metrics")
+    parser.add_argument("--profile", help="Write a cProfile dump of the run to this directory")
 
     # Parse the arguments
     args = parser.parse_args()
+    if not args.csv_file_path and not args.store:
+        parser.error("give at least one CSV file or --store")
+    if args.chunksize and args.store:
+        parser.error("--chunksize only applies to CSV files, not to --store")
+    if args.chunksize and args.outlier_method != 'zscore':
+        parser.error("--chunksize only supports the zscore outlier method")
+    outlier_options = {'method': args.outlier_method, 'window': args.window, 'threshold': args.threshold,
+                       'engine': args.engine}
 
     # Call the main function with the provided file path
-    check_missing_times_and_outliers(args.csv_file_path)
+    profile_name = 'clean_' + ('store' if args.store else os.path.basename(args.csv_file_path[0]).rsplit('.', 1)[0])
+    with metrics.profile(profile_name, args.profile):
+        if args.store:
+            clean_store(args.store, fmt=args.format, **outlier_options)
+        elif args.chunksize:
+            for csv_file_path in args.csv_file_path:
+                clean_streaming(csv_file_path, args.chunksize, args.threshold)
+        elif len(args.csv_file_path) > 1:
+            clean_files(args.csv_file_path, **outlier_options)
+        else:
+            check_missing_times_and_outliers(args.csv_file_path[0], **outlier_options)
+
+    if args.metrics:
+        metrics.export(args.metrics, args.metrics_format, stage='clean')
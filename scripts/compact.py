@@ -0,0 +1,116 @@
+import numpy as np
+import pandas as pd
+
+HOUR_NS = 3600 * 10 ** 9
+# Weekday codes follow pandas (Monday is 0); 1970-01-01, epoch day 0, was a Thursday
+WEEKDAY_NAMES = ('Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday')
+EPOCH_WEEKDAY = 3
+SIGN_BIT = np.uint32(0x80000000)
+
+
+def _sortable_bits(values):
+    """Maps float32 values to uint32 keys with the same order (negatives flipped, positives offset)."""
+    bits = values.view(np.uint32)
+    return np.where(bits >> 31, ~bits, bits | SIGN_BIT)
+
+
+def _from_sortable_bits(keys):
+    """Inverse of _sortable_bits()."""
+    return np.where(keys >> 31, keys ^ SIGN_BIT, ~keys).astype(np.uint32).view(np.float32)
+
+
+class CompactSeries:
+    """An hourly series held as flat NumPy arrays instead of a DataFrame of timestamps.
+
+    Timestamps are int64 epoch hours of the local wall clock, values are float32 and the
+    local hour of day, weekday and month are precomputed as uint8 codes: 15 bytes per point,
+    against the ~80 of a frame carrying an hour column and a day-name string column for
+    grouping. Group-bys over the codes are integer bincount reductions rather than hash
+    group-bys on strings.
+
+    Args:
+        hours (np.ndarray): Local wall-clock hours since the epoch, int64.
+        values (np.ndarray): Measurements, stored as float32.
+        tz (str): Timezone of the wall clock, kept to rebuild timestamps.
+    """
+
+    def __init__(self, hours, values, tz='UTC'):
+        self.hours = np.asarray(hours, dtype=np.int64)
+        self.values = np.asarray(values, dtype=np.float32)
+        self.tz = tz
+        days = self.hours // 24
+        self.hour = (self.hours % 24).astype(np.uint8)
+        self.weekday = ((days + EPOCH_WEEKDAY) % 7).astype(np.uint8)
+        self.month = (self.hours.astype('datetime64[h]').astype('datetime64[M]').astype(np.int64) % 12 + 1).astype(np.uint8)
+
+    @classmethod
+    def from_frame(cls, df):
+        """Builds the series from a frame with tz-aware (local) 'datetime' and 'value' columns."""
+        times = pd.DatetimeIndex(df['datetime'])
+        tz = str(times.tz) if times.tz is not None else 'UTC'
+        if times.tz is not None:
+            times = times.tz_localize(None)
+        return cls(times.as_unit('ns').asi8 // HOUR_NS, df['value'].to_numpy(), tz)
+
+    def __len__(self):
+        return len(self.hours)
+
+    @property
+    def nbytes(self):
+        return sum(array.nbytes for array in (self.hours, self.values, self.hour, self.weekday, self.month))
+
+    def to_frame(self):
+        """The series as the usual DataFrame with tz-aware 'datetime' and float64 'value' columns."""
+        times = pd.DatetimeIndex(self.hours * HOUR_NS).tz_localize(self.tz, ambiguous='NaT', nonexistent='NaT')
+        return pd.DataFrame({'datetime': times, 'value': self.values.astype(np.float64)})
+
+    def group_stats(self, codes, size):
+        """Mean, median and count of the non-NaN values per integer code in [0, size).
+
+        Sums are accumulated in float64. For the medians every value is packed with its code
+        into one uint64 key (code in the high half, the float32 bits mapped to an order-
+        preserving uint32 in the low half); a single sort of the keys leaves each group
+        contiguous and in value order, which is much faster than argsorting by value and code.
+
+        Returns:
+            pd.DataFrame: One row per code with at least one value, indexed by code.
+        """
+        valid = ~np.isnan(self.values)
+        codes = np.asarray(codes)[valid].astype(np.intp)
+        values = self.values[valid]
+        count = np.bincount(codes, minlength=size)
+        total = np.bincount(codes, weights=values, minlength=size)
+
+        keys = _sortable_bits(values).astype(np.uint64) | (codes.astype(np.uint64) << np.uint64(32))
+        keys.sort()
+        ordered = _from_sortable_bits((keys & np.uint64(0xFFFFFFFF)).astype(np.uint32)).astype(np.float64)
+        starts = np.cumsum(count) - count
+        present = np.flatnonzero(count)
+        lower = ordered[starts[present] + (count[present] - 1) // 2]
+        upper = ordered[starts[present] + count[present] // 2]
+
+        return pd.DataFrame({'mean': total[present] / count[present], 'median': (lower + upper) / 2,
+                             'count': count[present]}, index=present)
+
+    def profile(self, weekday=False):
+        """Mean/median/count per local hour of day, optionally per day of week and hour.
+
+        Returns:
+            pd.DataFrame: Shaped like datasource.profile_frame(): indexed by hour, or by
+            (day_of_week, hour) with day names in sorted order.
+        """
+        if not weekday:
+            stats = self.group_stats(self.hour, 24)
+            stats.index = stats.index.rename('hour')
+            return stats
+
+        stats = self.group_stats(self.weekday.astype(np.intp) * 24 + self.hour, 7 * 24)
+        names = np.array(WEEKDAY_NAMES)[stats.index // 24]
+        stats.index = pd.MultiIndex.from_arrays([names, stats.index % 24], names=['day_of_week', 'hour'])
+        return stats.sort_index(level='day_of_week', sort_remaining=False)
+
+    def month_profile(self):
+        """Mean/median/count per calendar month (1-12)."""
+        stats = self.group_stats(self.month, 13)
+        stats.index = stats.index.rename('month')
+        return stats
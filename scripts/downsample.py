@@ -0,0 +1,131 @@
+METHODS = ('minmax', 'lttb', 'exact')
+# Screen width in pixels of the default 30 inch line plot at Matplotlib's 100 dpi
+DEFAULT_WIDTH = 3000
+
+
+def minmax_sql(relation, where, buckets):
+    """SQL keeping the lowest and the highest point of each of `buckets` equal time buckets.
+
+    Buckets split the [first, last] timestamps of the selected rows, so with one bucket per
+    pixel column the drawn line covers exactly the same pixels as the full series while at
+    most two points per column leave the database. The extremes are found with a GROUP BY
+    and joined back for their timestamps (ties keep the earliest), which plans much cheaper
+    than ranking every row with window functions. Runs unchanged on PostgreSQL and DuckDB.
+
+    Args:
+        relation (str): Table or table function to read.
+        where (str): WHERE clause restricting the rows (may be empty).
+        buckets (int): Number of time buckets.
+    """
+    return f"""
+        WITH points AS (
+            SELECT datetime, value, date_part('epoch', datetime) AS t FROM {relation} {where}
+        ), bucketed AS (
+            SELECT datetime, value,
+                   LEAST(FLOOR((t - lo) * {int(buckets)} / GREATEST(hi - lo, 1)), {int(buckets) - 1}) AS bucket
+            FROM points, (SELECT MIN(t) AS lo, MAX(t) AS hi FROM points) AS bounds
+        ), extremes AS (
+            SELECT bucket, MIN(value) AS low, MAX(value) AS high FROM bucketed GROUP BY bucket
+        )
+        SELECT datetime, value FROM (
+            SELECT DISTINCT ON (b.bucket, b.value) b.datetime, b.value
+            FROM bucketed b JOIN extremes e ON b.bucket = e.bucket AND (b.value = e.low OR b.value = e.high)
+            ORDER BY b.bucket, b.value, b.datetime
+        ) AS kept
+        ORDER BY datetime
+    """
+
+
+def minmax_indices(times, values, buckets):
+    """In-memory minmax_sql(): positions of the lowest and highest value per time bucket.
+
+    Args:
+        times (np.ndarray): Sorted int64 nanosecond timestamps.
+        values (np.ndarray): Values aligned with `times`.
+        buckets (int): Number of time buckets.
+
+    Returns:
+        np.ndarray: Sorted positions of the kept points.
+    """
+    import numpy as np
+
+    if len(times) == 0:
+        return np.empty(0, dtype=np.intp)
+    # Same arithmetic as the SQL, in float seconds (nanoseconds times buckets would overflow int64)
+    seconds = (times - times[0]) / 1e9
+    bucket = np.minimum(np.floor(seconds * buckets / max(seconds[-1], 1)), buckets - 1).astype(np.int64)
+    # Stable sorts by bucket, then value ascending or descending: each bucket's first entry is
+    # its earliest minimum or maximum, as the SQL keeps them
+    firsts = np.concatenate([[0], np.flatnonzero(np.diff(bucket)) + 1])
+    low = np.lexsort((values, bucket))[firsts]
+    high = np.lexsort((-values, bucket))[firsts]
+    high = high[values[high] != values[low]]
+    return np.sort(np.concatenate([low, high]))
+
+
+def lttb_indices(x, y, threshold):
+    """Largest-Triangle-Three-Buckets: positions of `threshold` points that keep the visual shape.
+
+    The first and last points are always kept; for every bucket in between the point forming
+    the largest triangle with the previously kept point and the average of the next bucket is
+    chosen. Each bucket is one vectorized step.
+
+    Args:
+        x (np.ndarray): Sorted x coordinates (e.g. int64 timestamps).
+        y (np.ndarray): Values aligned with `x`.
+        threshold (int): Number of points to keep.
+
+    Returns:
+        np.ndarray: Sorted positions of the kept points.
+    """
+    import numpy as np
+
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    # Bucket boundaries over the points between the fixed first and last ones
+    edges = np.floor(np.linspace(1, n - 1, threshold - 1)).astype(np.intp)
+    kept = np.empty(threshold, dtype=np.intp)
+    kept[0], kept[-1] = 0, n - 1
+    previous = 0
+    for i in range(threshold - 2):
+        start, stop = edges[i], edges[i + 1]
+        next_start, next_stop = edges[i + 1], edges[i + 2] if i + 2 < len(edges) else n
+        next_x = x[next_start:next_stop].mean()
+        next_y = y[next_start:next_stop].mean()
+        areas = np.abs((x[previous] - next_x) * (y[start:stop] - y[previous])
+                       - (x[previous] - x[start:stop]) * (next_y - y[previous]))
+        previous = start + int(np.argmax(areas))
+        kept[i + 1] = previous
+    return kept
+
+
+def downsample_frame(df, width=DEFAULT_WIDTH, method='minmax', column='datetime'):
+    """Downsamples a time-ordered frame in memory to about `width` points.
+
+    Args:
+        df (pd.DataFrame): Frame with a datetime column and a 'value' column, sorted by time.
+        width (int): Target number of points (pixel columns of the plot).
+        method (str): One of METHODS.
+        column (str): Name of the datetime column.
+
+    Returns:
+        pd.DataFrame: The kept rows (the frame itself for 'exact').
+    """
+    import pandas as pd
+
+    if method == 'exact' or len(df) <= width:
+        return df
+    # UTC nanoseconds, read off the index rather than through tz-less datetime64 objects
+    index = pd.DatetimeIndex(df[column])
+    if index.tz is not None:
+        index = index.tz_convert('UTC').tz_localize(None)
+    times = index.as_unit('ns').asi8
+    values = df['value'].to_numpy()
+    if method == 'minmax':
+        return df.iloc[minmax_indices(times, values, width)]
+    if method == 'lttb':
+        return df.iloc[lttb_indices(times, values, width)]
+    raise ValueError(f"Unknown downsampling method: {method} (expected one of {', '.join(METHODS)})")
@@ -4,105 +4,432 @@ import time
 import logging
 import os
 import argparse
+import random
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from datetime import timedelta
+from pathlib import Path
+
+from state import ExtractState, DEFAULT_STATE_FILE, parse_utc
+from cache import ResponseCache, DEFAULT_CACHE_DIR, DEFAULT_TTL, DEFAULT_MAX_MB
+import metrics
+import store
 
 # Configure logging
-logging.basicConfig(filename='air_quality_fetch.log', 
-                    level=logging.DEBUG, 
+logging.basicConfig(filename='air_quality_fetch.log',
+                    level=logging.DEBUG,
                     format='%(asctime)s - %(levelname)s - %(message)s')
 
 # OpenAQ API setup
 base_url = "https://api.openaq.org/v2/measurements"
 headers = {
     "accept": "application/json"
-}  
+}
 
-# Get API Key 
-api_key = os.environ.get('OPENAQ_API_KEY') 
-if not api_key:
-    logging.error("OpenAQ API key not found in environment. Exiting.")
-    exit(1)
-headers['Authorization'] = f"Bearer {api_key}"
+# Get API Key
+api_key = os.environ.get('OPENAQ_API_KEY')
+if api_key:
+    headers['Authorization'] = f"Bearer {api_key}"
+
+# OpenAQ allows roughly 100 requests per minute per key
+DEFAULT_RATE_LIMIT = 100
+DEFAULT_PAGE_LIMIT = 100
+DEFAULT_WORKERS = 4
+MAX_RETRIES = 8
+DEFAULT_SHARD_WORKERS = 4
+SHARD_FREQUENCIES = {'day': 'D', 'week': 'W-MON', 'month': 'MS'}
 
-def fetch_and_store_measurements(location, start_date, end_date, parameters):
-    """Fetches air quality measurements and stores them in separate CSV files per parameter.
+
+class TokenBucket:
+    """Thread-safe token bucket shared by every fetch worker.
+
+    Tokens refill continuously at `rate` per second up to `capacity`, so the
+    whole extraction stays inside the API budget no matter how many workers
+    are running.
 
     Args:
-        location (str): The location to fetch data for.
-        start_date (str): The start date in ISO 8601 format (YYYY-MM-DDTHH:MM:SSZ).
-        end_date (str): The end date in ISO 8601 format (YYYY-MM-DDTHH:MM:SSZ).
-        parameters (list): List of parameters to fetch (e.g., 'pm25', 'pm10').
+        rate (float): Tokens added per second.
+        capacity (float): Maximum number of tokens (burst size).
     """
 
-    header = ['location', 'parameter', 'value', 'date (utc)', 'unit']
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
 
-    for parameter in parameters:
-        filename = f'measurements_{location.replace(" ", "_")}_{parameter}.csv'
+    def acquire(self):
+        """Blocks until a token is available and returns the seconds spent waiting."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+            waited += wait
 
-        page = 1
-        requests_made = 0
-        start_time = time.time()
 
-        while True:
-            try:
-                params = {
-                    'location': location, 
-                    'date_from': start_date,
-                    'date_to': end_date,
-                    'parameter': parameter, 
-                    'page': page
-                }
-
-                response = requests.get(base_url, headers=headers, params=params)
-
-                if response.status_code == 200:
-                    data = response.json()
-
-                    with open(filename, 'a', newline='') as csvfile:  # Use 'a' to append if the file exists
-                        writer = csv.writer(csvfile)
-
-                        # Write header only for the first iteration of the parameter and first page
-                        if page == 1 and not os.path.exists(filename):
-                            writer.writerow(header)
-
-                        for result in data['results']:
-                            measurement_data = [
-                                result['location'],
-                                result['parameter'],
-                                result['value'],
-                                result['date']['utc'], 
-                                result['unit'],
-                            ]
-                            writer.writerow(measurement_data) 
-
-                    requests_made += 1
-
-                    # Basic Rate Limiting Handling
-                    if requests_made >= 100: 
-                        time_since_start = time.time() - start_time
-                        if time_since_start < 60: 
-                            sleep_time = 60 - time_since_start 
-                            logging.info(f"Rate limit approaching. Sleeping for {sleep_time} seconds...")
-                            time.sleep(sleep_time) 
-                        requests_made = 0
-                        start_time = time.time()
-
-                    # Handle pagination based on OpenAQ's mechanisms
-                    found_value = data['meta']['found']
-                    if found_value == '>100':
-                        page += 1
-                    else:
-                        if int(found_value) < params.get('limit', 100): 
-                            break
-                        page += 1
+def backoff_delay(attempt, base=1.0, cap=60.0):
+    """Exponential backoff with full jitter: a random delay in [0, min(cap, base * 2**attempt)]."""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+def fetch_page(session, params, limiter, url=None, cache=None):
+    """Fetches a single page from the OpenAQ API, retrying with backoff on failure.
+
+    Args:
+        session (requests.Session): Session used for the request.
+        params (dict): Query parameters for the request.
+        limiter (TokenBucket): Shared rate limiter.
+        url (str): Endpoint to query (defaults to the OpenAQ measurements endpoint).
+        cache (ResponseCache): Optional page cache; hits cost neither a request nor a token.
+
+    Returns:
+        dict: The decoded JSON response.
+    """
+    url = url or base_url
+    if cache is not None:
+        data = cache.get(url, params)
+        if data is not None:
+            metrics.incr('extract_cache_hits')
+            return data
+
+    for attempt in range(MAX_RETRIES):
+        metrics.observe('extract_rate_limit_sleep_seconds', limiter.acquire())
+        try:
+            with metrics.timer('extract_request_seconds'):
+                response = session.get(url, headers=headers, params=params)
+
+            if response.status_code == 200:
+                data = response.json()
+                if cache is not None:
+                    cache.put(url, params, data)
+                return data
+
+            delay = backoff_delay(attempt)
+            logging.error(f"Error fetching page {params['page']}: {response.status_code}, {response.text}. "
+                          f"Retrying in {delay:.1f} seconds...")
+
+        except requests.exceptions.RequestException as e:
+            delay = backoff_delay(attempt)
+            logging.error(f"Error occurred: {e}. Retrying in {delay:.1f} seconds...")
+            logging.debug("Exception Details:", exc_info=True)
+
+        metrics.incr('extract_retries')
+        time.sleep(delay)
+
+    raise RuntimeError(f"Giving up on page {params['page']} for {params['location']} "
+                       f"{params['parameter']} after {MAX_RETRIES} attempts")
+
+
+def iter_pages(session, location, parameter, date_from, date_to, limiter, url=None, page_limit=DEFAULT_PAGE_LIMIT,
+               cache=None):
+    """Walks the pages of one time window, oldest first, and yields the rows of each page.
+
+    Each row is [location, parameter, value, utc timestamp, unit], the layout of the raw CSV files.
+    """
+    page = 1
+    while True:
+        params = {
+            'location': location,
+            'date_from': date_from,
+            'date_to': date_to,
+            'parameter': parameter,
+            'limit': page_limit,
+            'page': page,
+            # Oldest first, so the raw file is time-ordered for streaming clean
+            'sort': 'asc',
+            'order_by': 'datetime'
+        }
+        data = fetch_page(session, params, limiter, url, cache)
+        metrics.incr('extract_pages')
+        metrics.incr('extract_rows', len(data['results']))
+
+        yield [[result['location'], result['parameter'], result['value'], result['date']['utc'], result['unit']]
+               for result in data['results']]
+
+        # A short page means we have reached the end of the result set
+        if len(data['results']) < page_limit:
+            break
+        page += 1
+
+
+def shard_windows(start_date, end_date, shard=None):
+    """Splits [start_date, end_date] into consecutive time shards on calendar boundaries.
+
+    Boundaries are UTC midnights (Mondays for weeks, the 1st for months), so the same
+    shards come back on every run and their pages can be served from the response cache.
+
+    Args:
+        start_date (str): The start date in ISO 8601 format.
+        end_date (str): The end date in ISO 8601 format.
+        shard (str): 'day', 'week' or 'month', or None for a single window.
+
+    Returns:
+        list: (date_from, date_to) ISO 8601 pairs in time order; each shard ends where the next starts.
+    """
+    start, end = parse_utc(start_date), parse_utc(end_date)
+    if shard is None or start >= end:
+        return [(start_date, end_date)]
+
+    import pandas as pd
+
+    cuts = pd.date_range(pd.Timestamp(start).floor('D'), end, freq=SHARD_FREQUENCIES[shard])
+    bounds = [start] + [cut.to_pydatetime() for cut in cuts if start < cut < end] + [end]
+    return [(lower.isoformat(), upper.isoformat()) for lower, upper in zip(bounds, bounds[1:])]
+
+
+def _shard_path(shard_dir, window):
+    return shard_dir / (window.replace(':', '').replace('/', '_') + '.csv')
+
+
+def fetch_shard(location, parameter, window, shard_dir, limiter, url, page_limit, cache, checkpoints):
+    """Fetches one time shard into its own part file, then checkpoints it.
+
+    Returns:
+        dict: Pages and rows of the shard.
+    """
+    date_from, date_to = window.split('/')
+    pages = rows = 0
+    path = _shard_path(shard_dir, window)
+    tmp_path = path.with_name(path.name + '.tmp')
+    with requests.Session() as session, open(tmp_path, 'w', newline='') as partfile:
+        writer = csv.writer(partfile)
+        for page_rows in iter_pages(session, location, parameter, date_from, date_to, limiter, url, page_limit,
+                                    cache):
+            writer.writerows(page_rows)
+            pages += 1
+            rows += len(page_rows)
+    os.replace(tmp_path, path)
+
+    summary = {'pages': pages, 'rows': rows}
+    if checkpoints is not None:
+        checkpoints.mark_shard(location, parameter, window, summary)
+    logging.info(f"Fetched shard {window} of {location} {parameter}: {pages} pages ({rows} rows)")
+    return summary
+
 
+def fetch_shards(location, parameter, windows, shard_dir, limiter, url, page_limit, cache, checkpoints, workers):
+    """Fetches the time shards of one pair concurrently into part files under shard_dir.
+
+    Shards checkpointed by an earlier run whose part file is still there are not fetched again.
+
+    Returns:
+        tuple: The part files in time order and the number of pages fetched.
+    """
+    shard_dir.mkdir(parents=True, exist_ok=True)
+    keys = [f"{date_from}/{date_to}" for date_from, date_to in windows]
+    done = checkpoints.completed_shards(location, parameter) if checkpoints is not None else {}
+    todo = [key for key in keys if key not in done or not _shard_path(shard_dir, key).exists()]
+    if len(todo) < len(keys):
+        logging.info(f"Resuming {location} {parameter}: {len(keys) - len(todo)} of {len(keys)} shards already fetched")
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(fetch_shard, location, parameter, key, shard_dir, limiter, url, page_limit, cache,
+                                   checkpoints)
+                   for key in todo]
+        summaries = [future.result() for future in futures]
+    return [_shard_path(shard_dir, key) for key in keys], sum(summary['pages'] for summary in summaries)
+
+
+def _read_part(path):
+    """Yields the rows of a shard part file as a single batch."""
+    with open(path, 'r', newline='') as partfile:
+        yield list(csv.reader(partfile))
+
+
+def fetch_pair(location, parameter, start_date, end_date, limiter, url=None, page_limit=DEFAULT_PAGE_LIMIT,
+               state=None, store_dir=None, store_format='parquet', cache=None, shard=None,
+               shard_workers=DEFAULT_SHARD_WORKERS, checkpoints=None, refetch_gaps=None):
+    """Walks every page for one (location, parameter) pair and writes the rows to its CSV file.
+
+    Without a state store the rows are appended to the CSV file. With one, only the range after
+    the stored high-water mark is requested and the CSV file is rewritten to hold just that new
+    slice (it is removed when there is nothing new), so clean/load only handle the new rows.
+    The caller is responsible for advancing the high-water mark once the slice is safely stored.
+
+    With `refetch_gaps` (hours) the slice instead starts just before the earliest gap in the
+    persisted gap index (see gaps.py) that ends within that many hours of the high-water mark,
+    so late-arriving data fills the holes; the slice stays contiguous for clean to interpolate.
+
+    With `store_dir` the rows go to the columnar store (see store.py) instead of the CSV file,
+    appended to the month partitions they fall in.
+
+    With `shard` the range is split into day/week/month shards that are fetched concurrently,
+    each with its own pagination, into part files that are then merged in time order. Each
+    finished shard is checkpointed in `checkpoints`, so a crashed run resumes shard by shard.
+
+    Returns:
+        dict: Summary with the output file name, pages fetched, rows written and the
+        latest UTC timestamp seen (None if no rows were fetched).
+    """
+    filename = f'measurements_{location.replace(" ", "_")}_{parameter}.csv'
+    if store_dir is not None:
+        filename = str(store.series_dir(store_dir, store.RAW, location, parameter))
+
+    mode = 'a'  # Use 'a' to append if the file exists
+    if state is not None:
+        mode = 'w'
+        last_ingested = state.high_water_mark(location, parameter)
+        if last_ingested is not None:
+            resume = last_ingested + timedelta(seconds=1)
+            if refetch_gaps:
+                import gaps
+
+                index_path = (gaps.store_gaps_path(store_dir, location, parameter) if store_dir is not None
+                              else gaps.gaps_path(filename))
+                gap_windows = gaps.GapIndex.load(index_path).windows(since=last_ingested - timedelta(hours=refetch_gaps))
+                if gap_windows:
+                    # Start on the last observed hour before the gap, so it can be interpolated if it is still open
+                    resume = min(resume, gap_windows[0][0] - timedelta(hours=1))
+                    logging.info(f"Refetching {len(gap_windows)} gaps of {location} {parameter} from {resume}")
+            if resume > parse_utc(end_date):
+                logging.info(f"{location} {parameter} is up to date (last ingested {last_ingested})")
+                if store_dir is None and os.path.exists(filename):
+                    os.remove(filename)
+                return {'file': filename, 'pages': 0, 'rows': 0, 'last_utc': None}
+            start_date = max(parse_utc(start_date), resume).isoformat()
+
+    windows = shard_windows(start_date, end_date, shard)
+    session = requests.Session()
+    if len(windows) == 1:
+        page_source = iter_pages(session, location, parameter, start_date, end_date, limiter, url, page_limit, cache)
+        pages = 0
+    else:
+        # Part files live next to the output; the leading dot keeps them out of store.list_series
+        shard_dir = Path(filename).parent / f'.shards_{Path(filename).name}'
+        part_files, pages = fetch_shards(location, parameter, windows, shard_dir, limiter, url, page_limit, cache,
+                                         checkpoints, shard_workers)
+        page_source = (rows for path in part_files for rows in _read_part(path))
+
+    rows = 0
+    last_utc = None
+    measurements = []
+
+    csv_output = open(filename, mode, newline='') if store_dir is None else nullcontext()
+    with session, csv_output as csvfile:
+        writer = csv.writer(csvfile) if csvfile is not None else None
+
+        for page_rows in page_source:
+            if len(windows) == 1:
+                pages += 1
+            # Consecutive shards share their boundary instant, keep its rows only once
+            boundary = last_utc if len(windows) > 1 else None
+            for measurement_data in page_rows:
+                measured_at = parse_utc(measurement_data[3])
+                if boundary is not None and measured_at <= boundary:
+                    continue
+                if writer is not None:
+                    writer.writerow(measurement_data)
                 else:
-                    logging.error(f"Error fetching page {page}: {response.status_code}, {response.text}")
-                    time.sleep(5)
+                    measurements.append((measurement_data[3], float(measurement_data[2])))
+                rows += 1
+
+                if last_utc is None or measured_at > last_utc:
+                    last_utc = measured_at
+
+    if store_dir is not None:
+        if measurements:
+            import pandas as pd
+
+            store.write_series(store_dir, store.RAW, location, parameter,
+                               pd.DataFrame(measurements, columns=['datetime', 'value']),
+                               fmt=store_format, append=True)
+    elif state is not None and rows == 0:
+        os.remove(filename)
 
-            except requests.exceptions.RequestException as e:
-                logging.error(f"Error occurred: {e}. Retrying in 5 seconds...") 
-                logging.debug("Exception Details:", exc_info=True)
-                time.sleep(5) 
+    if len(windows) > 1:
+        shutil.rmtree(shard_dir)
+        if checkpoints is not None:
+            checkpoints.clear_shards(location, parameter)
+
+    logging.info(f"Fetched {pages} pages ({rows} rows) for {location} {parameter} from {start_date}")
+    return {'file': filename, 'pages': pages, 'rows': rows, 'last_utc': last_utc}
+
+
+def fetch_pairs(pairs, start_date, end_date, workers=DEFAULT_WORKERS, rate_limit=DEFAULT_RATE_LIMIT,
+                url=None, page_limit=DEFAULT_PAGE_LIMIT, state=None, store_dir=None, store_format='parquet',
+                cache=None, shard=None, shard_workers=DEFAULT_SHARD_WORKERS, checkpoints=None, refetch_gaps=None):
+    """Fetches many (location, parameter) pairs concurrently under one shared rate limit.
+
+    Args:
+        pairs (list): List of (location, parameter) tuples.
+        start_date (str): The start date in ISO 8601 format.
+        end_date (str): The end date in ISO 8601 format.
+        workers (int): Number of pairs fetched at the same time.
+        rate_limit (int): Request budget per minute shared by all workers.
+        url (str): Endpoint to query (defaults to the OpenAQ measurements endpoint).
+        page_limit (int): Number of results requested per page.
+        state (ExtractState): Optional high-water mark store for incremental extraction.
+            Each pair's fetched slice is only staged; load.py --state-file advances the mark
+            once the slice is in the database.
+        store_dir (str): Write to this columnar store instead of CSV files.
+        store_format (str): 'parquet' or 'arrow' for the columnar store.
+        cache (ResponseCache): Optional page cache shared by all workers.
+        shard (str): Split each pair's range into 'day', 'week' or 'month' shards.
+        shard_workers (int): Number of shards of one pair fetched at the same time.
+        checkpoints (ExtractState): Where finished shards are checkpointed for resuming.
+        refetch_gaps (int): With a state store, also refetch the recorded gaps of the last this many hours.
+
+    Returns:
+        dict: Maps each (location, parameter) pair to its fetch summary.
+    """
+    limiter = TokenBucket(rate=rate_limit / 60, capacity=rate_limit)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            pair: executor.submit(fetch_pair, pair[0], pair[1], start_date, end_date, limiter, url, page_limit,
+                                  state, store_dir, store_format, cache, shard, shard_workers, checkpoints,
+                                  refetch_gaps)
+            for pair in pairs
+        }
+        results = {}
+        for pair, future in futures.items():
+            results[pair] = future.result()
+            if state is not None:
+                state.stage(pair[0], pair[1], results[pair]['last_utc'])
+        return results
+
+
+def fetch_and_store_measurements(location, start_date, end_date, parameters, workers=DEFAULT_WORKERS,
+                                 rate_limit=DEFAULT_RATE_LIMIT, url=None, page_limit=DEFAULT_PAGE_LIMIT,
+                                 state=None, store_dir=None, store_format='parquet', cache=None, shard=None,
+                                 shard_workers=DEFAULT_SHARD_WORKERS, checkpoints=None, refetch_gaps=None):
+    """Fetches air quality measurements and stores them in separate CSV files per parameter.
+
+    Args:
+        location (str): The location to fetch data for.
+        start_date (str): The start date in ISO 8601 format (YYYY-MM-DDTHH:MM:SSZ).
+        end_date (str): The end date in ISO 8601 format (YYYY-MM-DDTHH:MM:SSZ).
+        parameters (list): List of parameters to fetch (e.g., 'pm25', 'pm10').
+        workers (int): Number of parameters fetched at the same time.
+        rate_limit (int): Request budget per minute shared by all workers.
+        url (str): Endpoint to query (defaults to the OpenAQ measurements endpoint).
+        page_limit (int): Number of results requested per page.
+        state (ExtractState): Optional high-water mark store; only data newer than the
+            stored mark is fetched.
+        store_dir (str): Write to this columnar store instead of CSV files.
+        store_format (str): 'parquet' or 'arrow' for the columnar store.
+        cache (ResponseCache): Optional page cache.
+        shard (str): Split the range into 'day', 'week' or 'month' shards fetched concurrently.
+        shard_workers (int): Number of shards of one parameter fetched at the same time.
+        checkpoints (ExtractState): Where finished shards are checkpointed for resuming.
+        refetch_gaps (int): With a state store, also refetch the recorded gaps of the last this many hours.
+
+    Returns:
+        dict: Maps each (location, parameter) pair to its fetch summary.
+    """
+    pairs = [(location, parameter) for parameter in parameters]
+    return fetch_pairs(pairs, start_date, end_date, workers, rate_limit, url, page_limit, state,
+                       store_dir, store_format, cache, shard, shard_workers, checkpoints, refetch_gaps)
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Fetch and store air quality data from OpenAQ.")
@@ -110,7 +437,54 @@ if __name__ == "__main__":
     parser.add_argument("start_date", help="Start date (ISO 8601 format: YYYY-MM-DDTHH:MM:SSZ)")
     parser.add_argument("end_date", help="End date (ISO 8601 format: YYYY-MM-DDTHH:MM:SSZ)")
     parser.add_argument("parameters", nargs="+", help="Air quality parameters to fetch (e.g., pm25 pm10)")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Number of concurrent fetch workers")
+    parser.add_argument("--rate-limit", type=int, default=DEFAULT_RATE_LIMIT, help="API requests allowed per minute")
+    parser.add_argument("--page-limit", type=int, default=DEFAULT_PAGE_LIMIT, help="Results requested per page")
+    parser.add_argument("--base-url", default=base_url, help="Measurements endpoint (e.g. a local stub server)")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Only fetch data newer than the last ingested timestamp recorded in the state file")
+    parser.add_argument("--state-file", default=DEFAULT_STATE_FILE, help="Path to the incremental state manifest")
+    parser.add_argument("--refetch-gaps", type=int, metavar="HOURS",
+                        help="With --incremental, also refetch the recorded gaps of the last HOURS hours")
+    parser.add_argument("--store", help="Write raw measurements to this columnar store directory instead of CSV")
+    parser.add_argument("--format", choices=sorted(store.FORMATS), default='parquet', help="Columnar store format")
+    parser.add_argument("--shard", choices=sorted(SHARD_FREQUENCIES),
+                        help="Split the range into time shards fetched concurrently and checkpointed in the state file")
+    parser.add_argument("--shard-workers", type=int, default=DEFAULT_SHARD_WORKERS,
+                        help="Shards of one parameter fetched at the same time")
+    parser.add_argument("--cache", action="store_true", help="Reuse API pages from the on-disk response cache")
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR, help="Response cache directory")
+    parser.add_argument("--cache-ttl", type=float, default=DEFAULT_TTL,
+                        help="Seconds before cached pages of still-open windows are refetched")
+    parser.add_argument("--cache-max-mb", type=float, default=DEFAULT_MAX_MB, help="Size cap of the response cache")
+    parser.add_argument("--offline", action="store_true",
+                        help="Only serve pages from the response cache, fail on a miss instead of calling the API")
+    parser.add_argument("--metrics", help="Write request, page and rate-limit metrics to this file")
+    parser.add_argument("--metrics-format", choices=metrics.FORMATS, default='jsonl', help="Format of --metrics")
+    parser.add_argument("--profile", help="Write a cProfile dump of the run to this directory")
 
     args = parser.parse_args()
 
-    fetch_and_store_measurements(args.location, args.start_date, args.end_date, args.parameters)
+    cache = None
+    if args.cache or args.offline:
+        cache = ResponseCache(args.cache_dir, args.cache_ttl, args.cache_max_mb, offline=args.offline)
+
+    if not api_key and args.base_url == base_url and not args.offline:
+        logging.error("OpenAQ API key not found in environment. Exiting.")
+        exit(1)
+
+    state = ExtractState(args.state_file) if args.incremental else None
+    checkpoints = (state or ExtractState(args.state_file)) if args.shard else None
+
+    with metrics.profile(f"extract_{args.location}_{'_'.join(args.parameters)}", args.profile):
+        fetch_and_store_measurements(args.location, args.start_date, args.end_date, args.parameters,
+                                     workers=args.workers, rate_limit=args.rate_limit,
+                                     url=args.base_url, page_limit=args.page_limit, state=state,
+                                     store_dir=args.store, store_format=args.format, cache=cache,
+                                     shard=args.shard, shard_workers=args.shard_workers, checkpoints=checkpoints,
+                                     refetch_gaps=args.refetch_gaps)
+
+    if cache is not None:
+        logging.info(f"Response cache: {cache.hits} hits, {cache.misses} misses")
+    if args.metrics:
+        metrics.export(args.metrics, args.metrics_format, stage='extract')
@@ -0,0 +1,244 @@
+import argparse
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import store
+
+GAPS_FILE = 'gaps.json'
+HOUR_NS = 3600 * 10 ** 9
+
+
+def epoch_hours(times):
+    """Whole UTC hours since the epoch for an array-like of timestamps (naive values are taken as UTC)."""
+    index = pd.DatetimeIndex(times)
+    if index.tz is not None:
+        index = index.tz_convert('UTC').tz_localize(None)
+    return index.as_unit('ns').asi8 // HOUR_NS
+
+
+def hour_timestamp(hour):
+    """The UTC timestamp of an epoch hour."""
+    return pd.Timestamp(int(hour) * HOUR_NS, tz='UTC')
+
+
+class GapIndex:
+    """The missing hours of an hourly series, stored as (first missing hour, length) runs.
+
+    Built in one vectorized pass over the sorted observed hours, so listing the holes of
+    years of data never materialises a full hourly index. Hours are whole UTC hours since
+    the epoch; `first` and `last` are the first and last observed hours (None when empty).
+
+    Args:
+        first (int): First observed hour.
+        last (int): Last observed hour.
+        runs (np.ndarray): (k, 2) int64 array of (start hour, length), sorted and disjoint.
+    """
+
+    def __init__(self, first=None, last=None, runs=None):
+        self.first = first
+        self.last = last
+        self.runs = np.empty((0, 2), dtype=np.int64) if runs is None else np.asarray(runs, dtype=np.int64).reshape(-1, 2)
+
+    @classmethod
+    def from_hours(cls, hours):
+        """Index of an array of observed epoch hours (any order, duplicates allowed)."""
+        hours = np.unique(np.asarray(hours, dtype=np.int64))
+        if len(hours) == 0:
+            return cls()
+        steps = np.diff(hours)
+        holes = steps > 1
+        runs = np.column_stack([hours[:-1][holes] + 1, steps[holes] - 1])
+        return cls(int(hours[0]), int(hours[-1]), runs)
+
+    @classmethod
+    def from_times(cls, times):
+        """Index of the observed timestamps of a series."""
+        return cls.from_hours(epoch_hours(times))
+
+    @property
+    def empty(self):
+        return self.first is None
+
+    @property
+    def span(self):
+        """Hours from the first to the last observed hour, both included."""
+        return 0 if self.empty else self.last - self.first + 1
+
+    @property
+    def missing(self):
+        """Number of missing hours."""
+        return int(self.runs[:, 1].sum())
+
+    @property
+    def coverage(self):
+        """Share of the span that was observed."""
+        return 1 - self.missing / self.span if self.span else 0.0
+
+    def observed_between(self, start=None, end=None):
+        """Number of observed hours in [start, end) (epoch hours, default: the whole span)."""
+        if self.empty:
+            return 0
+        start = self.first if start is None else max(start, self.first)
+        end = self.last + 1 if end is None else min(end, self.last + 1)
+        if end <= start:
+            return 0
+        starts, ends = self.runs[:, 0], self.runs[:, 0] + self.runs[:, 1]
+        missing = np.clip(np.minimum(ends, end) - np.maximum(starts, start), 0, None).sum()
+        return int(end - start - missing)
+
+    def missing_hours(self):
+        """Expands the runs into every missing epoch hour, in order."""
+        starts, lengths = self.runs[:, 0], self.runs[:, 1]
+        offsets = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        return np.repeat(starts, lengths) + offsets
+
+    def observed_hours(self):
+        """Every observed epoch hour from first to last, in order."""
+        if self.empty:
+            return np.empty(0, dtype=np.int64)
+        present = np.ones(self.span, dtype=bool)
+        present[self.missing_hours() - self.first] = False
+        return self.first + np.flatnonzero(present)
+
+    def merge(self, newer):
+        """Combines this index with the index of a later or overlapping slice of the same series.
+
+        The newer slice is authoritative over its own span (e.g. refetched hours that are no
+        longer missing); older runs are clipped to outside that span and the hours between the
+        two slices, if any, become one more run.
+
+        Returns:
+            GapIndex: The combined index.
+        """
+        if self.empty:
+            return newer
+        if newer.empty:
+            return self
+        starts, ends = self.runs[:, 0], self.runs[:, 0] + self.runs[:, 1]
+        before = starts < newer.first
+        after = ends > newer.last + 1
+        pieces = [
+            np.column_stack([starts[before], np.minimum(ends[before], newer.first) - starts[before]]),
+            newer.runs,
+            np.column_stack([np.maximum(starts[after], newer.last + 1),
+                             ends[after] - np.maximum(starts[after], newer.last + 1)]),
+        ]
+        if self.last < newer.first - 1:
+            pieces.append([[self.last + 1, newer.first - self.last - 1]])
+        if newer.last < self.first - 1:
+            pieces.append([[newer.last + 1, self.first - newer.last - 1]])
+        runs = np.concatenate([np.asarray(piece, dtype=np.int64).reshape(-1, 2) for piece in pieces])
+        runs = runs[np.argsort(runs[:, 0], kind='stable')]
+        return GapIndex(min(self.first, newer.first), max(self.last, newer.last), runs)
+
+    def interpolate(self, times, values):
+        """Linearly interpolates an on-the-hour series over its missing hours.
+
+        The missing positions come straight from the runs, and the values from np.interp on
+        nanosecond timestamps, the same arithmetic as pandas' time interpolation after an
+        hourly resample.
+
+        Args:
+            times (pd.DatetimeIndex): Observed timestamps, sorted, unique and on whole hours.
+            values (np.ndarray): Observed values without NaNs.
+
+        Returns:
+            tuple: (hourly pd.DatetimeIndex in the zone of `times`, float64 values).
+        """
+        grid = pd.date_range(times[0], periods=self.span, freq='h', name=times.name)
+        filled = np.empty(self.span)
+        missing = self.missing_hours() - self.first
+        present = np.ones(self.span, dtype=bool)
+        present[missing] = False
+        filled[present] = values
+        filled[missing] = np.interp(grid.asi8[missing], times.as_unit('ns').asi8, values)
+        return grid, filled
+
+    def windows(self, since=None):
+        """The runs as [start, end) UTC timestamp windows, optionally only those ending after `since`."""
+        result = []
+        for start, length in self.runs:
+            lower, upper = hour_timestamp(start), hour_timestamp(start + length)
+            if since is None or upper > since:
+                result.append((lower, upper))
+        return result
+
+    def describe(self, top=None):
+        """Readable lines for the runs, longest first when `top` is given."""
+        runs = self.runs
+        if top is not None:
+            runs = runs[np.argsort(-runs[:, 1], kind='stable')][:top]
+        return [f"{hour_timestamp(start)} ({length} hour{'s' if length != 1 else ''})" for start, length in runs]
+
+    def to_dict(self):
+        return {'first': None if self.empty else hour_timestamp(self.first).isoformat(),
+                'last': None if self.empty else hour_timestamp(self.last).isoformat(),
+                'first_hour': self.first, 'last_hour': self.last, 'runs': self.runs.tolist()}
+
+    def save(self, path):
+        """Writes the index as JSON, atomically."""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.to_dict(), f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """Reads an index written by save(), or returns an empty one if there is none."""
+        if not os.path.exists(path):
+            return cls()
+        with open(path, 'r') as f:
+            data = json.load(f)
+        return cls(data['first_hour'], data['last_hour'], data['runs'])
+
+
+def gaps_path(csv_file_path):
+    """The gap index kept next to a cleaned CSV file: measurements_X_pm10.csv -> measurements_X_pm10.gaps.json."""
+    return Path(csv_file_path).with_suffix('.gaps.json')
+
+
+def store_gaps_path(store_dir, location, parameter):
+    """The gap index kept with a cleaned series in the columnar store."""
+    return store.series_dir(store_dir, store.CLEAN, location, parameter) / GAPS_FILE
+
+
+def update(path, index):
+    """Merges the index of a newly cleaned slice into the one persisted at `path` and saves it.
+
+    Returns:
+        GapIndex: The combined index.
+    """
+    combined = GapIndex.load(path).merge(index)
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    combined.save(path)
+    return combined
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Report the data coverage and gaps of cleaned series.")
+    parser.add_argument("paths", nargs="*", help="Cleaned CSV files (their .gaps.json index) or gap index files")
+    parser.add_argument("--store", help="Report every cleaned series of this columnar store")
+    parser.add_argument("--top", type=int, default=5, help="Longest gaps listed per series")
+    args = parser.parse_args()
+
+    indexes = {}
+    for path in args.paths:
+        path = Path(path)
+        indexes[path.name] = GapIndex.load(path if path.name.endswith('.json') else gaps_path(path))
+    if args.store:
+        for location, parameter in store.list_series(args.store, store.CLEAN):
+            indexes[f"{location} {parameter}"] = GapIndex.load(store_gaps_path(args.store, location, parameter))
+
+    print(f"{'series':<40} {'first':<26} {'hours':>7} {'missing':>8} {'coverage':>9} {'runs':>5}")
+    for name, index in indexes.items():
+        if index.empty:
+            print(f"{name:<40} no gap index")
+            continue
+        print(f"{name:<40} {hour_timestamp(index.first).isoformat():<26} {index.span:>7} {index.missing:>8} "
+              f"{index.coverage:>9.1%} {len(index.runs):>5}")
+        for line in index.describe(args.top):
+            print(f"    {line}")
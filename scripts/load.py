@@ -1,57 +1,297 @@
 import csv
+import io
+import time
+from pathlib import Path
 import psycopg2
 import argparse
 
-def create_and_populate_table(csv_file, table_name, host, dbname, user):
+import metrics
+import rollups
+import store
+import unified
+
+DEFAULT_BATCH_SIZE = 50000
+# per_table: one <location>_<parameter> table per series; unified: rows of the partitioned
+# measurements table, with a <location>_<parameter> view per series (see unified.py)
+SCHEMAS = ('per_table', 'unified')
+# Channel on which loads announce the tables they changed (see service.py)
+NOTIFY_CHANNEL = 'aq_series_changed'
+
+def create_table(cur, table_name, schema='per_table'):
+    """Creates the per-series table (or its view over measurements) and its rollup tables if they do not exist yet."""
+    if schema == 'unified':
+        unified.create_series(cur, table_name)
+    else:
+        cur.execute(f"""
+            CREATE TABLE IF NOT EXISTS {table_name} (
+                datetime TIMESTAMP PRIMARY KEY,
+                value REAL
+            );
+        """)
+    rollups.create_rollup_tables(cur, table_name)
+
+def notify_change(cur, table_name):
+    """Tells listening analytics services that a table changed.
+
+    PostgreSQL delivers the notification when the transaction commits, and only once per
+    table however many batches the transaction merged.
+    """
+    cur.execute("SELECT pg_notify(%s, %s)", (NOTIFY_CHANNEL, table_name))
+
+def insert_rows(cur, csv_file, table_name):
+    """Reads the whole CSV and inserts it row by row with executemany (the original load path).
+
+    Returns:
+        int: Number of rows inserted.
+    """
+    with open(csv_file, 'r') as csvfile:
+        reader = csv.DictReader(csvfile)
+        data = [(row['datetime'], row['value']) for row in reader]
+        with metrics.timer('load_db_seconds'):
+            cur.executemany(f"""
+                INSERT INTO {table_name} (datetime, value)
+                VALUES (%s, %s);
+            """, data)
+    return len(data)
+
+def merge_batch(cur, table_name, buffer, schema='per_table'):
+    """COPYs one CSV batch (datetime,value lines, no header) into staging and upserts it into the target.
+
+    The batch is first paired with the values it replaces, so the rollups can be updated with
+    just the difference before the merge. With the unified schema the target is the series'
+    rows of the measurements table, read through its view.
+    """
+    # Database time of the whole merge, rollup maintenance included
+    with metrics.timer('load_db_seconds'):
+        cur.execute(f"""
+            CREATE TEMP TABLE IF NOT EXISTS staging_{table_name} (LIKE {table_name}) ON COMMIT DROP;
+            CREATE TEMP TABLE IF NOT EXISTS changes_{table_name} (datetime TIMESTAMP, new REAL, old REAL) ON COMMIT DROP;
+        """)
+        cur.copy_expert(f"COPY staging_{table_name} (datetime, value) FROM STDIN WITH (FORMAT csv)", buffer)
+        # DISTINCT ON keeps a single row per timestamp, ON CONFLICT may not touch a row twice
+        cur.execute(f"""
+            INSERT INTO changes_{table_name} (datetime, new, old)
+            SELECT s.datetime, s.value, t.value
+            FROM (SELECT DISTINCT ON (datetime) datetime, value FROM staging_{table_name} ORDER BY datetime) s
+            LEFT JOIN {table_name} t USING (datetime);
+        """)
+        rollups.apply_changes(cur, table_name, f"changes_{table_name}")
+        if schema == 'unified':
+            unified.merge_changes(cur, table_name, f"changes_{table_name}")
+        else:
+            cur.execute(f"""
+                INSERT INTO {table_name} (datetime, value)
+                SELECT datetime, new FROM changes_{table_name}
+                ON CONFLICT (datetime) DO UPDATE SET value = EXCLUDED.value;
+            """)
+        rollups.refresh_daily(cur, table_name, f"changes_{table_name}")
+        cur.execute(f"TRUNCATE staging_{table_name}, changes_{table_name}")
+        notify_change(cur, table_name)
+
+def replace_outliers(cur, table_name, start, end, mean, std, threshold=3, schema='per_table'):
+    """Sets the z-score outliers loaded in [start, end] to the series mean, as clean.py does before a file load.
+
+    Used when the rows were loaded before the statistics of the whole series were known. The
+    replacement goes through merge_batch, so the rollups follow.
+
+    Returns:
+        int: Number of rows replaced.
+    """
+    cur.execute(f"""
+        SELECT datetime FROM {table_name}
+        WHERE datetime >= %s AND datetime <= %s AND abs(value - %s) > %s
+    """, (start, end, float(mean), float(threshold * std)))
+    outliers = cur.fetchall()
+    if outliers:
+        merge_batch(cur, table_name, io.StringIO(''.join(f"{ts.isoformat()},{mean}\n" for (ts,) in outliers)), schema)
+    return len(outliers)
+
+def stored_moments(cur, table_name):
+    """The (count, mean, M2) of the values already in a table, to merge with those of a new slice."""
+    cur.execute(f"""
+        SELECT COUNT(value), COALESCE(AVG(value), 0), COALESCE(VAR_SAMP(value) * (COUNT(value) - 1), 0)
+        FROM {table_name}
+    """)
+    count, mean, m2 = cur.fetchone()
+    return int(count), float(mean), float(m2)
+
+def copy_frame(cur, df, table_name, batch_size=DEFAULT_BATCH_SIZE, schema='per_table'):
+    """Same as copy_rows, for a frame with 'datetime' and 'value' columns (e.g. from the columnar store).
+
+    Returns:
+        int: Number of rows loaded.
+    """
+    for start in range(0, len(df), batch_size):
+        buffer = io.StringIO()
+        df.iloc[start:start + batch_size][['datetime', 'value']].to_csv(buffer, index=False, header=False)
+        buffer.seek(0)
+        merge_batch(cur, table_name, buffer, schema)
+    return len(df)
+
+def copy_rows(cur, csv_file, table_name, batch_size=DEFAULT_BATCH_SIZE, schema='per_table'):
+    """Streams the CSV through COPY into a staging table and upserts it into the target.
+
+    The file is sent in batches of `batch_size` rows, so memory stays bounded no matter how
+    large the file is. Each batch is merged with INSERT ... ON CONFLICT DO UPDATE, so loading
+    the same file twice updates the existing rows instead of failing on the primary key.
+
+    Returns:
+        int: Number of rows loaded.
+    """
+    def flush(lines):
+        merge_batch(cur, table_name, io.StringIO(''.join(lines)), schema)
+
+    rows = 0
+    with open(csv_file, 'r', newline='') as csvfile:
+        header = next(csv.reader([csvfile.readline()]))
+        columns = [header.index('datetime'), header.index('value')]
+
+        batch = []
+        for line in csvfile:
+            if columns == [0, 1] and len(header) > 2:
+                # Trailing columns such as clean.py's outlier flag are not loaded
+                line = ','.join(line.split(',', 2)[:2]) + '\n'
+            elif columns != [0, 1]:
+                fields = next(csv.reader([line]))
+                line = f"{fields[columns[0]]},{fields[columns[1]]}\n"
+            batch.append(line)
+            if len(batch) >= batch_size:
+                flush(batch)
+                rows += len(batch)
+                batch = []
+        if batch:
+            flush(batch)
+            rows += len(batch)
+    return rows
+
+def create_and_populate_table(csv_file, table_name, host, dbname, user, method='copy', batch_size=DEFAULT_BATCH_SIZE,
+                              store_dir=None, location=None, parameter=None, schema='per_table', binary_dir=None):
     """Creates a PostgreSQL table (if it doesn't exist) and populates it.
 
     Args:
         csv_file (str): Path to the CSV file (only 'datetime' and 'value' columns).
+            Ignored when loading from the columnar store.
         table_name (str): Name of the PostgreSQL table.
         host (str): PostgreSQL database host.
         dbname (str): PostgreSQL database name.
         user (str): PostgreSQL user.
+        method (str): 'copy' for the bulk COPY + upsert path, 'insert' for row-by-row executemany.
+        batch_size (int): Rows per COPY batch.
+        store_dir (str): Read the cleaned series from this columnar store instead of csv_file.
+        location (str): Location of the series in the store.
+        parameter (str): Parameter of the series in the store.
+        schema (str): 'per_table' for a table per series, 'unified' for the partitioned
+            measurements table with a view named table_name.
+        binary_dir (str): Also export the whole loaded series to this directory as a
+            memory-mapped binary series file (see binseries.py).
+
+    Returns:
+        int: Number of rows loaded, or None on a database error.
     """
     # Convert hyphens to underscores in the table_name
-    table_name = table_name.replace('-', '_') 
+    table_name = table_name.replace('-', '_')
+    if schema == 'unified' and store_dir is None and method != 'copy':
+        raise ValueError("The unified schema is only loaded with the copy method")
     # Connect to the database
     try:
         with psycopg2.connect(host=host, dbname=dbname, user=user) as conn:
             print("Database connection successful")  # Check connection
             with conn.cursor() as cur:
                 # Create the table
-                cur.execute(f"""
-                    CREATE TABLE IF NOT EXISTS {table_name} (
-                        datetime TIMESTAMP PRIMARY KEY,
-                        value REAL
-                    );
-                """)
-                print("Table creation (or check) successful")  
+                try:
+                    create_table(cur, table_name, schema)
+                except ValueError as e:
+                    # e.g. a per-table series loaded with --schema unified
+                    conn.rollback()
+                    print(f"Table setup error: {e}")
+                    return None
+                print("Table creation (or check) successful")
 
                 # Read and insert data
-                with open(csv_file, 'r') as csvfile:
-                    reader = csv.DictReader(csvfile)
-                    data = [(row['datetime'], row['value']) for row in reader]
-                    cur.executemany(f"""
-                        INSERT INTO {table_name} (datetime, value)
-                        VALUES (%s, %s);
-                    """, data)
+                start = time.perf_counter()
+                if store_dir is not None:
+                    df = store.read_series(store_dir, store.CLEAN, location, parameter)
+                    rows = copy_frame(cur, df, table_name, batch_size, schema)
+                elif method == 'copy':
+                    rows = copy_rows(cur, csv_file, table_name, batch_size, schema)
+                else:
+                    rows = insert_rows(cur, csv_file, table_name)
+                    # Row-by-row inserts bypass the incremental rollup maintenance
+                    rollups.rebuild_rollups(cur, table_name)
+                    notify_change(cur, table_name)
+                conn.commit()
+                elapsed = time.perf_counter() - start
+                metrics.incr('load_rows', rows)
+
+                print(f"Data insertion successful: {rows} rows in {elapsed:.2f}s ({rows / max(elapsed, 1e-9):.0f} rows/s)")
 
-                    conn.commit()
-                    print("Data insertion successful") 
+                if binary_dir is not None:
+                    import binseries
+                    import gaps
+
+                    index = gaps.GapIndex.load(gaps.store_gaps_path(store_dir, location, parameter)
+                                               if store_dir is not None else gaps.gaps_path(csv_file))
+                    path = binseries.series_path(binary_dir, table_name)
+                    Path(binary_dir).mkdir(parents=True, exist_ok=True)
+                    print(f"Binary series written: {binseries.export_table(cur, table_name, path, index)} hours to {path}")
+                return rows
 
     except psycopg2.Error as e:
         print(f"Database error: {e}")  # Detailed error message
+        return None
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description='Import CSV data into a PostgreSQL table.')
-    parser.add_argument('csv_file', help='Path to the CSV file')
+    parser.add_argument('csv_file', nargs='?', help='Path to the CSV file')
     parser.add_argument('--table_name', help='Name of the PostgreSQL table')
     parser.add_argument('--host', default='localhost', help='PostgreSQL database host')
     parser.add_argument('--dbname', required=True, help='PostgreSQL database name')
     parser.add_argument('--user', required=True, help='PostgreSQL user')
+    parser.add_argument('--method', choices=['copy', 'insert'], default='copy',
+                        help='Bulk COPY with upsert (default) or row-by-row INSERT')
+    parser.add_argument('--batch_size', type=int, default=DEFAULT_BATCH_SIZE, help='Rows per COPY batch')
+    parser.add_argument('--store', help='Load the cleaned series from this columnar store instead of a CSV file')
+    parser.add_argument('--location', help='Location of the series (in the store, and in --state-file)')
+    parser.add_argument('--parameter', help='Parameter of the series (in the store, and in --state-file)')
+    parser.add_argument('--state-file',
+                        help="Advance the pair's incremental high-water mark in this manifest once the load is committed")
+    parser.add_argument('--binary', help='Also export the loaded series as a memory-mapped binary file to this directory')
+    parser.add_argument('--schema', choices=SCHEMAS, default='per_table',
+                        help='One table per series (default) or the partitioned measurements table with a view per series')
+
+    parser.add_argument('--rebuild_rollups', action='store_true',
+                        help='Recompute the rollup tables of --table_name from its rows and exit')
+    parser.add_argument('--metrics', help='Write row counts and database time to this file')
+    parser.add_argument('--metrics-format', choices=metrics.FORMATS, default='jsonl', help='Format of --metrics')
+    parser.add_argument('--profile', help='Write a cProfile dump of the load to this directory')
 
     args = parser.parse_args()
-    
+    if args.state_file and not (args.location and args.parameter):
+        parser.error("--state-file needs --location and --parameter")
+    if args.schema == 'unified' and not args.store and args.method != 'copy':
+        parser.error("--schema unified is only loaded with --method copy")
+
+    if args.rebuild_rollups:
+        with psycopg2.connect(host=args.host, dbname=args.dbname, user=args.user) as conn:
+            with conn.cursor() as cur:
+                rollups.rebuild_rollups(cur, args.table_name.replace('-', '_'))
+                notify_change(cur, args.table_name.replace('-', '_'))
+        print("Rollups rebuilt")
+        exit()
+
+    with metrics.profile(f"load_{args.table_name}", args.profile):
+        rows = create_and_populate_table(args.csv_file, args.table_name, args.host, args.dbname, args.user,
+                                         method=args.method, batch_size=args.batch_size,
+                                         store_dir=args.store, location=args.location, parameter=args.parameter,
+                                         schema=args.schema, binary_dir=args.binary)
+
+    if args.metrics:
+        metrics.export(args.metrics, args.metrics_format, stage='load')
+    if rows is None:
+        exit(1)
+    if args.state_file:
+        from state import ExtractState
 
-    create_and_populate_table(args.csv_file, args.table_name, args.host, args.dbname, args.user)
\ No newline at end of file
+        mark = ExtractState(args.state_file).commit(args.location, args.parameter)
+        if mark is not None:
+            print(f"High-water mark of {args.location} {args.parameter} advanced to {mark.isoformat()}")
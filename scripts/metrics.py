@@ -0,0 +1,190 @@
+import cProfile
+import json
+import logging
+import os
+import pstats
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+
+FORMATS = ('jsonl', 'prometheus')
+# Prefix of every exported Prometheus series
+PROMETHEUS_PREFIX = 'aq_'
+# Functions listed in the text summary written next to each profile
+PROFILE_TOP = 30
+
+_lock = threading.Lock()
+_counters = defaultdict(float)
+# name -> [count, total seconds, max seconds]
+_timers = {}
+
+
+def incr(name, value=1):
+    """Adds `value` to a counter (created at zero on first use)."""
+    with _lock:
+        _counters[name] += value
+
+
+def observe(name, seconds):
+    """Records one duration for a timer."""
+    with _lock:
+        timer = _timers.setdefault(name, [0, 0.0, 0.0])
+        timer[0] += 1
+        timer[1] += seconds
+        timer[2] = max(timer[2], seconds)
+
+
+@contextmanager
+def timer(name):
+    """Times the body of a with-block into the timer `name`."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start)
+
+
+def snapshot():
+    """Returns a copy of every counter and timer, safe to pickle back from a worker process.
+
+    Returns:
+        dict: {'counters': {name: value}, 'timers': {name: {'count', 'sum', 'max'}}}.
+    """
+    with _lock:
+        return {'counters': dict(_counters),
+                'timers': {name: {'count': count, 'sum': total, 'max': peak}
+                           for name, (count, total, peak) in _timers.items()}}
+
+
+def merge(other):
+    """Adds a snapshot (e.g. from a worker process) into this process's metrics."""
+    with _lock:
+        for name, value in other['counters'].items():
+            _counters[name] += value
+        for name, stats in other['timers'].items():
+            timer = _timers.setdefault(name, [0, 0.0, 0.0])
+            timer[0] += stats['count']
+            timer[1] += stats['sum']
+            timer[2] = max(timer[2], stats['max'])
+
+
+def reset():
+    """Drops every counter and timer."""
+    with _lock:
+        _counters.clear()
+        _timers.clear()
+
+
+def to_jsonl(stage=None):
+    """Renders the metrics as JSON lines, one metric per line, tagged with a timestamp and the stage."""
+    data = snapshot()
+    now = time.time()
+    lines = []
+    for name, value in sorted(data['counters'].items()):
+        lines.append(json.dumps({'ts': now, 'stage': stage, 'name': name, 'type': 'counter', 'value': value}))
+    for name, stats in sorted(data['timers'].items()):
+        lines.append(json.dumps({'ts': now, 'stage': stage, 'name': name, 'type': 'timer', **stats}))
+    return ''.join(line + '\n' for line in lines)
+
+
+def to_prometheus(data=None):
+    """Renders the metrics in the Prometheus text exposition format.
+
+    Counters become `<name>_total`, timers become summaries (`_count` and `_sum`) plus a
+    `<name>_max` gauge, all prefixed with PROMETHEUS_PREFIX.
+    """
+    data = data or snapshot()
+    lines = []
+    for name, value in sorted(data['counters'].items()):
+        metric = f"{PROMETHEUS_PREFIX}{name}_total"
+        lines += [f"# TYPE {metric} counter", f"{metric} {value:g}"]
+    for name, stats in sorted(data['timers'].items()):
+        metric = f"{PROMETHEUS_PREFIX}{name}"
+        lines += [f"# TYPE {metric} summary", f"{metric}_count {stats['count']}", f"{metric}_sum {stats['sum']:.6f}",
+                  f"# TYPE {metric}_max gauge", f"{metric}_max {stats['max']:.6f}"]
+    return ''.join(line + '\n' for line in lines)
+
+
+def read_jsonl(path):
+    """Merges every line of a JSON lines export back into one snapshot (e.g. from several scripts)."""
+    data = {'counters': defaultdict(float), 'timers': {}}
+    with open(path, 'r') as f:
+        for line in f:
+            entry = json.loads(line)
+            if entry['type'] == 'counter':
+                data['counters'][entry['name']] += entry['value']
+            else:
+                stats = data['timers'].setdefault(entry['name'], {'count': 0, 'sum': 0.0, 'max': 0.0})
+                stats['count'] += entry['count']
+                stats['sum'] += entry['sum']
+                stats['max'] = max(stats['max'], entry['max'])
+    return data
+
+
+def export(path, fmt='jsonl', stage=None):
+    """Writes the metrics to `path`.
+
+    JSON lines are appended, so every script of a run can add to the same file. The
+    Prometheus text replaces the file, as a node_exporter textfile collector expects.
+
+    Args:
+        path (str): Output file.
+        fmt (str): 'jsonl' or 'prometheus'.
+        stage (str): Stage name stored with each JSON line.
+    """
+    if fmt == 'prometheus':
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            f.write(to_prometheus())
+        os.replace(tmp_path, path)
+    else:
+        with open(path, 'a') as f:
+            f.write(to_jsonl(stage))
+
+
+@contextmanager
+def profile(name, directory=None):
+    """Runs the body of a with-block under cProfile when `directory` is given.
+
+    Threads started inside the block (fetch workers, streaming producers) get a profiler of
+    their own, merged with the calling thread's when the block ends. Writes
+    `<directory>/<name>.prof` (for pstats or snakeviz) and `<directory>/<name>.txt` with the
+    PROFILE_TOP functions by cumulative time.
+    """
+    if directory is None:
+        yield
+        return
+
+    profilers = [cProfile.Profile()]
+
+    def profile_thread(*_):
+        profiler = cProfile.Profile()
+        with _lock:
+            profilers.append(profiler)
+        profiler.enable()
+
+    try:
+        profilers[0].enable()
+    except ValueError as e:
+        # Only one profiler may be active at a time on newer interpreters
+        logging.warning(f"Not profiling {name}: {e}")
+        yield
+        return
+    # Restored afterwards, so an enclosing profile() keeps hooking its threads
+    previous = threading.getprofile()
+    threading.setprofile(profile_thread)
+    try:
+        yield
+    finally:
+        threading.setprofile(previous)
+        profilers[0].disable()
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        name = name.replace(' ', '_').replace('/', '_')
+        stats = pstats.Stats(*profilers)
+        stats.dump_stats(directory / f"{name}.prof")
+        with open(directory / f"{name}.txt", 'w') as f:
+            stats.stream = f
+            stats.sort_stats('cumulative').print_stats(PROFILE_TOP)
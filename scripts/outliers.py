@@ -0,0 +1,193 @@
+from importlib.util import find_spec
+
+# NumPy and pandas are imported by the first detect() (see _require_numpy), so that the
+# command line of clean.py starts without them
+np = pd = sliding_window_view = None
+# The numba kernel is optional, the NumPy one gives the same flags
+HAS_NUMBA = find_spec('numba') is not None
+_hampel_numba = None
+
+METHODS = ('zscore', 'rolling_zscore', 'hampel', 'iqr')
+ENGINES = ('numpy', 'numba')
+DEFAULT_METHOD = 'zscore'
+# One week of hourly points, so daily cycles and seasonal levels stay inside the window
+DEFAULT_WINDOW = 168
+DEFAULT_THRESHOLDS = {'zscore': 3, 'rolling_zscore': 3, 'hampel': 3, 'iqr': 1.5}
+# Scales the median absolute deviation to the standard deviation of normal data
+MAD_SCALE = 1.4826
+# Bytes of window views materialised at a time by the NumPy Hampel kernel
+BLOCK_BYTES = 64 * 1024 * 1024
+
+
+def _require_numpy():
+    """Imports NumPy and pandas into the module on first use."""
+    global np, pd, sliding_window_view
+    if np is None:
+        import numpy as np
+        import pandas as pd
+        from numpy.lib.stride_tricks import sliding_window_view
+
+
+def _half_width(window):
+    """Points on each side of the centre; even windows are widened by one so they stay centred."""
+    return max(int(window), 1) // 2
+
+
+def _rolling(values, half):
+    return pd.Series(values).rolling(2 * half + 1, center=True, min_periods=half + 1)
+
+
+def _zscore(values, threshold):
+    mean = np.nanmean(values)
+    std = np.nanstd(values, ddof=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        flags = np.abs((values - mean) / std) > threshold
+    return flags, np.full_like(values, mean)
+
+
+def _rolling_zscore(values, half, threshold):
+    rolling = _rolling(values, half)
+    mean = rolling.mean().to_numpy()
+    std = rolling.std().to_numpy()
+    with np.errstate(invalid='ignore', divide='ignore'):
+        flags = np.abs((values - mean) / std) > threshold
+    return flags, mean
+
+
+def _row_medians(rows):
+    """Median of each row ignoring NaNs (NaN for rows that are all NaN), without a Python loop per row.
+
+    np.nanmedian falls back to one call per row as soon as a NaN shows up, and np.median is
+    slower than a plain sort on short rows, so every row is sorted (NaNs sort last) and the
+    middle of its valid part is picked.
+    """
+    ordered = np.sort(rows, axis=1)
+    counts = rows.shape[1] - np.isnan(rows).sum(axis=1)
+    index = np.arange(len(rows))
+    lower = ordered[index, np.maximum(counts - 1, 0) // 2]
+    upper = ordered[index, counts // 2 - (counts == 0)]
+    return np.where(counts > 0, (lower + upper) / 2, np.nan)
+
+
+def _hampel_numpy(values, half):
+    """Rolling median and MAD over centred windows, a block of window views at a time."""
+    n = len(values)
+    padded = np.concatenate([np.full(half, np.nan), values, np.full(half, np.nan)])
+    windows = sliding_window_view(padded, 2 * half + 1)
+    median = np.empty(n)
+    mad = np.empty(n)
+    block = max(1, BLOCK_BYTES // (8 * (2 * half + 1)))
+    for start in range(0, n, block):
+        part = windows[start:start + block]
+        centre = _row_medians(part)
+        median[start:start + block] = centre
+        mad[start:start + block] = _row_medians(np.abs(part - centre[:, None]))
+
+    # Same minimum number of points per window as the pandas-based methods
+    counts = _rolling(values, half).count().to_numpy()
+    short = counts < half + 1
+    median[short] = np.nan
+    mad[short] = np.nan
+    return median, mad
+
+
+def _hampel_numba_kernel(values, half):
+    """Rolling median and MAD over centred windows, one window at a time without temporary views."""
+    n = len(values)
+    median = np.empty(n)
+    mad = np.empty(n)
+    for i in range(n):
+        window = values[max(0, i - half):min(n, i + half + 1)]
+        window = window[~np.isnan(window)]
+        if len(window) < half + 1:
+            median[i] = np.nan
+            mad[i] = np.nan
+            continue
+        centre = np.median(window)
+        median[i] = centre
+        mad[i] = np.median(np.abs(window - centre))
+    return median, mad
+
+
+def _require_numba():
+    """Compiles the numba kernel on first use."""
+    global _hampel_numba
+    if not HAS_NUMBA:
+        raise ImportError("The numba engine needs numba (pip install numba)")
+    if _hampel_numba is None:
+        import numba
+
+        _hampel_numba = numba.njit(cache=True)(_hampel_numba_kernel)
+    return _hampel_numba
+
+
+def _hampel(values, half, threshold, engine):
+    if engine == 'numba':
+        median, mad = _require_numba()(values, half)
+    else:
+        median, mad = _hampel_numpy(values, half)
+    with np.errstate(invalid='ignore'):
+        flags = np.abs(values - median) > threshold * MAD_SCALE * mad
+    return flags, median
+
+
+def _iqr(values, half, threshold):
+    rolling = _rolling(values, half)
+    q1 = rolling.quantile(0.25).to_numpy()
+    q3 = rolling.quantile(0.75).to_numpy()
+    spread = threshold * (q3 - q1)
+    with np.errstate(invalid='ignore'):
+        flags = (values < q1 - spread) | (values > q3 + spread)
+    return flags, rolling.median().to_numpy()
+
+
+def detect(values, method=DEFAULT_METHOD, window=DEFAULT_WINDOW, threshold=None, engine='numpy'):
+    """Flags the outliers of an hourly series and returns the value each one should be replaced with.
+
+    - zscore: distance from the mean of the whole series in standard deviations (the original
+      clean.py rule); replacements are the series mean.
+    - rolling_zscore: the same against the mean/std of a centred window; replacements are the
+      window mean.
+    - hampel: distance from the window median in scaled median absolute deviations; replacements
+      are the window median.
+    - iqr: outside [Q1 - k*IQR, Q3 + k*IQR] of the window; replacements are the window median.
+
+    The rolling statistics are computed over centred windows of `window` points (at least half a
+    window at the edges) by pandas' rolling kernels, except the Hampel MAD, which has no
+    rolling form and is reduced over sliding window views (or a numba loop). NaNs are never flagged.
+
+    Args:
+        values (np.ndarray): Hourly values in time order.
+        method (str): One of METHODS.
+        window (int): Window length in points for the rolling methods.
+        threshold (float): Cut-off in the method's unit (default: DEFAULT_THRESHOLDS[method]).
+        engine (str): 'numpy' or 'numba' for the Hampel kernel.
+
+    Returns:
+        tuple: (boolean flags, replacement values), both the length of `values`.
+    """
+    _require_numpy()
+    values = np.asarray(values, dtype=np.float64)
+    threshold = DEFAULT_THRESHOLDS[method] if threshold is None else threshold
+    half = _half_width(window)
+    if method == 'zscore':
+        return _zscore(values, threshold)
+    if method == 'rolling_zscore':
+        return _rolling_zscore(values, half, threshold)
+    if method == 'hampel':
+        return _hampel(values, half, threshold, engine)
+    if method == 'iqr':
+        return _iqr(values, half, threshold)
+    raise ValueError(f"Unknown outlier method: {method} (expected one of {', '.join(METHODS)})")
+
+
+def replace(df, column='value', method=DEFAULT_METHOD, window=DEFAULT_WINDOW, threshold=None, engine='numpy'):
+    """Replaces the outliers of df[column] in place and adds a boolean 'outlier' flag column.
+
+    Returns:
+        int: Number of values replaced.
+    """
+    flags, replacement = detect(df[column].to_numpy(), method, window, threshold, engine)
+    df.loc[flags, column] = replacement[flags]
+    df['outlier'] = flags
+    return int(flags.sum())
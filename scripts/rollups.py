@@ -0,0 +1,262 @@
+# numpy and pandas are imported by the query functions only: load.py maintains the rollups with
+# plain SQL and should not pay for importing them
+
+# Width of the value histogram buckets used for approximate medians (µg/m³)
+HIST_BIN_WIDTH = 1.0
+
+# Tables kept next to each <location>_<parameter> table
+SUFFIXES = ('_hourly_stats', '_value_hist', '_daily')
+
+DAY_NAMES = ['Sunday', 'Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday']
+
+def create_rollup_tables(cur, table_name):
+    """Creates the rollup tables kept next to a <location>_<parameter> table.
+
+    All keys are in UTC:
+        <table>_hourly_stats: count/sum/sum of squares per (month, day of week, hour).
+        <table>_value_hist:   value histogram per (month, day of week, hour), for medians.
+        <table>_daily:        count/sum/min/max per day.
+    Counts and sums merge by addition, so a load only has to add the change it made.
+    """
+    cur.execute(f"""
+        CREATE TABLE IF NOT EXISTS {table_name}_hourly_stats (
+            month DATE,
+            dow SMALLINT,
+            hour SMALLINT,
+            n BIGINT,
+            total DOUBLE PRECISION,
+            total_sq DOUBLE PRECISION,
+            PRIMARY KEY (month, dow, hour)
+        );
+        CREATE TABLE IF NOT EXISTS {table_name}_value_hist (
+            month DATE,
+            dow SMALLINT,
+            hour SMALLINT,
+            bin INTEGER,
+            n BIGINT,
+            PRIMARY KEY (month, dow, hour, bin)
+        );
+        CREATE TABLE IF NOT EXISTS {table_name}_daily (
+            day DATE PRIMARY KEY,
+            n BIGINT,
+            total DOUBLE PRECISION,
+            min_value REAL,
+            max_value REAL
+        );
+    """)
+
+def apply_changes(cur, table_name, changes):
+    """Adds the effect of a batch of row changes to the hourly stats and the histogram.
+
+    Must run before the batch is merged into the table.
+
+    Args:
+        cur: Database cursor.
+        table_name (str): Target table.
+        changes (str): Table of (datetime, new, old) rows; old is NULL for new timestamps.
+    """
+    keys = ("date_trunc('month', datetime)::date, EXTRACT(DOW FROM datetime)::smallint, "
+            "EXTRACT(HOUR FROM datetime)::smallint")
+    cur.execute(f"""
+        INSERT INTO {table_name}_hourly_stats AS r (month, dow, hour, n, total, total_sq)
+        SELECT {keys},
+               SUM((new IS NOT NULL)::int - (old IS NOT NULL)::int),
+               SUM(COALESCE(new::float8, 0) - COALESCE(old::float8, 0)),
+               SUM(COALESCE(new::float8, 0) ^ 2 - COALESCE(old::float8, 0) ^ 2)
+        FROM {changes}
+        GROUP BY 1, 2, 3
+        ON CONFLICT (month, dow, hour) DO UPDATE
+        SET n = r.n + EXCLUDED.n, total = r.total + EXCLUDED.total, total_sq = r.total_sq + EXCLUDED.total_sq;
+    """)
+    cur.execute(f"""
+        INSERT INTO {table_name}_value_hist AS r (month, dow, hour, bin, n)
+        SELECT month, dow, hour, bin, SUM(delta) FROM (
+            SELECT {keys}, floor(new::float8 / {HIST_BIN_WIDTH})::int, 1
+            FROM {changes} WHERE new IS NOT NULL
+            UNION ALL
+            SELECT {keys}, floor(old::float8 / {HIST_BIN_WIDTH})::int, -1
+            FROM {changes} WHERE old IS NOT NULL
+        ) AS d (month, dow, hour, bin, delta)
+        GROUP BY 1, 2, 3, 4
+        ON CONFLICT (month, dow, hour, bin) DO UPDATE SET n = r.n + EXCLUDED.n;
+    """)
+
+def refresh_daily(cur, table_name, changes):
+    """Recomputes the daily rollup for the days a batch touched (min/max cannot be merged by delta).
+
+    Must run after the batch is merged into the table.
+    """
+    cur.execute(f"""
+        INSERT INTO {table_name}_daily AS r (day, n, total, min_value, max_value)
+        SELECT datetime::date, COUNT(value), SUM(value::float8), MIN(value), MAX(value)
+        FROM {table_name}
+        WHERE datetime >= (SELECT MIN(datetime)::date FROM {changes})
+          AND datetime < (SELECT MAX(datetime)::date + 1 FROM {changes})
+        GROUP BY 1
+        ON CONFLICT (day) DO UPDATE
+        SET n = EXCLUDED.n, total = EXCLUDED.total, min_value = EXCLUDED.min_value, max_value = EXCLUDED.max_value;
+    """)
+
+def rebuild_rollups(cur, table_name):
+    """Recomputes every rollup of a table from its raw rows (for tables loaded before rollups existed)."""
+    create_rollup_tables(cur, table_name)
+    cur.execute(f"""
+        TRUNCATE {table_name}_hourly_stats, {table_name}_value_hist, {table_name}_daily;
+        CREATE TEMP TABLE rebuild_{table_name} ON COMMIT DROP AS
+            SELECT datetime, value AS new, NULL::real AS old FROM {table_name};
+    """)
+    apply_changes(cur, table_name, f"rebuild_{table_name}")
+    refresh_daily(cur, table_name, f"rebuild_{table_name}")
+    cur.execute(f"DROP TABLE rebuild_{table_name}")
+
+def month_aligned(start, end):
+    """True when both bounds fall on a month boundary (or are open), so month rollups cover the range exactly."""
+    import pandas as pd
+
+    for bound in (start, end):
+        if bound is None:
+            continue
+        ts = pd.Timestamp(bound)
+        if ts.day != 1 or ts != ts.normalize():
+            return False
+    return True
+
+def _month_where(start, end):
+    import pandas as pd
+
+    conditions, params = [], []
+    if start is not None:
+        conditions.append("month >= %s")
+        params.append(pd.Timestamp(start).date())
+    if end is not None:
+        conditions.append("month < %s")
+        params.append(pd.Timestamp(end).date())
+    return (f"WHERE {' AND '.join(conditions)}" if conditions else ""), params
+
+def _hist_quantile(hist, keys, q):
+    """Quantile q per group from histogram counts, interpolated linearly inside its bucket."""
+    # SUM over BIGINT comes back as NUMERIC (Decimal)
+    hist = hist.astype({'n': 'int64'}).sort_values(keys + ['bin'])
+    hist['cum'] = hist.groupby(keys)['n'].cumsum()
+    hist['half'] = hist.groupby(keys)['n'].transform('sum') * q
+    median_bin = hist[hist['cum'] >= hist['half']].groupby(keys).head(1)
+    fraction = (median_bin['half'] - (median_bin['cum'] - median_bin['n'])) / median_bin['n']
+    median_bin = median_bin.assign(median=(median_bin['bin'] + fraction) * HIST_BIN_WIDTH)
+    return median_bin.set_index(keys)['median']
+
+def _hist_median(hist, keys):
+    """Median per group from histogram counts, interpolated linearly inside the median bucket."""
+    return _hist_quantile(hist, keys, 0.5)
+
+def query_hour_profile(query, table_name, start=None, end=None, utc_offset=0, weekday=False):
+    """Hour-of-day (optionally day-of-week x hour) mean/median/count from the rollups.
+
+    The cost depends on the number of months in the range, not on the number of raw rows.
+    Month boundaries are UTC; the local shift is applied to the (day of week, hour) slots.
+
+    Args:
+        query: Callable (sql, params) -> DataFrame, e.g. PostgresSource.query.
+        table_name (str): Base table.
+        start, end: Month-aligned range bounds (or None).
+        utc_offset (int): Fixed local offset in hours.
+        weekday (bool): Group by day of week as well.
+
+    Returns:
+        pd.DataFrame: Indexed by hour (or day_of_week, hour) with mean, median and count columns.
+    """
+    import numpy as np
+    import pandas as pd
+
+    where, params = _month_where(start, end)
+    stats = query(f"""
+        SELECT dow, hour, SUM(n) AS n, SUM(total) AS total
+        FROM {table_name}_hourly_stats {where}
+        GROUP BY dow, hour
+    """, params)
+    hist = query(f"""
+        SELECT dow, hour, bin, SUM(n) AS n
+        FROM {table_name}_value_hist {where}
+        GROUP BY dow, hour, bin
+        HAVING SUM(n) > 0
+    """, params)
+
+    keys = ['day_of_week', 'hour'] if weekday else ['hour']
+    for frame in (stats, hist):
+        slot = (frame['dow'].astype(int) * 24 + frame['hour'].astype(int) + utc_offset) % (7 * 24)
+        frame['hour'] = slot % 24
+        frame['day_of_week'] = np.array(DAY_NAMES)[slot // 24]
+        frame['n'] = frame['n'].astype('int64')
+
+    grouped = stats.groupby(keys)[['n', 'total']].sum()
+    profile = pd.DataFrame({'mean': grouped['total'] / grouped['n'], 'count': grouped['n']})
+    profile['median'] = _hist_median(hist.groupby(keys + ['bin'], as_index=False)['n'].sum(), keys)
+    return profile[['mean', 'median', 'count']]
+
+def query_summary(query, table_name, start=None, end=None):
+    """Max/min/mean/median/count of a table from the daily rollup and the histogram."""
+    import pandas as pd
+
+    where, params = _month_where(start, end)
+    daily_where = where.replace('month', 'day')
+    daily = query(f"""
+        SELECT MAX(max_value) AS maximum, MIN(min_value) AS minimum,
+               SUM(total) / NULLIF(SUM(n), 0) AS mean, SUM(n) AS count
+        FROM {table_name}_daily {daily_where}
+    """, params)
+    hist = query(f"""
+        SELECT bin, SUM(n) AS n FROM {table_name}_value_hist {where}
+        GROUP BY bin HAVING SUM(n) > 0
+    """, params)
+    hist['all'] = 0
+    median = _hist_median(hist, ['all'])
+    summary = {key: None if pd.isna(value) else float(value) for key, value in daily.iloc[0].items()}
+    summary['median'] = float(median.iloc[0]) if len(median) else None
+    return summary
+
+def query_summaries(query, table_names, start=None, end=None):
+    """query_summary() for many tables in a single query (one UNION ALL over their rollups).
+
+    Each table contributes its daily aggregate as one row (bin NULL) and its histogram as one
+    row per bin, so the round trip count does not grow with the number of tables. The median
+    and 95th percentile are approximate to HIST_BIN_WIDTH; first/last are whole days.
+
+    Returns:
+        pd.DataFrame: One row per table with table_name, maximum, minimum, mean, median, p95,
+        count, first_time and last_time.
+    """
+    import pandas as pd
+
+    columns = ['table_name', 'maximum', 'minimum', 'mean', 'median', 'p95', 'count', 'first_time', 'last_time']
+    if not table_names:
+        return pd.DataFrame(columns=columns)
+    where, params = _month_where(start, end)
+    daily_where = where.replace('month', 'day')
+    parts, all_params = [], []
+    for table_name in table_names:
+        parts.append(f"""
+            SELECT %s::text AS table_name, NULL::integer AS bin, SUM(n) AS n,
+                   MAX(max_value)::double precision AS maximum, MIN(min_value)::double precision AS minimum,
+                   SUM(total) AS total, MIN(day) FILTER (WHERE n > 0) AS first_day,
+                   MAX(day) FILTER (WHERE n > 0) AS last_day
+            FROM {table_name}_daily {daily_where}""")
+        parts.append(f"""
+            SELECT %s::text, bin, SUM(n), NULL, NULL, NULL, NULL, NULL
+            FROM {table_name}_value_hist {where}
+            GROUP BY bin HAVING SUM(n) > 0""")
+        all_params += [table_name] + params + [table_name] + params
+    rows = query(" UNION ALL ".join(parts), all_params)
+
+    daily = rows[rows['bin'].isna()].set_index('table_name')
+    hist = rows[rows['bin'].notna()].astype({'bin': 'int64'})
+    count = daily['n'].fillna(0).astype('int64')
+    summary = pd.DataFrame({
+        'maximum': daily['maximum'].astype('float64'),
+        'minimum': daily['minimum'].astype('float64'),
+        'mean': daily['total'].astype('float64') / count.where(count > 0),
+        'median': _hist_quantile(hist, ['table_name'], 0.5),
+        'p95': _hist_quantile(hist, ['table_name'], 0.95),
+        'count': count,
+        'first_time': pd.to_datetime(daily['first_day']),
+        'last_time': pd.to_datetime(daily['last_day']) + pd.Timedelta(hours=23),
+    }, index=daily.index)
+    return summary.reset_index()[columns]
@@ -0,0 +1,107 @@
+import json
+import os
+import threading
+from datetime import datetime, timezone
+
+DEFAULT_STATE_FILE = 'extract_state.json'
+
+
+def parse_utc(value):
+    """Parses an ISO 8601 timestamp into an aware UTC datetime (naive values are taken as UTC)."""
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc)
+
+
+class ExtractState:
+    """JSON manifest of extraction progress, keyed by location and parameter.
+
+    The manifest looks like {"SANTA ANITA": {"pm10": {"last_utc": "2022-12-31T00:00:00+00:00"}}}.
+    A fetched slice that is not loaded yet is staged as "pending_utc" until load commits it.
+    While a sharded extraction is in progress, the pair also lists its completed time shards.
+    Every update rewrites the file atomically, so a crash never leaves a half-written manifest.
+
+    Args:
+        path (str): Path to the JSON manifest (created on the first update).
+    """
+
+    def __init__(self, path=DEFAULT_STATE_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                self._data = json.load(f)
+        else:
+            self._data = {}
+
+    def _entry(self, location, parameter):
+        return self._data.setdefault(location, {}).setdefault(parameter, {})
+
+    def _save(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self._data, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+    def high_water_mark(self, location, parameter):
+        """Returns the last ingested UTC timestamp for the pair, or None if nothing was ingested yet."""
+        with self._lock:
+            last = self._data.get(location, {}).get(parameter, {}).get('last_utc')
+        return parse_utc(last) if last else None
+
+    def completed_shards(self, location, parameter):
+        """Returns {window: summary} for the time shards of the pair fetched since the last merge."""
+        with self._lock:
+            return dict(self._data.get(location, {}).get(parameter, {}).get('shards', {}))
+
+    def mark_shard(self, location, parameter, window, summary):
+        """Checkpoints one fetched time shard, so a crashed run can resume from the shards left."""
+        with self._lock:
+            self._entry(location, parameter).setdefault('shards', {})[window] = summary
+            self._save()
+
+    def clear_shards(self, location, parameter):
+        """Drops the shard checkpoints of the pair once its shards have been merged."""
+        with self._lock:
+            if self._data.get(location, {}).get(parameter, {}).pop('shards', None) is not None:
+                self._save()
+
+    def stage(self, location, parameter, last_utc):
+        """Records the latest UTC timestamp of a fetched slice that is not loaded yet.
+
+        The high-water mark itself stays where it is until commit(), so a slice that never
+        makes it into the database is requested again by the next incremental run.
+        """
+        with self._lock:
+            entry = self._entry(location, parameter)
+            if last_utc is None:
+                if entry.pop('pending_utc', None) is None:
+                    return
+            else:
+                entry['pending_utc'] = last_utc.isoformat()
+            self._save()
+
+    def commit(self, location, parameter):
+        """Advances the high-water mark to the staged slice once it is loaded.
+
+        Returns:
+            datetime: The new mark, or None when nothing was staged.
+        """
+        with self._lock:
+            pending = self._data.get(location, {}).get(parameter, {}).pop('pending_utc', None)
+        if pending is None:
+            return None
+        self.update(location, parameter, parse_utc(pending))
+        return parse_utc(pending)
+
+    def update(self, location, parameter, last_utc):
+        """Advances the high-water mark for the pair (it never moves backwards)."""
+        if last_utc is None:
+            return
+        with self._lock:
+            entry = self._entry(location, parameter)
+            current = entry.get('last_utc')
+            if current is None or parse_utc(current) < last_utc:
+                entry['last_utc'] = last_utc.isoformat()
+                self._save()
@@ -0,0 +1,138 @@
+import os
+from pathlib import Path
+
+# pyarrow is imported on first use by _require_pyarrow()
+pa = feather = pq = None
+
+FORMATS = {'parquet': 'part.parquet', 'arrow': 'part.arrow'}
+
+# Stages kept side by side under the store root: raw extract output and cleaned hourly series
+RAW = 'raw'
+CLEAN = 'clean'
+
+def _require_pyarrow():
+    global pa, feather, pq
+    if pa is not None:
+        return
+    try:
+        import pyarrow
+        import pyarrow.feather
+        import pyarrow.parquet
+    except ImportError:  # The columnar store is optional, CSV keeps working without pyarrow
+        raise ImportError("The columnar store needs pyarrow (pip install pyarrow)")
+    pa, feather, pq = pyarrow, pyarrow.feather, pyarrow.parquet
+
+def _schema():
+    return pa.schema([('datetime', pa.timestamp('us', tz='UTC')), ('value', pa.float32())])
+
+def _utc(ts):
+    import pandas as pd
+
+    ts = pd.Timestamp(ts)
+    return ts.tz_localize('UTC') if ts.tz is None else ts.tz_convert('UTC')
+
+def month_start(ts):
+    """The first UTC hour of the month partition a timestamp falls into."""
+    return _utc(ts).normalize().replace(day=1)
+
+def series_dir(root, stage, location, parameter):
+    """Directory holding one series: <root>/<stage>/location=<location>/parameter=<parameter>."""
+    return Path(root) / stage / f'location={location.replace(" ", "_")}' / f'parameter={parameter}'
+
+def list_series(root, stage):
+    """Returns the (location, parameter) pairs present in a store stage (locations with underscores)."""
+    pairs = []
+    for location_dir in sorted((Path(root) / stage).glob('location=*')):
+        for parameter_dir in sorted(location_dir.glob('parameter=*')):
+            pairs.append((location_dir.name.split('=', 1)[1], parameter_dir.name.split('=', 1)[1]))
+    return pairs
+
+def _read_file(path):
+    if path.suffix == '.parquet':
+        return pq.read_table(path)
+    return feather.read_table(path)
+
+def _write_file(table, path):
+    tmp_path = path.with_name(path.name + '.tmp')
+    if path.suffix == '.parquet':
+        pq.write_table(table, tmp_path)
+    else:
+        feather.write_feather(table, tmp_path, compression='zstd')
+    os.replace(tmp_path, path)
+
+def write_series(root, stage, location, parameter, df, fmt='parquet', append=False):
+    """Writes a series partitioned by month, with a UTC timestamp column and a float32 value column.
+
+    Args:
+        root (str): Store root directory.
+        stage (str): RAW or CLEAN.
+        location (str): Location name.
+        parameter (str): Parameter name.
+        df (pd.DataFrame): Frame with 'datetime' and 'value' columns.
+        fmt (str): 'parquet' or 'arrow' (Arrow IPC).
+        append (bool): Merge with the rows already stored for the touched months
+            instead of replacing them.
+
+    Returns:
+        int: Number of rows written.
+    """
+    import pandas as pd
+
+    _require_pyarrow()
+    df = pd.DataFrame({
+        'datetime': pd.to_datetime(df['datetime'], utc=True),
+        'value': df['value'].astype('float32'),
+    })
+    base = series_dir(root, stage, location, parameter)
+
+    for month, part in df.groupby(df['datetime'].dt.strftime('%Y-%m'), sort=True):
+        month_dir = base / f'month={month}'
+        month_dir.mkdir(parents=True, exist_ok=True)
+        table = pa.Table.from_pandas(part, schema=_schema(), preserve_index=False)
+
+        target = month_dir / FORMATS[fmt]
+        existing = [month_dir / name for name in FORMATS.values() if (month_dir / name).exists()]
+        if append and existing:
+            table = pa.concat_tables([_read_file(existing[0]).cast(_schema()), table]).sort_by('datetime')
+
+        _write_file(table, target)
+        # A month switching format leaves no stale copy behind
+        for path in existing:
+            if path != target:
+                path.unlink()
+    return len(df)
+
+def read_series(root, stage, location, parameter, start=None, end=None):
+    """Reads a series back, only opening the month partitions that overlap [start, end).
+
+    Returns:
+        pd.DataFrame: Frame with a tz-aware 'datetime' column and a float32 'value' column,
+        sorted by time.
+    """
+    import pandas as pd
+
+    _require_pyarrow()
+    start = _utc(start) if start is not None else None
+    end = _utc(end) if end is not None else None
+
+    tables = []
+    for month_dir in sorted(series_dir(root, stage, location, parameter).glob('month=*')):
+        month = pd.Timestamp(month_dir.name.split('=', 1)[1] + '-01', tz='UTC')
+        if start is not None and month + pd.offsets.MonthBegin(1) <= start:
+            continue
+        if end is not None and month >= end:
+            continue
+        for name in FORMATS.values():
+            if (month_dir / name).exists():
+                tables.append(_read_file(month_dir / name).cast(_schema()))
+
+    if not tables:
+        return pd.DataFrame({'datetime': pd.Series(dtype='datetime64[us, UTC]'),
+                             'value': pd.Series(dtype='float32')})
+
+    df = pa.concat_tables(tables).to_pandas()
+    if start is not None:
+        df = df[df['datetime'] >= start]
+    if end is not None:
+        df = df[df['datetime'] < end]
+    return df.sort_values('datetime', kind='stable').reset_index(drop=True)
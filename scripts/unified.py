@@ -0,0 +1,216 @@
+"""The unified schema: one month-partitioned measurements table with a view per series.
+
+The measurement rows of every series share one table, so adding a series adds no table.
+The rollups are not shared yet: each series still gets its own _hourly_stats, _value_hist
+and _daily tables (see rollups.SUFFIXES), so the number of tables grows by three per series.
+"""
+import argparse
+from contextlib import contextmanager
+
+import psycopg2
+
+# Session lock serialising the schema, series and partition DDL of concurrent loads
+DDL_LOCK = 4242022
+
+
+def partition_name(month):
+    """measurements_y2022m01 for any date in January 2022."""
+    return f"measurements_y{month.year:04d}m{month.month:02d}"
+
+
+def split_series(table_name):
+    """'SANTA_ANITA_pm10' -> ('SANTA_ANITA', 'pm10')."""
+    location, _, parameter = table_name.rpartition('_')
+    if not location or not parameter:
+        raise ValueError(f"Expected a <location>_<parameter> name, got {table_name!r}")
+    return location, parameter
+
+
+@contextmanager
+def ddl_cursor(cur):
+    """A cursor on a second, autocommit connection to the same database, holding DDL_LOCK.
+
+    Partitions, series and views are created there and committed at once, so a long load
+    transaction never holds the catalog locks its DDL takes and concurrent loads do not wait
+    for each other (or deadlock) on them. The connection reuses the load's parameters; a
+    password has to come from PGPASSWORD or ~/.pgpass, as for the other scripts.
+    """
+    conn = psycopg2.connect(cur.connection.dsn)
+    conn.autocommit = True
+    try:
+        with conn.cursor() as ddl:
+            ddl.execute("SELECT pg_advisory_lock(%s)", (DDL_LOCK,))
+            yield ddl
+    finally:
+        conn.close()
+
+
+def create_schema(cur):
+    """Creates the long-format measurements table and its lookup tables if they do not exist yet.
+
+    measurements holds every series, range-partitioned by month on ts (see ensure_partitions).
+    The (location_id, parameter_id, ts) primary key is the composite index of per-series range
+    scans, and the BRIN index on ts serves scans of all series over a time range at a tiny
+    fraction of a B-tree's size, since rows arrive roughly in time order. The lookup tables are
+    not enforced as foreign keys, which would make attaching a partition lock them.
+    measurements_long names the location and parameter of every row, for cross-station queries.
+    """
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS locations (
+            location_id SERIAL PRIMARY KEY,
+            name TEXT UNIQUE NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS parameters (
+            parameter_id SERIAL PRIMARY KEY,
+            name TEXT UNIQUE NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS measurements (
+            location_id INTEGER NOT NULL,
+            parameter_id INTEGER NOT NULL,
+            ts TIMESTAMP NOT NULL,
+            value REAL,
+            PRIMARY KEY (location_id, parameter_id, ts)
+        ) PARTITION BY RANGE (ts);
+        CREATE INDEX IF NOT EXISTS measurements_ts_brin ON measurements USING brin (ts);
+        CREATE OR REPLACE VIEW measurements_long AS
+            SELECT l.name AS location, p.name AS parameter, m.ts AS datetime, m.value
+            FROM measurements m
+            JOIN locations l USING (location_id)
+            JOIN parameters p USING (parameter_id);
+    """)
+
+
+def series_ids(cur, table_name):
+    """(location_id, parameter_id) of a series registered by create_series."""
+    location, parameter = split_series(table_name)
+    cur.execute("""
+        SELECT l.location_id, p.parameter_id FROM locations l, parameters p
+        WHERE l.name = %s AND p.name = %s
+    """, (location, parameter))
+    row = cur.fetchone()
+    if row is None:
+        raise ValueError(f"{table_name} is not a series of the measurements table")
+    return row
+
+
+def register_series(cur, table_name):
+    """Adds the location and parameter of a <location>_<parameter> series to the lookup tables.
+
+    Creates the schema on first use.
+
+    Returns:
+        tuple: (location_id, parameter_id) of the series.
+    """
+    location, parameter = split_series(table_name)
+    with ddl_cursor(cur) as ddl:
+        ddl.execute("SELECT to_regclass('measurements') IS NULL")
+        if ddl.fetchone()[0]:
+            create_schema(ddl)
+        for lookup, name in (('locations', location), ('parameters', parameter)):
+            # Checked first so reloads do not use up serial values, DDL_LOCK keeps it race free
+            ddl.execute(f"INSERT INTO {lookup} (name) SELECT %s WHERE NOT EXISTS (SELECT 1 FROM {lookup} WHERE name = %s)",
+                        (name, name))
+        return series_ids(ddl, table_name)
+
+
+def view_sql(table_name, ids):
+    """The compatibility view of a series: its per-table name and (datetime, value) columns."""
+    return f"""
+        CREATE VIEW {table_name} AS
+        SELECT ts AS datetime, value FROM measurements
+        WHERE location_id = {int(ids[0])} AND parameter_id = {int(ids[1])}
+    """
+
+
+def create_series(cur, table_name):
+    """Registers a <location>_<parameter> series and creates its compatibility view.
+
+    The view keeps the per-table name, so the analysis scripts, the rollups and datasource
+    read the series as before. It filters on the primary key, and the datetime bounds of
+    their queries prune the month partitions.
+
+    Returns:
+        tuple: (location_id, parameter_id) of the series.
+    """
+    ids = register_series(cur, table_name)
+    with ddl_cursor(cur) as ddl:
+        ddl.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", (table_name.lower(),))
+        relkind = ddl.fetchone()
+        if relkind is not None and relkind[0] != 'v':
+            raise ValueError(f"{table_name} is a per-table series, move it first with scripts/unified.py {table_name}")
+        if relkind is None:
+            ddl.execute(view_sql(table_name, ids))
+    return ids
+
+
+def ensure_partitions(cur, changes):
+    """Creates the month partitions that the rows of a changes table fall into and that do not exist yet.
+
+    New partitions are created empty and attached, which only needs a SHARE UPDATE EXCLUSIVE
+    lock on measurements, so loads writing to other months carry on meanwhile.
+    """
+    cur.execute(f"""
+        SELECT month FROM (SELECT DISTINCT date_trunc('month', datetime)::date AS month FROM {changes}) AS m
+        WHERE to_regclass('measurements_y' || to_char(month, 'YYYY"m"MM')) IS NULL
+    """)
+    months = [month for (month,) in cur.fetchall()]
+    if not months:
+        return
+    with ddl_cursor(cur) as ddl:
+        for month in months:
+            name = partition_name(month)
+            ddl.execute("SELECT to_regclass(%s) IS NULL", (name,))
+            if not ddl.fetchone()[0]:
+                continue
+            upper = month.replace(year=month.year + month.month // 12, month=month.month % 12 + 1)
+            ddl.execute(f"""
+                CREATE TABLE {name} (LIKE measurements INCLUDING DEFAULTS INCLUDING CONSTRAINTS);
+                ALTER TABLE measurements ATTACH PARTITION {name} FOR VALUES FROM ('{month}') TO ('{upper}');
+            """)
+
+
+def merge_changes(cur, table_name, changes):
+    """Upserts the new values of a changes table (datetime, new, old) into the series' rows of measurements."""
+    location_id, parameter_id = series_ids(cur, table_name)
+    ensure_partitions(cur, changes)
+    cur.execute(f"""
+        INSERT INTO measurements (location_id, parameter_id, ts, value)
+        SELECT %s, %s, datetime, new FROM {changes}
+        ON CONFLICT (location_id, parameter_id, ts) DO UPDATE SET value = EXCLUDED.value;
+    """, (location_id, parameter_id))
+
+
+def move_table(cur, table_name):
+    """Moves the rows of a per-table series into measurements and replaces the table by its view.
+
+    The rollup tables are kept as they are, the rows they describe do not change.
+
+    Returns:
+        int: Number of rows moved.
+    """
+    ids = register_series(cur, table_name)
+    cur.execute(f"ALTER TABLE {table_name} RENAME TO {table_name}_moving")
+    cur.execute(f"""
+        CREATE TEMP TABLE changes_{table_name} ON COMMIT DROP AS
+            SELECT datetime, value AS new, NULL::real AS old FROM {table_name}_moving;
+    """)
+    merge_changes(cur, table_name, f"changes_{table_name}")
+    rows = cur.rowcount
+    cur.execute(f"DROP TABLE changes_{table_name}, {table_name}_moving")
+    cur.execute(view_sql(table_name, ids))
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Move per-table series into the partitioned measurements table.")
+    parser.add_argument("tables", nargs="+", help="<location>_<parameter> tables loaded with --schema per_table")
+    parser.add_argument("--host", default="localhost", help="PostgreSQL database host")
+    parser.add_argument("--dbname", required=True, help="PostgreSQL database name")
+    parser.add_argument("--user", required=True, help="PostgreSQL user")
+    args = parser.parse_args()
+
+    for table in args.tables:
+        table = table.replace('-', '_')
+        with psycopg2.connect(host=args.host, dbname=args.dbname, user=args.user) as conn:
+            with conn.cursor() as cur:
+                print(f"{table}: {move_table(cur, table)} rows moved, now a view over measurements")
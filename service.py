@@ -0,0 +1,371 @@
+import argparse
+import asyncio
+import json
+import os
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from urllib.parse import parse_qsl, unquote, urlsplit
+
+# Figures are rendered to PNG bytes, never shown
+os.environ['MPLBACKEND'] = 'Agg'
+
+import datasource
+from average_day import plot_average_day
+from crtanje import plot_day_of_week
+from crtanje3 import plot_stats_table
+from line_graph_y import plot_tables
+
+DEFAULT_PORT = 8050
+DEFAULT_CACHE_SIZE = 256
+# Table field of the cache keys of results over every table (table list, fleet summary)
+ALL_TABLES = '*'
+# Seconds between attempts to (re)open the LISTEN connection
+LISTEN_RETRY = 5
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+           500: 'Internal Server Error'}
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class ResultCache:
+    """LRU cache of finished responses keyed by (analysis, table, start, end, tz, options).
+
+    invalidate(table) drops the entries of that table and those over every table. Results
+    computed across an invalidation are not stored, since they may predate the change.
+
+    Args:
+        max_entries (int): Entries kept before the least recently used are evicted (0 disables).
+    """
+
+    def __init__(self, max_entries=DEFAULT_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.enabled = max_entries > 0
+        self.entries = OrderedDict()
+        self.version = 0
+        self.hits = self.misses = self.evictions = self.invalidations = 0
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def put(self, key, value, version):
+        """Stores a result whose computation started at cache `version`."""
+        if not self.enabled or version != self.version:
+            return
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, table=None):
+        """Drops the entries of a table and those over every table (every entry for None)."""
+        self.version += 1
+        self.invalidations += 1
+        if table is None:
+            self.entries.clear()
+            return
+        stale = [key for key in self.entries if key[1] == ALL_TABLES or key[1].lower() == table.lower()]
+        for key in stale:
+            del self.entries[key]
+
+    def stats(self):
+        return {'entries': len(self.entries), 'max_entries': self.max_entries, 'enabled': self.enabled,
+                'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                'invalidations': self.invalidations}
+
+
+def _records(df):
+    """A frame (its index included) as a JSON array of row objects."""
+    return df.reset_index().to_json(orient='records', date_format='iso').encode()
+
+
+def _png(plot, *args):
+    """Runs a plotting function of the analysis scripts into PNG bytes instead of a file."""
+    buffer = BytesIO()
+    plot(*args, buffer)
+    return buffer.getvalue()
+
+
+class AnalyticsService:
+    """Serves the analyses of the scripts as JSON or PNG over HTTP, with cached results.
+
+    Queries run on a thread pool sized to the source's connection pool (one thread for the
+    file sources) and figures on a single thread, as pyplot keeps global state. With a
+    PostgreSQL source the service LISTENs for the notifications load.py sends when it commits
+    new rows and drops the cached results of those tables.
+
+    Args:
+        source (str): Data source URL (see datasource.get_source).
+        cache_size (int): Results kept by the LRU cache.
+    """
+
+    def __init__(self, source, cache_size=DEFAULT_CACHE_SIZE):
+        self.source = source
+        self.src = datasource.get_source(source)
+        self.is_postgres = isinstance(self.src, datasource.PostgresSource)
+        self.queries = ThreadPoolExecutor(max_workers=self.src.pool.maxconn if self.is_postgres else 1)
+        self.plots = ThreadPoolExecutor(max_workers=1)
+        self.cache = ResultCache(cache_size)
+        # Computations in flight, shared by identical requests that arrive meanwhile
+        self.pending = {}
+        self.listener = self.listener_fd = None
+        self.analyses = {
+            'tables': self.tables,
+            'summary': self.summary,
+            'avgday': self.average_day,
+            'hourstats': self.hour_stats,
+            'series': self.series,
+        }
+
+    # Analyses: run on the query pool, return (content type, body)
+
+    def tables(self, table, params):
+        return 'application/json', json.dumps(datasource.list_tables(self.source)).encode()
+
+    def summary(self, table, params):
+        tables = [table] if table else params['tables'].split(',') if params.get('tables') else None
+        df = datasource.summaries(tables, params.get('start'), params.get('end'), self.source,
+                                  params.get('approximate') == '1')
+        return 'application/json', df.to_json(orient='records', date_format='iso').encode()
+
+    def average_day(self, table, params):
+        # Only the mean is read, which the rollups give exactly
+        average = datasource.hour_profile(table, params.get('start'), params.get('end'), params['tz'],
+                                          source=self.source, approximate=True)['mean']
+        if params['format'] == 'png':
+            title = f"Average Day ({params.get('start')} to {params.get('end')})"
+            return 'image/png', self.render(plot_average_day, average, title)
+        return 'application/json', _records(average.to_frame())
+
+    def hour_stats(self, table, params):
+        weekday = params.get('weekday') == '1'
+        grouped = datasource.hour_profile(table, params.get('start'), params.get('end'), params['tz'],
+                                          weekday=weekday, source=self.source,
+                                          approximate=params.get('approximate') == '1')
+        if params['format'] != 'png':
+            return 'application/json', _records(grouped)
+        if not weekday:
+            return 'image/png', self.render(plot_stats_table, grouped[['mean', 'median']])
+        # The overall line is weighted from the day-of-week groups, as crtanje.py draws it
+        totals = (grouped['mean'] * grouped['count']).groupby(level='hour').sum()
+        overall = totals / grouped['count'].groupby(level='hour').sum()
+        return 'image/png', self.render(plot_day_of_week, grouped['mean'].unstack(level=0), overall)
+
+    def series(self, table, params):
+        from downsample import DEFAULT_WIDTH
+
+        df = datasource.load_downsampled(table, params.get('start'), params.get('end'), params['tz'], self.source,
+                                         int(params.get('width', DEFAULT_WIDTH)), params.get('method', 'minmax'))
+        if params['format'] == 'png':
+            return 'image/png', self.render(plot_tables, {table: df.rename(columns={'datetime': 'timestamp'})})
+        df = df.assign(datetime=df['datetime'].map(lambda ts: ts.isoformat()))
+        return 'application/json', df.to_json(orient='records').encode()
+
+    def render(self, plot, *args):
+        """Draws a figure on the plot thread (called from a query thread)."""
+        return self.plots.submit(_png, plot, *args).result()
+
+    # Requests
+
+    async def respond(self, method, target):
+        """Answers one request.
+
+        Returns:
+            tuple: (status, content type, body, cache outcome).
+        """
+        from downsample import METHODS
+
+        url = urlsplit(target)
+        parts = [unquote(part) for part in url.path.strip('/').split('/') if part]
+        params = dict(parse_qsl(url.query))
+        if parts == ['cache']:
+            if method == 'DELETE':
+                self.cache.invalidate()
+            elif method != 'GET':
+                raise HTTPError(405, f"{method} is not supported")
+            return 200, 'application/json', json.dumps(self.cache.stats()).encode(), '-'
+        if method != 'GET':
+            raise HTTPError(405, f"{method} is not supported")
+        if not parts or parts[0] not in self.analyses or len(parts) > 2:
+            raise HTTPError(404, f"Unknown endpoint {url.path}, expected one of /{', /'.join(self.analyses)} or /cache")
+        analysis, table = parts[0], parts[1] if len(parts) == 2 else None
+        if table is None and analysis not in ('tables', 'summary'):
+            raise HTTPError(404, f"/{analysis} needs a table: /{analysis}/TABLE")
+        if table is not None and analysis == 'tables':
+            raise HTTPError(404, "/tables takes no table")
+        params.setdefault('tz', 'UTC')
+        params.setdefault('format', 'json')
+        if params['format'] not in ('json', 'png'):
+            raise HTTPError(400, f"Unknown format {params['format']}, expected json or png")
+        if params.get('method', 'minmax') not in METHODS:
+            raise HTTPError(400, f"Unknown method {params['method']}, expected one of {', '.join(METHODS)}")
+        if table is not None:
+            await self.check_table(table)
+
+        key = (analysis, table or ALL_TABLES, params.pop('start', None), params.pop('end', None), params.pop('tz'),
+               tuple(sorted(params.items())))
+        cached = self.cache.get(key)
+        if cached is not None:
+            return 200, *cached, 'hit'
+        task = self.pending.get(key)
+        outcome = 'shared' if task is not None else 'miss'
+        if task is None:
+            task = self.pending[key] = asyncio.ensure_future(self.compute(key))
+            task.add_done_callback(lambda _: self.pending.pop(key, None))
+        # Shielded, so a client going away does not cancel a computation others wait for
+        return 200, *(await asyncio.shield(task)), outcome
+
+    async def compute(self, key):
+        analysis, table, start, end, tz, options = key
+        params = dict(options, start=start, end=end, tz=tz)
+        params = {name: value for name, value in params.items() if value is not None}
+        version = self.cache.version
+        result = await asyncio.get_running_loop().run_in_executor(
+            self.queries, self.analyses[analysis], None if table == ALL_TABLES else table, params)
+        self.cache.put(key, result, version)
+        return result
+
+    async def check_table(self, table):
+        """Raises a 404 for tables the source does not have (the table list is cached like any result)."""
+        _, _, body, _ = await self.respond('GET', '/tables')
+        if table.lower() not in {name.lower() for name in json.loads(body)}:
+            raise HTTPError(404, f"No table {table}")
+
+    async def handle(self, reader, writer):
+        """Serves the requests of one connection, keeping it open between requests for HTTP/1.1 clients."""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if not line.strip():
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                if int(headers.get('content-length', 0)):
+                    await reader.readexactly(int(headers['content-length']))
+                method, target, version = request_line.decode('latin-1').split()
+
+                start = time.perf_counter()
+                try:
+                    status, content_type, body, outcome = await self.respond(method, target)
+                except Exception as e:
+                    # Bad dates, widths and the like are the client's, anything else is ours
+                    status = e.status if isinstance(e, HTTPError) else 400 if isinstance(e, ValueError) else 500
+                    content_type, body, outcome = 'application/json', json.dumps({'error': str(e)}).encode(), '-'
+                elapsed = time.perf_counter() - start
+                keep_alive = version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+                writer.write(f"HTTP/1.1 {status} {REASONS[status]}\r\n"
+                             f"Content-Type: {content_type}\r\n"
+                             f"Content-Length: {len(body)}\r\n"
+                             f"X-Cache: {outcome}\r\n"
+                             f"Server-Timing: total;dur={elapsed * 1000:.2f}\r\n"
+                             f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode('latin-1') + body)
+                await writer.drain()
+                print(f"{method} {target} {status} {outcome} {elapsed * 1000:.1f}ms")
+                if not keep_alive:
+                    break
+        except (ConnectionError, ValueError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    # Invalidation
+
+    def listen(self):
+        """Opens the LISTEN connection on load.py's channel, retrying every LISTEN_RETRY seconds.
+
+        Notifications sent while it is down are lost, so the cache is cleared and stays off
+        until the connection is back.
+        """
+        import psycopg2
+
+        from load import NOTIFY_CHANNEL
+
+        loop = asyncio.get_running_loop()
+        try:
+            self.listener = psycopg2.connect(self.source)
+            self.listener.autocommit = True
+            with self.listener.cursor() as cur:
+                cur.execute(f"LISTEN {NOTIFY_CHANNEL}")
+        except psycopg2.Error as e:
+            print(f"LISTEN {NOTIFY_CHANNEL} failed, caching off, retrying in {LISTEN_RETRY}s: {e}")
+            self.listener = None
+            self.cache.enabled = False
+            self.cache.invalidate()
+            loop.call_later(LISTEN_RETRY, self.listen)
+            return
+        self.cache.enabled = self.cache.max_entries > 0
+        self.cache.invalidate()
+        # Kept, the descriptor cannot be asked of the connection once it is lost
+        self.listener_fd = self.listener.fileno()
+        loop.add_reader(self.listener_fd, self.notified)
+
+    def notified(self):
+        """Drops the cached results of every table named by the pending notifications."""
+        import psycopg2
+
+        try:
+            self.listener.poll()
+        except psycopg2.Error as e:
+            print(f"LISTEN connection lost: {e}")
+            asyncio.get_running_loop().remove_reader(self.listener_fd)
+            self.listener.close()
+            self.cache.enabled = False
+            self.cache.invalidate()
+            asyncio.get_running_loop().call_later(LISTEN_RETRY, self.listen)
+            return
+        while self.listener.notifies:
+            self.cache.invalidate(self.listener.notifies.pop(0).payload or None)
+
+    async def serve(self, host='127.0.0.1', port=DEFAULT_PORT):
+        server = await asyncio.start_server(self.handle, host, port)
+        if self.is_postgres:
+            self.listen()
+        print(f"Serving {self.source} on http://{host}:{port} (cache of {self.cache.max_entries} results)")
+        async with server:
+            await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Serve the analyses as JSON/PNG over HTTP with a result cache.",
+        epilog="endpoints (GET, options as query parameters start, end, tz and format=json|png):\n"
+               "  /tables                  every series of the source\n"
+               "  /summary[/TABLE]         summary statistics (tables=A,B and approximate=1 without TABLE)\n"
+               "  /avgday/TABLE            average value per local hour of the day\n"
+               "  /hourstats/TABLE         mean, median and count per local hour (weekday=1: per day and hour,\n"
+               "                           approximate=1: from the rollups)\n"
+               "  /series/TABLE            the series downsampled for plotting (width, method)\n"
+               "  /cache                   cache statistics (DELETE clears the cache)",
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--source", default=datasource.DEFAULT_SOURCE,
+                        help="Data source URL (postgresql://..., duckdb:///path/to/cleaned/files or binary:///path/to/f32/files)")
+    parser.add_argument("--host", default="127.0.0.1", help="Address to listen on")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="Port to listen on")
+    parser.add_argument("--cache-size", type=int, default=DEFAULT_CACHE_SIZE,
+                        help="Results kept in the LRU cache (0 disables caching)")
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(AnalyticsService(args.source, args.cache_size).serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
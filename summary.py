@@ -1,36 +1,86 @@
-import sqlalchemy as sa
-from sqlalchemy import func
-
-# Database connection details (replace with your own)
-db_user = "postgres"
-db_host = "localhost"
-db_port = "5432"  # Default PostgreSQL port
-db_name = "air_quality"
-table_name = "Civic_pm25"
-column_name = "value"
-
-# Construct database connection string
-engine_string = f"postgresql://{db_user}@{db_host}:{db_port}/{db_name}"
-
-# Create the SQLAlchemy engine
-engine = sa.create_engine(engine_string)
-
-# Create a session
-with engine.connect() as connection:
-    # Query for summary statistics
-    result = connection.execute(
-        sa.select([
-            func.max(sa.column(column_name)).label("maximum"),
-            func.min(sa.column(column_name)).label("minimum"),
-            func.avg(sa.column(column_name)).label("mean"),
-            func.percentile_cont(0.5).within_group(sa.column(column_name)).label("median")
-        ]).from_(sa.table(table_name))
-    )
-
-    # Print the results
-    row = result.fetchone()
+import argparse
+import time
+
+import datasource
+
+DEFAULT_OUTPUT_TABLE = "summary_statistics"
+
+def write_summary_table(dsn, summary, table_name=DEFAULT_OUTPUT_TABLE):
+    """Upserts one row per series into a PostgreSQL summary table (created if needed).
+
+    Args:
+        dsn (str): libpq connection URI of the database.
+        summary (pd.DataFrame): Output of datasource.summaries().
+        table_name (str): Name of the summary table.
+    """
+    import psycopg2
+    from psycopg2.extras import execute_values
+
+    columns = datasource.SUMMARY_COLUMNS
+    rows = [tuple(None if value != value else value for value in row)  # NaN/NaT -> NULL
+            for row in summary[columns].astype(object).itertuples(index=False)]
+    rows = [row[:7] + tuple(value.to_pydatetime().replace(tzinfo=None) if value is not None else None
+                            for value in row[7:9]) + row[9:] for row in rows]
+    updates = ', '.join(f"{column} = EXCLUDED.{column}" for column in columns[1:])
+    with psycopg2.connect(dsn) as conn:
+        with conn.cursor() as cur:
+            cur.execute(f"""
+                CREATE TABLE IF NOT EXISTS {table_name} (
+                    table_name TEXT PRIMARY KEY,
+                    maximum DOUBLE PRECISION,
+                    minimum DOUBLE PRECISION,
+                    mean DOUBLE PRECISION,
+                    median DOUBLE PRECISION,
+                    p95 DOUBLE PRECISION,
+                    count BIGINT,
+                    first_time TIMESTAMP,
+                    last_time TIMESTAMP,
+                    coverage DOUBLE PRECISION,
+                    approximate BOOLEAN,
+                    computed_at TIMESTAMP DEFAULT (now() AT TIME ZONE 'UTC')
+                )
+            """)
+            execute_values(cur, f"""
+                INSERT INTO {table_name} ({', '.join(columns)}) VALUES %s
+                ON CONFLICT (table_name) DO UPDATE SET {updates}, computed_at = now() AT TIME ZONE 'UTC'
+            """, rows)
+
+def main():
+    parser = argparse.ArgumentParser(description="Summary statistics of every <location>_<parameter> table in one pass.")
+    parser.add_argument("tables", nargs="*", help="Tables to summarise (default: every series of the source)")
+    parser.add_argument("--start_date", help="Start date (YYYY-MM-DD)")
+    parser.add_argument("--end_date", help="End date (YYYY-MM-DD)")
+    parser.add_argument("--source", default=datasource.DEFAULT_SOURCE,
+                        help="Data source URL (postgresql://..., duckdb:///path/to/cleaned/files or binary:///path/to/f32/files)")
+    parser.add_argument("--approximate", action="store_true",
+                        help="Answer tables that have rollups from their histograms instead of scanning the rows")
+    parser.add_argument("--output_table", default=DEFAULT_OUTPUT_TABLE,
+                        help="PostgreSQL table receiving the summary (PostgreSQL sources only)")
+    parser.add_argument("--csv", help="Also write the summary to this CSV file (the only output for DuckDB sources)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    summary = datasource.summaries(args.tables or None, args.start_date, args.end_date, args.source,
+                                   args.approximate)
+    seconds = time.perf_counter() - start
+
     print("Summary Statistics:")
-    print(f"Maximum: {row['maximum']}")
-    print(f"Minimum: {row['minimum']}")
-    print(f"Mean: {row['mean']}")
-    print(f"Median: {row['median']}")
\ No newline at end of file
+    print(f"{'table':<28} {'maximum':>8} {'minimum':>8} {'mean':>8} {'median':>8} {'p95':>8} {'count':>8} {'coverage':>9}")
+    for row in summary.itertuples(index=False):
+        marker = " ~" if row.approximate else ""
+        # No gap index (e.g. PostgreSQL tables) means the coverage is unknown
+        coverage = f"{row.coverage:>9.1%}" if row.coverage == row.coverage else f"{'-':>9}"
+        print(f"{row.table_name:<28} {row.maximum:>8.2f} {row.minimum:>8.2f} {row.mean:>8.2f} {row.median:>8.2f} "
+              f"{row.p95:>8.2f} {row.count:>8} {coverage}{marker}")
+    print(f"{len(summary)} tables summarised in {seconds:.2f}s" +
+          (" (~ approximate, from the rollups)" if summary['approximate'].any() else ""))
+
+    if isinstance(datasource.get_source(args.source), datasource.PostgresSource):
+        write_summary_table(args.source, summary, args.output_table)
+        print(f"Written to {args.output_table}")
+    if args.csv:
+        summary.to_csv(args.csv, index=False)
+        print(f"Written to {args.csv}")
+
+if __name__ == "__main__":
+    main()
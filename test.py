@@ -3,6 +3,11 @@ import csv
 import time
 import logging
 import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent / "scripts"))
+from cache import ResponseCache
 
 # Configure logging
 logging.basicConfig(filename='air_quality_fetch.log', 
@@ -20,6 +25,9 @@ if not api_key:
     exit(1)
 headers['Authorization'] = f"Bearer {api_key}"
 
+# Pages of closed windows are served from disk on re-runs
+cache = ResponseCache()
+
 def fetch_and_store_measurements(location, start_date, end_date, parameters):
     page = 1
     requests_made = 0
@@ -35,10 +43,15 @@ def fetch_and_store_measurements(location, start_date, end_date, parameters):
                 'page': page
             }
 
-            response = requests.get(base_url, headers=headers, params=params)
+            data = cache.get(base_url, params)
+            response = None
+            if data is None:
+                response = requests.get(base_url, headers=headers, params=params)
+                if response.status_code == 200:
+                    data = response.json()
+                    cache.put(base_url, params, data)
 
-            if response.status_code == 200:
-                data = response.json()
+            if data is not None:
 
                 with open('measurementsCivic.csv', 'a', newline='') as csvfile: 
                     writer = csv.writer(csvfile)
@@ -53,7 +66,8 @@ def fetch_and_store_measurements(location, start_date, end_date, parameters):
                         ]
                         writer.writerow(measurement_data) 
 
-                requests_made += 1
+                if response is not None:
+                    requests_made += 1
 
                 # Basic Rate Limiting (Consult OpenAQ Documentation)
                 if requests_made >= 100: 
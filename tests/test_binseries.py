@@ -0,0 +1,53 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path[:0] = [str(ROOT / "scripts")]
+
+import binseries
+import gaps
+
+START = pd.Timestamp('2022-01-01', tz='UTC')
+
+
+def hourly(hours, values):
+    return START + pd.to_timedelta(hours, unit='h'), np.asarray(values, dtype=np.float32)
+
+
+def test_update_and_read_back(tmp_path):
+    path = tmp_path / 'series.f32'
+    times, values = hourly(range(20), np.arange(20) * 1.5)
+    # Hours 4 and 5 were interpolated by clean
+    index = gaps.GapIndex.from_times(times.delete([4, 5]))
+    assert binseries.update(path, times, values, index) == 20
+
+    series = binseries.BinarySeries(path)
+    assert (len(series), series.start_hour) == (20, START.value // binseries.HOUR_NS)
+    frame = series.to_frame()
+    assert frame['datetime'].tolist() == list(times)
+    np.testing.assert_array_equal(frame['value'].to_numpy(), values.astype(np.float64))
+    assert np.flatnonzero(series.gap_mask()).tolist() == [4, 5]
+    assert series.gap_index().runs.tolist() == index.runs.tolist()
+
+    first, part = series.slice('2022-01-01 10:00', '2022-01-01 13:00')
+    assert first == series.start_hour + 10
+    np.testing.assert_array_equal(part, values[10:13])
+    assert series.gap_mask('2022-01-01 03:00', '2022-01-01 07:00').tolist() == [False, True, True, False]
+
+
+def test_later_slice_overrides_its_hours_and_leaves_a_nan_gap(tmp_path):
+    path = tmp_path / 'series.f32'
+    binseries.update(path, *hourly(range(10), np.ones(10)))
+    # Refetched hours 8-9 and new hours up to 11, then a hole before hour 14
+    binseries.update(path, *hourly([8, 9, 10, 11, 14], [2, 2, 2, 2, 3]))
+
+    series = binseries.BinarySeries(path)
+    assert len(series) == 15
+    values = np.asarray(series.values)
+    np.testing.assert_array_equal(values[:12], [1] * 8 + [2] * 4)
+    assert np.isnan(values[12:14]).all() and values[14] == 3
+    assert np.flatnonzero(series.gap_mask()).tolist() == [12, 13]
+    assert len(series.to_frame()) == 13
@@ -0,0 +1,63 @@
+import os
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path[:0] = [str(ROOT / "scripts")]
+
+from cache import CacheMiss, ResponseCache
+
+URL = 'http://stub/measurements'
+
+
+def page(number, date_to='2022-01-02T00:00:00Z'):
+    return {'location': 'SANTA ANITA', 'parameter': 'pm10', 'date_from': '2022-01-01T00:00:00Z',
+            'date_to': date_to, 'page': number}
+
+
+def test_open_windows_expire_after_the_ttl(tmp_path):
+    cache = ResponseCache(tmp_path, ttl=3600)
+    open_page = page(1, date_to=time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()))
+    cache.put(URL, open_page, {'results': [1]})
+    assert cache.get(URL, open_page) == {'results': [1]}
+
+    cache.ttl = 0
+    assert cache.get(URL, open_page) is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_closed_windows_never_expire(tmp_path):
+    cache = ResponseCache(tmp_path, ttl=0)
+    cache.put(URL, page(1), {'results': [1]})
+    # The same window spelled with an explicit offset is the same page
+    assert cache.get(URL, page(1, date_to='2022-01-02T00:00:00+00:00')) == {'results': [1]}
+
+
+def test_offline_miss_raises(tmp_path):
+    cache = ResponseCache(tmp_path, offline=True)
+    with pytest.raises(CacheMiss):
+        cache.get(URL, page(1))
+
+
+def test_eviction_removes_the_least_recently_used_pages(tmp_path):
+    body = {'results': ['x' * 1000]}
+    probe = ResponseCache(tmp_path / 'probe')
+    probe.put(URL, page(0), body)
+    size = probe._path(URL, page(0)).stat().st_size
+    # Room for three and a half pages: the fourth evicts one, which gets back under 90%
+    cache = ResponseCache(tmp_path / 'cache', max_mb=3.5 * size / 1024 / 1024)
+    for number in range(3):
+        cache.put(URL, page(number), body)
+    files = {number: cache._path(URL, page(number)) for number in range(3)}
+    # Page 1 was used longest ago, page 0 is read again just now
+    for number, age in ((0, 300), (1, 200), (2, 100)):
+        os.utime(files[number], (time.time() - age, time.time() - age))
+    assert cache.get(URL, page(0)) == body
+
+    cache.put(URL, page(3), body)
+    assert not files[1].exists()
+    assert files[0].exists() and files[2].exists()
+    assert sum(path.stat().st_size for path in (tmp_path / 'cache').glob('*/*.json')) <= cache.max_bytes
@@ -0,0 +1,78 @@
+import sys
+import warnings
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path[:0] = [str(ROOT / "scripts")]
+
+import clean
+
+
+def raw_series(hours, seed):
+    """Raw extract rows of one hourly series with gaps, duplicate hours, -999 sentinels and a spike."""
+    rng = np.random.default_rng(seed)
+    times = pd.date_range('2022-01-01', periods=hours, freq='h', tz='UTC')
+    values = (30 + 10 * np.sin(np.arange(hours) * 2 * np.pi / 24) + rng.normal(0, 5, hours)).round(2)
+    values[rng.random(hours) < 0.03] = -999
+    values[hours // 2] = 500
+    keep = rng.random(hours) > 0.1
+    keep[[0, -1]] = True
+    df = pd.DataFrame({'location': 'Station', 'sensor_type': 'pm25', 'value': values[keep],
+                       'datetime': times[keep].map(lambda ts: ts.isoformat()), 'unit': 'µg/m³'})
+    # A second reading of a few hours, averaged by the cleaners
+    return pd.concat([df, df.iloc[5:8].assign(value=df['value'].iloc[5:8] + 1)]).sort_values('datetime', kind='stable')
+
+
+@pytest.fixture
+def raw_files(tmp_path):
+    paths = []
+    for seed in range(3):
+        path = tmp_path / f"measurements_S{seed}_pm25.csv"
+        raw_series(500 + 50 * seed, seed)[clean.COLUMN_NAMES].to_csv(path, header=False, index=False)
+        paths.append(path)
+    return paths
+
+
+def per_file(path):
+    """check_missing_times_and_outliers on a copy of the file, read back as (datetime, value)."""
+    copy = path.with_name('single_' + path.name)
+    copy.write_bytes(path.read_bytes())
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', FutureWarning)
+        clean.check_missing_times_and_outliers(str(copy))
+    return pd.read_csv(copy, parse_dates=['datetime'])
+
+
+def test_clean_many_matches_per_file_cleaning(raw_files):
+    frames = [pd.read_csv(path, header=None, names=clean.COLUMN_NAMES).assign(file=str(path)) for path in raw_files]
+    with warnings.catch_warnings():
+        warnings.simplefilter('error', RuntimeWarning)
+        cleaned = clean.clean_many(pd.concat(frames, ignore_index=True), keys=('file',))
+
+    for path in raw_files:
+        expected = per_file(path)
+        series = cleaned[cleaned['file'] == str(path)]
+        assert series['datetime'].tolist() == expected['datetime'].tolist()
+        np.testing.assert_allclose(series['value'].to_numpy(), expected['value'].to_numpy(), rtol=1e-12)
+        assert series['outlier'].tolist() == expected['outlier'].tolist()
+        assert series['missing'].any() and series['outlier'].any()
+
+
+@pytest.mark.parametrize('chunksize', [97, 10000])
+def test_clean_streaming_matches_per_file_cleaning(raw_files, chunksize):
+    path = raw_files[0]
+    expected = per_file(path)
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', FutureWarning)
+        rows = clean.clean_streaming(str(path), chunksize=chunksize)
+
+    streamed = pd.read_csv(path, parse_dates=['datetime'])
+    assert rows == len(expected)
+    assert streamed['datetime'].tolist() == expected['datetime'].tolist()
+    np.testing.assert_allclose(streamed['value'].to_numpy(), expected['value'].to_numpy(), rtol=1e-12)
+    assert streamed['outlier'].tolist() == expected['outlier'].tolist()
+    assert streamed['outlier'].any()
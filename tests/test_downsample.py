@@ -0,0 +1,54 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path[:0] = [str(ROOT / "scripts")]
+
+import downsample
+
+HOUR_NS = 3600 * 10 ** 9
+
+
+def series(n, seed=0):
+    rng = np.random.default_rng(seed)
+    times = np.arange(n, dtype=np.int64) * HOUR_NS
+    return times, rng.normal(30, 10, n).round(1)
+
+
+def test_minmax_keeps_the_extremes_of_every_bucket():
+    times, values = series(1000)
+    buckets = 37
+    kept = downsample.minmax_indices(times, values, buckets)
+    assert (np.diff(kept) > 0).all()
+
+    seconds = (times - times[0]) / 1e9
+    bucket = np.minimum(np.floor(seconds * buckets / seconds[-1]), buckets - 1).astype(int)
+    frame = pd.DataFrame({'bucket': bucket, 'value': values})
+    expected = frame.groupby('bucket')['value'].agg(['min', 'max'])
+    got = frame.iloc[kept].groupby('bucket')['value'].agg(['min', 'max'])
+    pd.testing.assert_frame_equal(got, expected)
+    assert len(kept) <= 2 * buckets
+
+
+def test_lttb_keeps_the_endpoints_and_a_spike():
+    times, values = series(500)
+    values[250] = 1000
+    kept = downsample.lttb_indices(times, values, 50)
+    assert len(kept) == 50 and (np.diff(kept) > 0).all()
+    assert kept[0] == 0 and kept[-1] == 499
+    assert 250 in kept
+    # Nothing to drop
+    assert downsample.lttb_indices(times[:10], values[:10], 20).tolist() == list(range(10))
+
+
+def test_downsample_frame_with_aware_and_naive_times():
+    times, values = series(2000)
+    aware = pd.DataFrame({'datetime': pd.DatetimeIndex(times, tz='UTC').tz_convert('America/Lima'), 'value': values})
+    naive = aware.assign(datetime=aware['datetime'].dt.tz_convert('UTC').dt.tz_localize(None))
+    for method in ('minmax', 'lttb'):
+        assert downsample.downsample_frame(aware, 100, method).index.tolist() == \
+               downsample.downsample_frame(naive, 100, method).index.tolist()
+    assert downsample.downsample_frame(aware, 100, 'exact') is aware
@@ -0,0 +1,71 @@
+import random
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path[:0] = [str(ROOT / "scripts")]
+
+import extract
+
+
+class FakeResponse:
+    def __init__(self, status_code, body=None):
+        self.status_code = status_code
+        self.text = '' if body is None else 'ok'
+        self.body = body
+
+    def json(self):
+        return self.body
+
+
+class FakeSession:
+    """Answers get() with the queued responses, raising queued exceptions."""
+
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.calls = 0
+
+    def get(self, url, headers=None, params=None):
+        self.calls += 1
+        response = self.responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+
+PARAMS = {'page': 1, 'location': 'SANTA ANITA', 'parameter': 'pm10'}
+
+
+def test_token_bucket_allows_a_burst_then_waits_for_the_rate():
+    bucket = extract.TokenBucket(rate=50, capacity=3)
+    assert [bucket.acquire() for _ in range(3)] == [0.0, 0.0, 0.0]
+    waited = bucket.acquire()
+    assert 0 < waited <= 1 / 50 + 1e-9
+
+
+def test_backoff_delay_stays_within_the_capped_exponential():
+    random.seed(0)
+    for attempt in range(10):
+        delays = [extract.backoff_delay(attempt, base=1.0, cap=8.0) for _ in range(200)]
+        assert 0 <= min(delays) and max(delays) <= min(8.0, 2 ** attempt)
+
+
+def test_fetch_page_retries_errors_with_backoff(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(extract.time, 'sleep', sleeps.append)
+    session = FakeSession([FakeResponse(500), extract.requests.exceptions.ConnectionError('reset'),
+                           FakeResponse(200, {'results': [1]})])
+    data = extract.fetch_page(session, PARAMS, extract.TokenBucket(rate=1000, capacity=10), url='http://stub')
+    assert data == {'results': [1]}
+    assert session.calls == 3
+    assert len(sleeps) == 2 and 0 <= sleeps[0] <= 1 and 0 <= sleeps[1] <= 2
+
+
+def test_fetch_page_gives_up_after_max_retries(monkeypatch):
+    monkeypatch.setattr(extract.time, 'sleep', lambda seconds: None)
+    session = FakeSession([FakeResponse(503)] * extract.MAX_RETRIES)
+    with pytest.raises(RuntimeError, match="Giving up"):
+        extract.fetch_page(session, PARAMS, extract.TokenBucket(rate=1000, capacity=10), url='http://stub')
+    assert session.calls == extract.MAX_RETRIES
@@ -0,0 +1,59 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path[:0] = [str(ROOT / "scripts")]
+
+import gaps
+
+START = pd.Timestamp('2022-01-01', tz='UTC')
+FIRST = START.value // gaps.HOUR_NS
+
+
+def observed(hours):
+    return START + pd.to_timedelta(hours, unit='h')
+
+
+def test_from_times_finds_the_known_gaps():
+    # Hours 3-4 and 7 are missing; an off-hour reading and a duplicate count once
+    times = observed([0, 1, 2, 2, 5, 6, 8, 9]).append(pd.DatetimeIndex([START + pd.Timedelta(minutes=90)]))
+    index = gaps.GapIndex.from_times(times)
+    assert (index.first, index.last) == (FIRST, FIRST + 9)
+    assert index.runs.tolist() == [[FIRST + 3, 2], [FIRST + 7, 1]]
+    assert (index.span, index.missing) == (10, 3)
+    assert index.coverage == 0.7
+    assert index.missing_hours().tolist() == [FIRST + 3, FIRST + 4, FIRST + 7]
+    assert index.observed_hours().tolist() == [FIRST + h for h in (0, 1, 2, 5, 6, 8, 9)]
+    assert index.observed_between(FIRST + 2, FIRST + 8) == 3
+    assert index.observed_between() == 7
+
+
+def test_save_and_load_round_trip(tmp_path):
+    index = gaps.GapIndex.from_times(observed([0, 1, 4, 9]))
+    path = tmp_path / 'series.gaps.json'
+    index.save(path)
+    loaded = gaps.GapIndex.load(path)
+    assert (loaded.first, loaded.last) == (index.first, index.last)
+    assert loaded.runs.tolist() == index.runs.tolist()
+    assert gaps.GapIndex.load(tmp_path / 'none.json').empty
+
+
+def test_merge_fills_refetched_hours_and_the_hole_between_slices():
+    older = gaps.GapIndex.from_times(observed([0, 2, 3, 4]))
+    # The newer slice refetched hour 1 and starts after a two-hour hole
+    newer = gaps.GapIndex.from_times(observed([1, 2, 3, 4, 7, 8]))
+    merged = older.merge(newer)
+    assert merged.runs.tolist() == [[FIRST + 5, 2]]
+    assert merged.observed_hours().tolist() == gaps.GapIndex.from_times(observed([0, 1, 2, 3, 4, 7, 8])).observed_hours().tolist()
+
+
+def test_interpolate_matches_pandas_time_interpolation():
+    times = observed([0, 1, 4, 5, 9])
+    values = np.array([10.0, 12.0, 18.0, 11.0, 3.0])
+    grid, filled = gaps.GapIndex.from_times(times).interpolate(times, values)
+    expected = pd.Series(values, index=times).resample('h').mean().interpolate(method='time')
+    assert grid.equals(expected.index)
+    np.testing.assert_allclose(filled, expected.to_numpy())
@@ -0,0 +1,23 @@
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path[:0] = [str(ROOT), str(ROOT / "benchmarks")]
+
+from aq import COMMANDS
+from bench_startup import PLOTTING, run
+
+
+@pytest.mark.parametrize("argv", [['--help']] + [[command, '--help'] for command in COMMANDS],
+                         ids=lambda argv: ' '.join(argv))
+def test_help_imports_no_pandas(argv):
+    _, heavy = run(argv, 1)
+    assert not {'pandas', 'numpy', *PLOTTING} & set(heavy), f"aq {' '.join(argv)} imports {heavy}"
+
+
+def test_summary_imports_no_plotting():
+    _, heavy = run(['summary', '--source', f"duckdb://{ROOT}", '--csv', os.devnull], 1)
+    assert not set(PLOTTING) & set(heavy), f"aq summary imports {heavy}"